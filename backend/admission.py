@@ -0,0 +1,399 @@
+"""
+Admission Control
+Global and per-user limits on running Wrapped jobs, with a fair, small-jobs-first queue
+
+Jobs beyond the limits wait in a bounded queue. The next job admitted is the
+one with the lowest cost (number of chats), aged by how long it has waited so
+large jobs still make progress, among users below their own running limit.
+When the queue (or a user's share of it) is full the job is rejected with a
+Retry-After estimate.
+
+Limits hold across API worker processes: every job is a row in the shared
+SQLite session store, and admission decisions are made in one write
+transaction over all rows. A worker learns that another worker's release
+admitted one of its jobs by polling, and rows of dead workers are dropped.
+
+The store is only touched from one admission thread per process, so a write
+waiting out another worker's transaction never stalls the event loop, and
+this worker's transactions run one at a time in the order they were made.
+A row whose removal failed is removed by the next transaction, and a
+running row older than ADMISSION_STALE_SECONDS is dropped by any worker.
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from telegram.session_store import shared_db
+from telemetry import get_logger, log_event
+from telemetry.metrics import ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_RUNNING, ADMISSION_WAIT_SECONDS
+from telemetry.tracing import record_span
+
+ADMISSION_MAX_RUNNING = int(os.getenv('ADMISSION_MAX_RUNNING', '4'))  # jobs analyzed at once, all workers
+ADMISSION_MAX_PER_USER = int(os.getenv('ADMISSION_MAX_PER_USER', '1'))  # running jobs per user
+ADMISSION_MAX_QUEUED = int(os.getenv('ADMISSION_MAX_QUEUED', '32'))  # waiting jobs, all users
+ADMISSION_MAX_QUEUED_PER_USER = int(os.getenv('ADMISSION_MAX_QUEUED_PER_USER', '2'))
+AGING_SECONDS = 10.0  # each 10s of waiting counts as one chat less
+INITIAL_JOB_SECONDS = 30.0  # duration estimate before any job has finished
+JOB_SECONDS_SMOOTHING = 0.2  # EWMA weight of the latest job
+POLL_MIN = 0.05  # seconds between checks of a waiting job; admissions by this worker wake it at once
+POLL_MAX = 0.5
+ADMISSION_STALE_SECONDS = float(os.getenv('ADMISSION_STALE_SECONDS', '1800'))  # running rows older are dropped
+REMOVE_ATTEMPTS = 3  # tries to delete a finished or abandoned row before leaving it to the next transaction
+REMOVE_BACKOFF = 0.5  # seconds, doubled per try
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS admission ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " user_id TEXT NOT NULL,"
+    " cost INTEGER NOT NULL,"
+    " enqueued REAL NOT NULL,"  # wall clock, comparable across workers
+    " started REAL,"  # NULL while waiting
+    " owner TEXT NOT NULL)"  # worker process, see _process_tag
+)
+
+# (seq, user_id, cost, enqueued, started)
+Row = Tuple[int, str, int, float, Optional[float]]
+Granted = Dict[int, float]  # seq -> started, of this worker's waiting tickets
+
+logger = get_logger('admission')
+
+
+class AdmissionRejected(Exception):
+    """Queue full; retry_after is a whole number of seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Too many Wrapped jobs queued ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _process_tag(pid: int) -> Optional[str]:
+    """pid plus its start time (Linux), so a reused pid is not taken for the old worker; None if not running"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            return f"{pid}:{int(f.read().rsplit(b')', 1)[1].split()[19])}"
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, IndexError):
+        pass
+    if os.name == 'nt':
+        return str(pid)  # os.kill would terminate it; rows of crashed workers stay until restart
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return str(pid)
+
+
+def _priority(row: Row, now: float) -> tuple:
+    seq, _, cost, enqueued, _ = row
+    return (cost - (now - enqueued) / AGING_SECONDS, seq)
+
+
+class Ticket:
+    """One job's place in the queue, then its running slot"""
+
+    def __init__(self, user_id: str, cost: int, seq: int, enqueued: float):
+        self.user_id = user_id
+        self.cost = cost
+        self.seq = seq
+        self.enqueued = enqueued
+        self.started: Optional[float] = None
+        self.granted = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """Admission shared by the API workers; one instance per process event loop
+
+    Methods ending in _sync run on the admission thread (see _submit); they
+    return (value, tickets they admitted), and only the event loop touches
+    tickets.
+    """
+
+    def __init__(
+        self,
+        max_running: int = ADMISSION_MAX_RUNNING,
+        max_per_user: int = ADMISSION_MAX_PER_USER,
+        max_queued: int = ADMISSION_MAX_QUEUED,
+        max_queued_per_user: int = ADMISSION_MAX_QUEUED_PER_USER
+    ):
+        self.max_running = max_running
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.job_seconds = INITIAL_JOB_SECONDS
+        self.owner = _process_tag(os.getpid()) or str(os.getpid())
+        self._waiting: Dict[int, Ticket] = {}  # this worker's queued tickets by seq (event loop only)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='admission')
+        self._schema_ready = False  # admission thread only, like _unremoved
+        self._unremoved: Set[int] = set()  # rows whose removal failed, retried by the next transaction
+
+    def _submit(self, fn: Callable, *args) -> asyncio.Future:
+        """Run fn on the admission thread; the tickets it admitted are woken when it returns
+
+        The work runs to the end even if nobody awaits the result (shield it when awaiting
+        from a task that may be cancelled).
+        """
+        future = asyncio.wrap_future(self._executor.submit(fn, *args))
+        future.add_done_callback(self._wake)
+        return future
+
+    def _wake(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            return  # Retrieved here; callers that await it see the error themselves
+        _, granted = future.result()
+        for seq, started in granted.items():
+            ticket = self._waiting.pop(seq, None)
+            if ticket is not None:
+                ticket.started = started
+                if not ticket.granted.done():
+                    ticket.granted.set_result(None)
+
+    async def _call(self, fn: Callable, *args) -> Any:
+        value, _ = await self._submit(fn, *args)
+        return value
+
+    def _db(self) -> sqlite3.Connection:
+        conn = shared_db()
+        if not self._schema_ready:
+            conn.execute(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction on the shared store (taken at BEGIN, so decisions see every worker's rows)"""
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._unremoved:
+                conn.executemany("DELETE FROM admission WHERE seq = ?", [(seq,) for seq in self._unremoved])
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._unremoved.clear()
+
+    @staticmethod
+    def _rows(conn: sqlite3.Connection) -> List[Row]:
+        return conn.execute("SELECT seq, user_id, cost, enqueued, started FROM admission").fetchall()
+
+    def _drop_stale(self, conn: sqlite3.Connection):
+        """Drop dead workers' rows, and running rows whose release never arrived"""
+        owners = [owner for (owner,) in conn.execute("SELECT DISTINCT owner FROM admission")]
+        dead = [owner for owner in owners if owner != self.owner and _process_tag(int(owner.split(':')[0])) != owner]
+        conn.executemany("DELETE FROM admission WHERE owner = ?", [(owner,) for owner in dead])
+        conn.execute("DELETE FROM admission WHERE started < ?", (time.time() - ADMISSION_STALE_SECONDS,))
+
+    def _dispatch(self, conn: sqlite3.Connection, mine: List[int]) -> Granted:
+        """Admit waiting jobs (any worker's) while slots are free
+
+        Args:
+            conn: Connection inside a write transaction
+            mine: This worker's waiting tickets
+
+        Returns:
+            Those of mine admitted here or, since the last check, by another worker
+        """
+        self._drop_stale(conn)
+        rows = self._rows(conn)
+        now = time.time()
+        running_by_user = Counter(row[1] for row in rows if row[4] is not None)
+        running = sum(running_by_user.values())
+        waiting = [row for row in rows if row[4] is None]
+        admitted = []
+        while running < self.max_running:
+            eligible = [row for row in waiting if running_by_user[row[1]] < self.max_per_user]
+            if not eligible:
+                break
+            row = min(eligible, key=lambda r: _priority(r, now))
+            waiting.remove(row)
+            running += 1
+            running_by_user[row[1]] += 1
+            admitted.append(row[0])
+        conn.executemany("UPDATE admission SET started = ? WHERE seq = ?", [(now, seq) for seq in admitted])
+        ADMISSION_QUEUED.set(len(waiting))
+        ADMISSION_RUNNING.set(running)
+
+        if not mine:
+            return {}
+        marks = ','.join('?' * len(mine))
+        return dict(conn.execute(
+            f"SELECT seq, started FROM admission WHERE started IS NOT NULL AND seq IN ({marks})", mine
+        ).fetchall())
+
+    def retry_after(self, queued: int) -> int:
+        """Seconds until a queue slot is likely to free up, with queued jobs waiting"""
+        rounds = (queued + 1) / max(1, self.max_running)
+        return max(1, math.ceil(self.job_seconds * rounds))
+
+    def _enqueue_sync(self, user_id: str, cost: int, mine: List[int]) -> Tuple[tuple, Granted]:
+        """Queue a job unless the limits reject it, then admit what fits
+
+        Returns:
+            ((rejection reason or None, jobs queued before, seq, enqueued, started or None), granted)
+        """
+        with self._transaction() as conn:
+            self._drop_stale(conn)
+            queued, user_queued = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(user_id = ?), 0) FROM admission WHERE started IS NULL", (user_id,)
+            ).fetchone()
+            if queued >= self.max_queued:
+                return ('queue_full', queued, None, None, None), {}
+            if user_queued >= self.max_queued_per_user:
+                return ('user_queue_full', queued, None, None, None), {}
+            enqueued = time.time()
+            seq = conn.execute(
+                "INSERT INTO admission (user_id, cost, enqueued, owner) VALUES (?, ?, ?, ?)",
+                (user_id, cost, enqueued, self.owner)
+            ).lastrowid
+            granted = self._dispatch(conn, mine + [seq])
+        return (None, queued, seq, enqueued, granted.pop(seq, None)), granted
+
+    def _poll_sync(self, mine: List[int]) -> Tuple[None, Granted]:
+        with self._transaction() as conn:
+            return None, self._dispatch(conn, mine)
+
+    def _remove_sync(self, seq: int, mine: List[int]) -> Tuple[None, Granted]:
+        """Delete a finished or abandoned job's row and admit the next jobs
+
+        Retried while the store is locked; after that the row is left to this worker's
+        next transaction (or, if it was running, to the staleness bound).
+        """
+        delay = REMOVE_BACKOFF
+        for attempt in range(1, REMOVE_ATTEMPTS + 1):
+            try:
+                with self._transaction() as conn:
+                    conn.execute("DELETE FROM admission WHERE seq = ?", (seq,))
+                    return None, self._dispatch(conn, mine)
+            except sqlite3.Error as e:
+                if attempt == REMOVE_ATTEMPTS:
+                    self._unremoved.add(seq)
+                    log_event(logger, 'admission_remove_failed', level='warning', seq=seq, error=str(e))
+                    return None, {}
+                time.sleep(delay)
+                delay *= 2
+
+    def _discard(self, seq: int):
+        """Remove a row in the background: never raises, and runs even if the caller is cancelled"""
+        self._submit(self._remove_sync, seq, list(self._waiting))
+
+    def _discard_enqueued(self, enqueue: asyncio.Future):
+        """Remove the row of an enqueue whose caller was cancelled, once the insert is done"""
+        if not enqueue.cancelled() and enqueue.exception() is None:
+            seq = enqueue.result()[0][2]
+            if seq is not None:
+                self._discard(seq)
+
+    async def acquire(self, user_id: str, cost: int) -> Ticket:
+        """Wait for a running slot
+
+        Args:
+            user_id: Owner of the job (per-user limits)
+            cost: Job size, e.g. number of chats; smaller jobs are admitted first
+
+        Returns:
+            Ticket to pass to release() when the job ends
+
+        Raises:
+            AdmissionRejected: The queue or the user's share of it is full
+        """
+        cost = max(1, cost)
+        enqueue = self._submit(self._enqueue_sync, user_id, cost, list(self._waiting))
+        try:
+            (reason, queued, seq, enqueued, started), _ = await asyncio.shield(enqueue)
+        except asyncio.CancelledError:
+            enqueue.add_done_callback(self._discard_enqueued)
+            raise
+        if reason:
+            ADMISSION_REJECTED.inc(reason=reason)
+            raise AdmissionRejected(reason, self.retry_after(queued))
+
+        ticket = Ticket(user_id, cost, seq, enqueued)
+        if started is not None:
+            ticket.started = started
+            ticket.granted.set_result(None)
+        else:
+            self._waiting[seq] = ticket
+        try:
+            delay = POLL_MIN
+            while not ticket.granted.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.granted), delay)
+                except asyncio.TimeoutError:
+                    # Slots freed by other workers are only seen here; a locked store is tried again next time
+                    try:
+                        await self._submit(self._poll_sync, list(self._waiting))
+                    except sqlite3.OperationalError as e:
+                        log_event(logger, 'admission_poll_failed', level='warning', seq=seq, error=str(e))
+                    delay = min(delay * 2, POLL_MAX)
+        except BaseException:
+            # Client went away while queued (or just as it was admitted), or the store failed:
+            # the row must not keep its slot
+            self._waiting.pop(seq, None)
+            self._discard(seq)
+            raise
+
+        waited = max(0.0, ticket.started - ticket.enqueued)
+        ADMISSION_WAIT_SECONDS.observe(waited)
+        record_span('queue', waited)
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's running slot and admit the next job (in the background, never raises)"""
+        if ticket.started is None:
+            return
+        elapsed = time.time() - ticket.started
+        self.job_seconds += JOB_SECONDS_SMOOTHING * (elapsed - self.job_seconds)
+        ticket.started = None
+        self._discard(ticket.seq)
+
+    def _queued_sync(self) -> Tuple[int, Granted]:
+        return self._db().execute("SELECT COUNT(*) FROM admission WHERE started IS NULL").fetchone()[0], {}
+
+    async def queued(self) -> int:
+        """Jobs waiting for admission, all workers"""
+        return await self._call(self._queued_sync)
+
+    async def position(self, user_id: str) -> Optional[int]:
+        """1-based position of the user's next job in admission order (None if nothing waits)"""
+        return (await self.status(user_id))['position']
+
+    def _status_sync(self, user_id: str) -> Tuple[Dict, Granted]:
+        rows = self._rows(self._db())
+        now = time.time()
+        waiting = sorted((row for row in rows if row[4] is None), key=lambda r: _priority(r, now))
+        position = next((index for index, row in enumerate(waiting, start=1) if row[1] == user_id), None)
+        return {
+            'running': sum(row[1] == user_id and row[4] is not None for row in rows),
+            'queued': sum(row[1] == user_id for row in waiting),
+            'position': position,
+            'queue_length': len(waiting),
+            'estimated_wait_seconds': self.retry_after(len(waiting)) if waiting else 0
+        }, {}
+
+    async def status(self, user_id: str) -> Dict:
+        """The user's running and queued jobs and their place in the queue"""
+        return await self._call(self._status_sync, user_id)
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_controller() -> AdmissionController:
+    """Process-wide controller, created on first use (inside the running event loop)"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
@@ -0,0 +1,78 @@
+"""
+CPU Tier Isolation Benchmark
+Event-loop responsiveness while a heavy Wrapped job runs: analysis in threads vs the process pool
+
+A probe task stands in for auth and /chats/top requests: it wakes every few
+milliseconds and records how late the loop got to it.
+
+    python -m bench.cpu_tier
+    python -m bench.cpu_tier --chats 8 --per-month 2000 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+import cpu_pool
+from bench.response_size import make_chat
+
+PROBE_INTERVAL = 0.005  # seconds
+
+
+async def probe(delays: List[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append(loop.time() - expected)
+
+
+async def run_job(workers: int, exports: list) -> tuple:
+    from orchestrator import TelegramWrappedOrchestrator
+    from wrapper.month_store import MonthStore
+
+    cpu_pool.CPU_WORKERS = workers
+    if workers:
+        cpu_pool.start()
+        await asyncio.sleep(3)  # let the workers finish importing before measuring
+
+    delays: List[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(delays, stop))
+    orchestrator = TelegramWrappedOrchestrator(MonthStore(tempfile.mkdtemp()), summary_cards=False)
+    start = time.perf_counter()
+    await orchestrator.analyze_multi_chat(exports, '1')
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    cpu_pool.shutdown()
+    return elapsed, np.array(delays) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=6)
+    parser.add_argument('--per-month', type=int, default=1500, help='Messages per chat per month')
+    parser.add_argument('--workers', type=int, default=cpu_pool.CPU_WORKERS or 2)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ['LLM_BACKEND'] = 'fake'  # Never hit the real API from the bench
+    rng = random.Random(args.seed)
+    exports = [make_chat(chat_id, args.per_month, rng) for chat_id in range(1, args.chats + 1)]
+    print(f"{args.chats} chats x {args.per_month * 12} messages\n")
+
+    for name, workers in (('threads', 0), (f'pool x{args.workers}', args.workers)):
+        elapsed, delays = asyncio.run(run_job(workers, exports))
+        p50, p99 = np.percentile(delays, [50, 99])
+        print(f"{name:<10} job {elapsed:6.2f}s   loop delay p50 {p50:6.1f} ms  p99 {p99:7.1f} ms  max {delays.max():7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Emotion Agreement Benchmark
+Compares local EmotionScorer labels with recorded LLM labels for the same month samples
+
+Record once against the real API, then replay through the stand-in:
+
+    LLM_RECORD_PATH=recordings.jsonl python -m bench.emotion_agreement chat1.json chat2.json
+    LLM_BACKEND=fake LLM_RECORDINGS=recordings.jsonl python -m bench.emotion_agreement chat1.json chat2.json
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from json_parser.json_parser import TelegramExportParser
+from wrapper.emotion_scorer import EmotionScorer, LOCAL_CONFIDENCE_THRESHOLD
+from wrapper.llm_analyzer import LLMAnalyzer
+
+
+def load_month_samples(paths: List[str], analyzer: LLMAnalyzer) -> List[Dict[str, List[str]]]:
+    """One {month: samples} dict per chat file"""
+    samples = []
+    for path in paths:
+        parser = TelegramExportParser(path)
+        data = parser.parse()
+        samples.append(analyzer.build_month_samples(data['messages']))
+    return samples
+
+
+async def run(paths: List[str], threshold: float):
+    analyzer = LLMAnalyzer(sentiment_mode='llm')
+    scorer = EmotionScorer()
+    chats = load_month_samples(paths, analyzer)
+
+    total = top1 = pair_hit = sent = 0
+    hybrid_agree = 0
+    prompt_chars = saved_chars = 0
+    local_seconds = 0.0
+
+    for month_samples in chats:
+        llm = await analyzer.score_months(month_samples)
+
+        start = time.perf_counter()
+        local = scorer.score_months(month_samples)
+        local_seconds += time.perf_counter() - start
+
+        for month, texts in month_samples.items():
+            reference, guess = llm[month], local[month]
+            if reference.get('primary') == 'error':
+                continue
+            total += 1
+            top1 += guess['primary'] == reference['primary']
+            pair_hit += reference['primary'] in (guess['primary'], guess['secondary'])
+
+            chars = sum(len(t) for t in texts)
+            prompt_chars += chars
+            if guess['confidence'] < threshold:
+                sent += 1
+                hybrid_agree += 1
+            else:
+                saved_chars += chars
+                hybrid_agree += guess['primary'] == reference['primary']
+
+    if not total:
+        print("No scored months")
+        return
+
+    print(f"Months compared:        {total}")
+    print(f"Top-1 agreement:        {top1 / total:.1%}")
+    print(f"LLM primary in top-2:   {pair_hit / total:.1%}")
+    print(f"Hybrid @ {threshold:.2f}:")
+    print(f"  months sent to LLM:   {sent}/{total} ({sent / total:.1%})")
+    print(f"  primary agreement:    {hybrid_agree / total:.1%}")
+    print(f"  prompt tokens saved:  ~{saved_chars // 4} of ~{prompt_chars // 4}")
+    print(f"Local scoring time:     {local_seconds * 1000:.1f} ms total")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Chat files in {data: {chat_id: [msgs]}} format')
+    parser.add_argument('--threshold', type=float, default=LOCAL_CONFIDENCE_THRESHOLD,
+                        help='Hybrid confidence threshold')
+    args = parser.parse_args()
+    asyncio.run(run(args.paths, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
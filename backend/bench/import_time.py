@@ -0,0 +1,97 @@
+"""
+API Import-Time Benchmark
+Cold import of main.py in fresh interpreters, checked against a time budget and a list of lazy modules
+
+    python -m bench.import_time                  # median of 5 runs, exit 1 over budget
+    python -m bench.import_time --budget 500 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = 700.0  # main.py cold import, median
+# Must stay off the startup path (imported on first use / by the background preload)
+LAZY_MODULES = ('openai', 'telethon', 'wordcloud', 'matplotlib', 'matplotlib.pyplot')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({'ms': elapsed * 1000, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault('API_ID', '0')  # telegram.client reads it at import
+    env.setdefault('API_HASH', 'bench')
+    return env
+
+
+def run_once(importtime: bool = False) -> Tuple[dict, str]:
+    """Import main in a fresh interpreter; returns (probe result, -X importtime log)"""
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE % (LAZY_MODULES,)]
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def top_modules(log: str, limit: int) -> List[Tuple[str, int]]:
+    """Slowest direct imports of main (cumulative microseconds) from an -X importtime log"""
+    children: List[Tuple[str, int]] = []
+    for line in log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us)))
+        elif depth == 0:
+            # Children are logged before their parent
+            if name.strip() == 'main':
+                return sorted(children, key=lambda row: -row[1])[:limit]
+            children = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_MS, help='Median budget in ms')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    run_once()  # Warm the bytecode cache so runs measure imports, not compilation
+    timings = []
+    loaded = set()
+    for _ in range(args.runs):
+        result, _ = run_once()
+        timings.append(result['ms'])
+        loaded.update(result['loaded'])
+    median = statistics.median(timings)
+
+    _, log = run_once(importtime=True)
+    print(f"import main: median {median:.0f} ms  min {min(timings):.0f} ms  max {max(timings):.0f} ms  "
+          f"({args.runs} runs, budget {args.budget:.0f} ms)")
+    print("slowest imports from main:")
+    for name, us in top_modules(log, args.top):
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median {median:.0f} ms over budget {args.budget:.0f} ms")
+    if loaded:
+        failures.append(f"loaded at startup (should be lazy): {', '.join(sorted(loaded))}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
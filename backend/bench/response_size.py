@@ -0,0 +1,111 @@
+"""
+Wrapped Response Size Benchmark
+Payload size and serialization time of a 20-chat /chats/messages result, full and field-selected
+
+    python -m bench.response_size
+    python -m bench.response_size --chats 20 --fields aggregate,per_chat.chat_ids,per_chat.top_words
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from utils.compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from utils.serialization import dumps, orjson, parse_fields, select_fields
+
+DEFAULT_FIELDS = 'aggregate,per_chat.chat_ids,per_chat.message_stats,per_chat.top_words,per_chat.top_emojis'
+WORDS = ('hello', 'world', 'tmr', 'lunch', 'lol', 'meeting', 'weekend', 'movie', 'coffee', 'deadline',
+         'gym', 'party', 'train', 'ok', 'sure', 'later', 'photo', 'birthday', 'rain', 'game')
+EMOJIS = ('😀', '😂', '🔥', '❤️', '👍', '🎉')
+
+
+def make_chat(chat_id: int, per_month: int, rng: random.Random) -> Dict:
+    """Synthetic export: three members, a year of messages with replies"""
+    messages = []
+    for month in range(1, 13):
+        for i in range(per_month):
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 9)))
+            if rng.random() < 0.3:
+                text += ' ' + rng.choice(EMOJIS)
+            msg_id = month * 10000 + i
+            messages.append({
+                'id': msg_id,
+                'text': text,
+                'date': f"2025-{month:02d}-{1 + i % 28:02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00+00:00",
+                'sender_id': 1 + rng.randint(0, 2),
+                'reply_to_msg_id': msg_id - 1 if i and rng.random() < 0.4 else None
+            })
+    messages.reverse()
+    return {'data': {str(chat_id): messages}}
+
+
+def build_result(chats: int, per_month: int, seed: int) -> Dict:
+    os.environ['LLM_BACKEND'] = 'fake'  # Never hit the real API from the bench
+    from orchestrator import TelegramWrappedOrchestrator
+    from wrapper.month_store import MonthStore
+
+    rng = random.Random(seed)
+    orchestrator = TelegramWrappedOrchestrator(MonthStore(tempfile.mkdtemp()), summary_cards=False)
+    exports = [make_chat(chat_id, per_month, rng) for chat_id in range(1, chats + 1)]
+    return asyncio.run(orchestrator.analyze_multi_chat(exports, '1'))
+
+
+def fastapi_default(data) -> bytes:
+    """What FastAPI does for a returned dict: jsonable_encoder, then JSONResponse.render"""
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def best_of(fn: Callable[[], bytes], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def report(name: str, data, repeat: int):
+    raw = dumps(data)
+    rows: List[str] = [
+        f"  identity   {len(raw) / 1024:9.1f} KiB",
+        f"  gzip-{GZIP_LEVEL}     {len(gzip.compress(raw, GZIP_LEVEL)) / 1024:9.1f} KiB  "
+        f"{best_of(lambda: gzip.compress(raw, GZIP_LEVEL), repeat):7.1f} ms",
+    ]
+    if brotli is not None:
+        rows.append(f"  br-{BROTLI_QUALITY}       {len(brotli.compress(raw, quality=BROTLI_QUALITY)) / 1024:9.1f} KiB  "
+                    f"{best_of(lambda: brotli.compress(raw, quality=BROTLI_QUALITY), repeat):7.1f} ms")
+    print(f"{name}")
+    print(f"  encode     fastapi default {best_of(lambda: fastapi_default(data), repeat):7.1f} ms   "
+          f"{'orjson' if orjson else 'stdlib'} dumps {best_of(lambda: dumps(data), repeat):7.1f} ms")
+    print('\n'.join(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--per-month', type=int, default=150, help='Messages per chat per month')
+    parser.add_argument('--fields', default=DEFAULT_FIELDS, help='Selection for the compact variant')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = build_result(args.chats, args.per_month, args.seed)
+    print(f"Built {args.chats}-chat result in {time.perf_counter() - start:.1f}s\n")
+
+    report('full response', result, args.repeat)
+    report(f'fields={args.fields}', select_fields(result, parse_fields(args.fields)), args.repeat)
+    if brotli is None:
+        print("\n(brotli not installed: br rows skipped, clients get gzip)")
+
+
+if __name__ == '__main__':
+    main()
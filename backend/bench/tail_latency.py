@@ -0,0 +1,101 @@
+"""
+LLM Tail-Latency Benchmark
+Per-call latency percentiles with and without hedging, against the local stand-in
+
+    python -m bench.tail_latency --latency 800,0.9 --calls 400
+    python -m bench.tail_latency --latency 800,0.9 --deadline 3   # job deadline fallback
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from wrapper.deadlines import LLMTimeout, LatencyTracker, job_deadline
+from wrapper.fake_llm import FakeAsyncOpenAI, parse_latency_profile
+from wrapper.llm_analyzer import MAX_CONCURRENT_REQUESTS, LLMAnalyzer
+from wrapper.usage_ledger import UsageLedger
+
+PROMPT = "Analyze these months: 2024-01\n\nMessages by month:\n=== 2024-01 ===\nhello"
+
+
+def make_analyzer(latency: str, hedge: bool, call_timeout: float, seed: int) -> LLMAnalyzer:
+    os.environ['LLM_BACKEND'] = 'fake'  # Never hit the real API from the bench
+    analyzer = LLMAnalyzer(sentiment_mode='llm', call_timeout=call_timeout, hedge=hedge)
+    analyzer.client = FakeAsyncOpenAI(latency_profile=parse_latency_profile(latency), seed=seed)
+    analyzer.latency = LatencyTracker()  # Fresh window per scenario
+    return analyzer
+
+
+async def measure(analyzer: LLMAnalyzer, calls: int) -> List[float]:
+    """Wall time of each _chat call; half the concurrency slots stay free for hedges, so nothing queues"""
+    latencies: List[float] = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                await analyzer._chat(PROMPT)
+            except LLMTimeout:
+                pass
+            latencies.append(time.perf_counter() - start)
+
+    workers = max(1, MAX_CONCURRENT_REQUESTS // 2)
+    await asyncio.gather(*(worker(calls // workers + (i < calls % workers)) for i in range(workers)))
+    return latencies
+
+
+def report(name: str, latencies: List[float], analyzer: LLMAnalyzer):
+    arr = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    stats = analyzer.call_stats
+    usage = analyzer.usage
+    print(f"{name:<10} p50 {p50:7.0f} ms  p95 {p95:7.0f} ms  p99 {p99:7.0f} ms  max {arr.max():7.0f} ms  "
+          f"requests {analyzer.client.calls} (hedged {stats['hedged']}, hedge wins {stats['hedge_wins']}, "
+          f"skipped {stats['hedges_skipped']}, timeouts {stats['timeouts']})  "
+          f"billed {usage.calls} calls / {usage.used} tokens ({usage.estimated_calls} cancelled)")
+
+
+async def run_deadline(latency: str, deadline: float, months: int, seed: int):
+    """Score a year of months under a job deadline and count the fallbacks"""
+    analyzer = make_analyzer(latency, hedge=True, call_timeout=deadline, seed=seed)
+    month_samples = {f"2024-{m:02d}": ["hype party lets go!!", "so tired ugh"] for m in range(1, months + 1)}
+    start = time.perf_counter()
+    with job_deadline(deadline):
+        results = await analyzer.score_months(month_samples)
+    elapsed = time.perf_counter() - start
+    pending = sum(1 for r in results.values() if r.get('pending'))
+    print(f"Job deadline {deadline:.1f}s: finished in {elapsed:.2f}s, "
+          f"{len(results) - pending} months from LLM, {pending} pending (scored locally)")
+
+
+async def run(args):
+    # Warm-up fills the latency window so hedging has a p95 to work with
+    for hedge in (False, True):
+        analyzer = make_analyzer(args.latency, hedge, args.call_timeout, args.seed)
+        await measure(analyzer, 40)
+        analyzer.client.calls = 0
+        analyzer.call_stats = {k: 0 for k in analyzer.call_stats}
+        analyzer.usage = UsageLedger()
+        report('hedged' if hedge else 'baseline', await measure(analyzer, args.calls), analyzer)
+
+    if args.deadline:
+        await run_deadline(args.latency, args.deadline, 12, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', default='800,0.9', help='Stand-in latency profile "median_ms,sigma"')
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--call-timeout', type=float, default=30.0)
+    parser.add_argument('--deadline', type=float, default=0.0, help='Also run a job under this deadline (seconds)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Tokenizer Throughput Benchmark
+Words/s of the multilingual tokenizer against the old ASCII-only regex, plus detection and phrase mining cost
+
+The benchmark corpus is English chat text (what the ASCII regex was tuned
+for), so the comparison is like for like. The Unicode tokenizer must stay
+within MAX_SLOWDOWN of the ASCII regex there; the other corpora show what
+the ASCII regex missed.
+
+    python -m bench.tokenizer                  # exit 1 over the margin
+    python -m bench.tokenizer --messages 200000 --margin 1.15
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+from bench.response_size import WORDS
+from wrapper.frequency_couner import STOPWORDS, FrequencyCounter
+from wrapper.tokenizer import detect_languages, get_tokenizer
+
+MAX_SLOWDOWN = 1.25  # Unicode tokenizer time / ASCII regex time, English corpus
+
+ASCII_WORD_PATTERN = re.compile(r'\b[a-zA-Z]{2,}\b')
+
+CORPUS_WORDS = {
+    'en': WORDS + ('the', 'is', 'you', 'going', "don't", 'café', 'naïve'),
+    'ru': ('привет', 'как', 'дела', 'это', 'просто', 'завтра', 'кофе', 'встреча', 'фильм', 'дождь'),
+    'ms': ('lah', 'makan', 'jom', 'tak', 'boleh', 'esok', 'kopi', 'nak', 'gym', 'ok'),
+    'es': ('hola', 'que', 'tal', 'mañana', 'café', 'reunión', 'película', 'el', 'de', 'fiesta'),
+    'zh': ('今天', '我们', '吃饭', '明天', '开会', '咖啡', '周末', '电影', '下雨', '生日'),
+    'hi': ('नमस्ते', 'कल', 'मिलते', 'हैं', 'कॉफ़ी', 'फ़िल्म', 'बारिश', 'जन्मदिन', 'क्या', 'है'),
+}
+
+
+def ascii_tokenize(text: str) -> List[str]:
+    """The tokenizer this replaced (English stopwords, [a-zA-Z] only)"""
+    return [w for w in ASCII_WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+
+
+def make_corpus(language: str, messages: int, rng: random.Random) -> List[str]:
+    words = CORPUS_WORDS[language]
+    joiner = '' if language == 'zh' else ' '
+    return [joiner.join(rng.choice(words) for _ in range(rng.randint(3, 9))) for _ in range(messages)]
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100000, help='Messages per corpus')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--margin', type=float, default=MAX_SLOWDOWN, help='Allowed slowdown on the English corpus')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpora: Dict[str, str] = {language: '\n'.join(make_corpus(language, args.messages, rng)) for language in CORPUS_WORDS}
+
+    print(f"{args.messages} messages per corpus, best of {args.repeat}\n")
+    print(f"{'corpus':<8} {'languages':<14} {'detect':>8} {'ascii':>9} {'unicode':>9} {'ratio':>6} "
+          f"{'ascii words':>12} {'unicode words':>14}")
+    ratio_en = None
+    for language, text in corpora.items():
+        detect_seconds = best_of(lambda: detect_languages(text), args.repeat)
+        tokenizer = get_tokenizer(detect_languages(text))
+        ascii_seconds = best_of(lambda: ascii_tokenize(text), args.repeat)
+        unicode_seconds = best_of(lambda: tokenizer.tokenize(text), args.repeat)
+        ratio = unicode_seconds / ascii_seconds
+        if language == 'en':
+            ratio_en = ratio
+        print(f"{language:<8} {'+'.join(tokenizer.languages):<14} {detect_seconds * 1000:6.1f}ms "
+              f"{ascii_seconds * 1000:7.1f}ms {unicode_seconds * 1000:7.1f}ms {ratio:5.2f}x "
+              f"{len(ascii_tokenize(text)):>12} {len(tokenizer.tokenize(text)):>14}")
+
+    # Words + bigrams/trigrams from one tokenization pass, vs words alone
+    text = corpora['en']
+    tokenizer = get_tokenizer(detect_languages(text))
+    words_seconds = best_of(lambda: FrequencyCounter(text, tokenizer).count_words(top_n=None), args.repeat)
+    phrases_seconds = best_of(lambda: FrequencyCounter(text, tokenizer, phrases=True).count_words(top_n=None), args.repeat)
+    counter = FrequencyCounter(text, tokenizer, phrases=True).count_phrases()
+    print(f"\nen words {words_seconds * 1000:.1f}ms, words + phrases {phrases_seconds * 1000:.1f}ms; "
+          f"{len(counter.phrases)} phrases tracked (cap {2 * counter.max_tracked}), "
+          f"top: {', '.join(p['phrase'] for p in counter.top(3))}")
+
+    ok = ratio_en <= args.margin
+    print(f"\nEnglish corpus: {ratio_en:.2f}x the ASCII regex (margin {args.margin:.2f}x) {'ok' if ok else 'OVER MARGIN'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Batch Wrapped CLI
+Runs the Wrapped pipeline over a directory of exported chats, in parallel, without Telegram
+
+Every *.json export in the directory is one job; every subdirectory is one
+multi-chat job over the exports inside it. Sentiment comes from the LLM
+stand-in (--scoring fake) or the local scorer (--scoring local), so no
+credentials are needed. Results are written as JSONL or Parquet (pyarrow).
+
+    python cli.py exports/ -o wrapped.jsonl
+    python cli.py exports/ -o wrapped.parquet --jobs 8 --scoring local --user-id 12345
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCORING_MODES = ('fake', 'local')
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+Job = Tuple[str, List[str]]  # (name, export paths)
+
+_worker_settings: Dict = {}
+
+
+def discover_jobs(root: str) -> List[Job]:
+    """One job per top-level export file, one per subdirectory of exports"""
+    jobs = []
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.json'))
+            if files:
+                jobs.append((entry, files))
+        elif entry.endswith('.json'):
+            jobs.append((entry[:-len('.json')], [path]))
+    return jobs
+
+
+def _most_active_sender(exports: List[Dict]) -> Optional[str]:
+    senders = Counter(
+        str(msg.get('sender_id'))
+        for export in exports
+        for messages in export.get('data', {}).values()
+        for msg in messages
+        if msg.get('text')
+    )
+    return senders.most_common(1)[0][0] if senders else None
+
+
+def _init_worker(scoring: str, cache_dir: str, wordclouds: bool):
+    # Before any pipeline import: these are read at import time
+    os.environ['CPU_WORKERS'] = '0'  # this process already is the CPU tier
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if scoring == 'fake':
+        os.environ['LLM_BACKEND'] = 'fake'
+        os.environ['SENTIMENT_MODE'] = 'llm'
+    else:
+        os.environ.pop('LLM_BACKEND', None)
+        os.environ['SENTIMENT_MODE'] = 'local'
+    _worker_settings.update(cache_dir=cache_dir, wordclouds=wordclouds)
+
+
+def run_job(name: str, paths: List[str], user_id: Optional[str], tz: Optional[str]) -> Dict:
+    """Worker side: load a job's exports and run the full pipeline on them"""
+    from orchestrator import TelegramWrappedOrchestrator
+    from wrapper.month_store import MonthStore
+
+    start = time.perf_counter()
+    row = {'job': name, 'chats': len(paths), 'user_id': user_id, 'messages': 0, 'seconds': 0.0,
+           'error': None, 'result': None}
+    try:
+        exports = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                exports.append(json.load(f))
+        row['messages'] = sum(len(messages) for export in exports for messages in export.get('data', {}).values())
+        row['user_id'] = user_id or _most_active_sender(exports)
+        if row['user_id'] is None:
+            raise ValueError('no text messages')
+
+        orchestrator = TelegramWrappedOrchestrator(
+            MonthStore(_worker_settings['cache_dir']), wordclouds=_worker_settings['wordclouds'], summary_cards=False
+        )
+        row['result'] = asyncio.run(orchestrator.analyze_multi_chat(exports, row['user_id'], tz))
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['seconds'] = time.perf_counter() - start
+    return row
+
+
+def run_jobs(jobs: List[Job], args) -> Iterator[Dict]:
+    """Yield finished rows as jobs complete"""
+    with ProcessPoolExecutor(
+        max_workers=args.jobs,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(args.scoring, args.cache_dir, args.wordclouds)
+    ) as pool:
+        futures = [pool.submit(run_job, name, paths, args.user_id, args.timezone) for name, paths in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_parquet(rows: List[Dict], path: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from utils.serialization import dumps
+
+    table = pa.Table.from_pylist([
+        {**row, 'result': dumps(row['result']).decode('utf-8') if row['result'] is not None else None}
+        for row in rows
+    ])
+    pq.write_table(table, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Directory of exports ({data: {chat_id: [messages]}} JSON files)')
+    parser.add_argument('-o', '--output', required=True, help='Output .jsonl or .parquet file')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help='Output format (default: from the extension)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--scoring', choices=SCORING_MODES, default='fake', help='LLM stand-in or local scorer')
+    parser.add_argument('--user-id', help='Target user in every job (default: each job\'s most active sender)')
+    parser.add_argument('--timezone', help='IANA timezone for hour/day stats (default: UTC)')
+    parser.add_argument('--cache-dir', help='Month store directory, reused across runs (default: fresh temp dir)')
+    parser.add_argument('--wordclouds', action='store_true', help='Render word cloud images (slow, large output)')
+    args = parser.parse_args()
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    args.cache_dir = args.cache_dir or tempfile.mkdtemp(prefix='wrapped-cli-')
+    if output_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        sys.exit("Parquet output needs pyarrow (pip install pyarrow), or use a .jsonl output")
+    jobs = discover_jobs(args.input)
+    if not jobs:
+        sys.exit(f"No exports found in {args.input}")
+
+    from utils.serialization import dumps
+
+    print(f"{len(jobs)} jobs, {args.jobs} workers, scoring={args.scoring}", file=sys.stderr)
+    rows: List[Dict] = []  # kept in memory for Parquet only
+    finished: List[Dict] = []
+    start = time.perf_counter()
+    jsonl = open(args.output, 'wb') if output_format == 'jsonl' else None
+    try:
+        for done, row in enumerate(run_jobs(jobs, args), start=1):
+            status = f"error: {row['error']}" if row['error'] else f"{row['messages']} messages"
+            print(f"[{done}/{len(jobs)}] {row['job']}: {status} in {row['seconds']:.2f}s", file=sys.stderr)
+            finished.append({key: row[key] for key in ('messages', 'seconds', 'error')})
+            if jsonl:
+                jsonl.write(dumps(row) + b'\n')
+            else:
+                rows.append(row)
+    finally:
+        if jsonl:
+            jsonl.close()
+    if output_format == 'parquet':
+        write_parquet(rows, args.output)
+    elapsed = time.perf_counter() - start
+
+    ok = [row for row in finished if not row['error']]
+    messages = sum(row['messages'] for row in ok)
+    job_seconds = sorted(row['seconds'] for row in ok)
+    print(f"\n{len(ok)}/{len(jobs)} jobs ok, {messages} messages in {elapsed:.1f}s: "
+          f"{messages / elapsed:,.0f} messages/s, {len(ok) / elapsed:.2f} jobs/s", file=sys.stderr)
+    if job_seconds:
+        p95 = job_seconds[min(len(job_seconds) - 1, int(0.95 * len(job_seconds)))]
+        print(f"per job: median {statistics.median(job_seconds):.2f}s, p95 {p95:.2f}s", file=sys.stderr)
+    print(f"wrote {args.output} ({output_format})", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+CPU Worker Tier
+Process pool for parsing, counting and rendering, so API processes only do I/O and coordination
+
+Threads share the GIL with the event loop: a large chat being parsed in a
+thread still stalls auth and /chats/top for every other user. Work sent
+through run_cpu() runs in separate processes instead. CPU_WORKERS=0 keeps
+the old behaviour (a thread in the API process), e.g. for debugging.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Tuple
+
+from telemetry import get_logger, log_event
+from telemetry.tracing import record_span, start_request
+
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', '2'))  # per API process; 0 = run in a thread
+CPU_MAX_TASKS_PER_WORKER = int(os.getenv('CPU_MAX_TASKS_PER_WORKER', '200'))  # recycle to cap memory growth
+
+logger = get_logger('cpu_pool')
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _worker_init():
+    # Pay the heavy imports once per worker, not on the first job
+    import orchestrator  # noqa: F401
+
+
+def _run_traced(fn: Callable, args: tuple) -> Tuple[Any, List[Tuple[str, float]]]:
+    """Worker side: run fn and hand its stage spans back to the API process"""
+    spans = start_request()
+    return fn(*args), spans
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork a process that has an event loop and threads running
+            _executor = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_worker_init,
+                max_tasks_per_child=CPU_MAX_TASKS_PER_WORKER
+            )
+        return _executor
+
+
+async def run_cpu(fn: Callable, *args) -> Any:
+    """Run fn(*args) in the CPU tier
+
+    Args:
+        fn: Module-level function or staticmethod (must be picklable, as must args and result)
+        args: Positional arguments
+
+    Returns:
+        fn's return value; stages it timed show up in this request's spans and metrics
+    """
+    if CPU_WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+
+    loop = asyncio.get_running_loop()
+    try:
+        result, spans = await loop.run_in_executor(_pool(), _run_traced, fn, args)
+    except BrokenProcessPool:
+        # A worker died (OOM kill, segfault): start a fresh pool for the next job
+        log_event(logger, 'cpu_pool_broken', level='error', fn=getattr(fn, '__qualname__', str(fn)))
+        reset()
+        raise
+    for stage, seconds in spans:
+        record_span(stage, seconds)
+    return result
+
+
+def start():
+    """Spawn the workers ahead of the first job (call from app startup)"""
+    if CPU_WORKERS > 0:
+        pool = _pool()
+        for _ in range(CPU_WORKERS):
+            pool.submit(_worker_init)
+
+
+def reset():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    """Stop the workers (call from app shutdown)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -38,6 +38,8 @@ class TelegramExportParser:
 
                 filtered.append({
                     'id': len(filtered),
+                    'msg_id': msg.get('id'),
+                    'reply_to': msg.get('reply_to_msg_id'),
                     'date': msg.get('date', ''),
                     'from_id': str(msg.get('sender_id', '')),
                     'text': text.strip(),
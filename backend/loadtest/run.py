@@ -0,0 +1,334 @@
+"""
+API Load Test
+Full user flows (send-otp -> verify -> top chats -> messages) against fake Telegram and LLM backends
+
+Each simulated user logs in with its own phone number, lists its chats and
+generates a Wrapped for the top --chats of them, retrying on 429 after the
+Retry-After delay. --concurrency users run at once until --users flows are
+done. Reports p50/p95/p99 latency, throughput and the peak RSS (API process
+plus its CPU workers) seen while each endpoint had requests in flight.
+
+By default the app runs in this process over ASGI, with TELEGRAM_BACKEND,
+LLM_BACKEND and every cache directory pointed at fakes and a scratch
+directory (the load generator then shares the event loop with the server).
+With --url the flows go to a running server instead, which must have been
+started with TELEGRAM_BACKEND=fake LLM_BACKEND=fake; pass --pid to sample its RSS.
+
+--compare-cpu-pool runs the same in-process test twice, in child processes,
+with the CPU worker tier (CPU_WORKERS as set, default 2) and without it
+(CPU_WORKERS=0, parsing in a thread of the API process), and compares the
+latency of every endpoint: auth and /chats/top should stay flat with the pool.
+
+    python -m loadtest.run --users 40 --concurrency 8
+    FAKE_TELEGRAM_LATENCY_MS=80,0.5 FAKE_LLM_LATENCY_MS=800,0.6 python -m loadtest.run --users 100 --concurrency 20
+    python -m loadtest.run --url http://127.0.0.1:8000 --pid 4242 --users 200 --concurrency 50 --json report.json
+    FAKE_TELEGRAM_MESSAGES=8000 python -m loadtest.run --users 30 --concurrency 10 --compare-cpu-pool
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_INTERVAL = 0.05  # seconds between RSS samples
+WARMUP_TASK_SECONDS = 0.2  # one per CPU worker, long enough that each lands on a different worker
+# --compare-cpu-pool: (name, CPU_WORKERS); None keeps the environment's setting
+CPU_POOL_VARIANTS = (('cpu pool', None), ('no pool', '0'))
+# Counters scraped from /metrics after the run (cache and sharing effectiveness)
+REPORTED_METRICS = (
+    'wrapped_chat_artifact_lookups_total', 'wrapped_message_cache_lookups_total',
+    'wrapped_prefetch_chats_total', 'wrapped_jobs_rejected_total'
+)
+
+
+def rss_bytes(pids: List[int]) -> int:
+    """Resident memory of the processes and all their descendants (Linux /proc)"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat', 'rb') as f:
+                    ppid = int(f.read().rsplit(b')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    pending, seen = list(pids), set()
+    while pending:
+        pid = pending.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            with open(f'/proc/{pid}/statm', 'rb') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            continue
+        pending.extend(children.get(pid, ()))
+    return total
+
+
+class EndpointStats:
+    """Latencies, statuses and peak RSS of one endpoint"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.in_flight = 0
+        self.peak_rss = 0
+
+    def summary(self, elapsed: float) -> Dict:
+        ms = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        ok = sum(n for status, n in self.statuses.items() if 200 <= status < 300)
+        return {
+            'requests': len(self.latencies), 'ok': ok, 'statuses': dict(self.statuses),
+            'p50_ms': round(p50, 1), 'p95_ms': round(p95, 1), 'p99_ms': round(p99, 1), 'max_ms': round(ms.max(), 1),
+            'throughput': round(len(self.latencies) / elapsed, 2), 'peak_rss_mb': round(self.peak_rss / 2 ** 20, 1)
+        }
+
+
+class LoadTest:
+    """Runs user flows through an httpx client and collects per-endpoint stats"""
+
+    def __init__(self, http, args):
+        self.http = http
+        self.args = args
+        self.stats: Dict[str, EndpointStats] = {}
+        self.flows: List[float] = []  # seconds per completed flow
+        self.failed_flows: Counter = Counter()  # failing endpoint -> flows
+        self.last_rss = 0  # latest sample, credited to requests shorter than the sampling interval
+
+    async def call(self, name: str, method: str, url: str, **kwargs):
+        """One request, retried after Retry-After while the server answers 429"""
+        stats = self.stats.setdefault(name, EndpointStats())
+        for attempt in range(self.args.max_retries + 1):
+            stats.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = await self.http.request(method, url, timeout=self.args.timeout, **kwargs)
+                status = response.status_code
+            except Exception:
+                response, status = None, 0  # transport error or timeout
+            finally:
+                stats.in_flight -= 1
+                stats.peak_rss = max(stats.peak_rss, self.last_rss)
+            stats.latencies.append(time.perf_counter() - start)
+            stats.statuses[status] += 1
+            if status != 429 or attempt == self.args.max_retries:
+                return response
+            await asyncio.sleep(float(response.headers.get('Retry-After', '1')))
+
+    async def flow(self, index: int):
+        """One user's way to a Wrapped"""
+        start = time.perf_counter()
+        steps = (
+            ('send-otp', 'POST', '/auth/send-otp'),
+            ('verify-otp', 'POST', '/auth/verify-otp'),
+            ('top', 'GET', '/chats/top'),
+            ('messages', 'POST', '/chats/messages'),
+        )
+        session_id, chat_ids = None, []
+        phone = f"+1555{index:07d}"
+        for name, method, url in steps:
+            if name == 'send-otp':
+                kwargs = {'json': {'phone': phone}}
+            elif name == 'verify-otp':
+                kwargs = {'json': {'session_id': session_id, 'code': '12345'}}
+            elif name == 'top':
+                await asyncio.sleep(self.args.think)  # the user browses the list
+                kwargs = {'params': {'session_id': session_id}}
+            else:
+                kwargs = {
+                    'json': {'session_id': session_id, 'chat_ids': chat_ids, 'phone': phone, 'code': '12345'},
+                    'params': {'fields': self.args.fields} if self.args.fields else None
+                }
+            response = await self.call(name, method, url, **kwargs)
+            if response is None or response.status_code != 200:
+                self.failed_flows[name] += 1
+                return
+            body = response.json() if name != 'messages' else None
+            if name == 'send-otp':
+                session_id = body['session_id']
+            elif name == 'top':
+                chat_ids = [chat['chat_id'] for chat in body['top_chats'][:self.args.chats]]
+        self.flows.append(time.perf_counter() - start)
+
+    async def sample_rss(self, pids: List[int]):
+        while True:
+            self.last_rss = await asyncio.to_thread(rss_bytes, pids)
+            for stats in self.stats.values():
+                if stats.in_flight:
+                    stats.peak_rss = max(stats.peak_rss, self.last_rss)
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    async def run(self, pids: List[int]) -> Dict:
+        users = iter(range(self.args.users))
+
+        async def worker():
+            for index in users:
+                await self.flow(self.args.first_user + index)
+
+        sampler = asyncio.create_task(self.sample_rss(pids)) if pids and os.path.isdir('/proc') else None
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        finally:
+            if sampler:
+                sampler.cancel()
+        elapsed = time.perf_counter() - start
+
+        metrics_text = ''
+        response = await self.call('metrics', 'GET', '/metrics')
+        if response is not None and response.status_code == 200:
+            metrics_text = response.text
+        self.stats.pop('metrics', None)
+
+        flow_ms = np.array(self.flows) * 1000 if self.flows else np.zeros(1)
+        return {
+            'users': self.args.users, 'concurrency': self.args.concurrency, 'seconds': round(elapsed, 2),
+            'flows': {
+                'completed': len(self.flows), 'failed': dict(self.failed_flows),
+                'per_second': round(len(self.flows) / elapsed, 2),
+                'p50_ms': round(np.percentile(flow_ms, 50), 1), 'p95_ms': round(np.percentile(flow_ms, 95), 1)
+            },
+            'endpoints': {name: stats.summary(elapsed) for name, stats in self.stats.items()},
+            'metrics': [
+                line for line in metrics_text.splitlines()
+                if line.startswith(REPORTED_METRICS)
+            ]
+        }
+
+
+def configure_in_process():
+    """Fake backends and a scratch working directory, before the app is imported"""
+    os.environ['TELEGRAM_BACKEND'] = 'fake'
+    os.environ['LLM_BACKEND'] = 'fake'  # Never hit the real API from the load test
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('PROFILE_SAMPLE_RATE', '0')
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    # sessions/ and cache/ are relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='wrapped-loadtest-'))
+
+
+@asynccontextmanager
+async def in_process_client():
+    import httpx
+    import cpu_pool
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        # Wait until every CPU worker has started and imported, as a deployed server has before traffic
+        await asyncio.gather(*(cpu_pool.run_cpu(time.sleep, WARMUP_TASK_SECONDS) for _ in range(cpu_pool.CPU_WORKERS)))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest') as http:
+            yield http
+
+
+async def run(args) -> Dict:
+    import httpx
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url) as http:
+            return await LoadTest(http, args).run(args.pid or [])
+    async with in_process_client() as http:
+        return await LoadTest(http, args).run([os.getpid()])
+
+
+def run_cpu_pool_variants(args) -> Dict[str, Dict]:
+    """The in-process test with and without the CPU tier, each in a fresh child process"""
+    argv = ['--users', str(args.users), '--concurrency', str(args.concurrency), '--chats', str(args.chats),
+            '--fields', args.fields, '--think', str(args.think), '--first-user', str(args.first_user),
+            '--max-retries', str(args.max_retries), '--timeout', str(args.timeout)]
+    reports = {}
+    for name, cpu_workers in CPU_POOL_VARIANTS:
+        env = dict(os.environ)
+        if cpu_workers is not None:
+            env['CPU_WORKERS'] = cpu_workers
+        with tempfile.TemporaryDirectory(prefix='wrapped-loadtest-') as scratch:
+            path = os.path.join(scratch, 'report.json')
+            print(f"--- {name}")
+            subprocess.run([sys.executable, '-m', 'loadtest.run', *argv, '--json', path],
+                           env=env, cwd=BACKEND_DIR, check=True)
+            with open(path, 'r', encoding='utf-8') as f:
+                reports[name] = json.load(f)
+        print()
+    return reports
+
+
+def print_comparison(reports: Dict[str, Dict]):
+    names = list(reports)
+    print(f"{'endpoint':<12}" + ''.join(f" {f'p50 {n}':>14} {f'p99 {n}':>14}" for n in names))
+    for endpoint in reports[names[0]]['endpoints']:
+        row = f"{endpoint:<12}"
+        for name in names:
+            stats = reports[name]['endpoints'].get(endpoint, {})
+            row += f" {stats.get('p50_ms', float('nan')):>14.1f} {stats.get('p99_ms', float('nan')):>14.1f}"
+        print(row)
+    print(f"{'flows/s':<12}" + ''.join(f" {reports[n]['flows']['per_second']:>29.2f}" for n in names))
+
+
+def print_report(report: Dict):
+    flows = report['flows']
+    print(f"{report['users']} users, concurrency {report['concurrency']}: {flows['completed']} flows in "
+          f"{report['seconds']}s ({flows['per_second']}/s), flow p50 {flows['p50_ms']:.0f} ms p95 {flows['p95_ms']:.0f} ms"
+          + (f", failed at {flows['failed']}" if flows['failed'] else ''))
+    print(f"\n{'endpoint':<12} {'requests':>8} {'ok':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+          f"{'req/s':>7} {'peak RSS':>9}  statuses")
+    for name, s in report['endpoints'].items():
+        print(f"{name:<12} {s['requests']:>8} {s['ok']:>6} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+              f"{s['max_ms']:>9.1f} {s['throughput']:>7.2f} {s['peak_rss_mb']:>7.1f}MB  {s['statuses']}")
+    if report['metrics']:
+        print('\n' + '\n'.join(report['metrics']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=40, help='User flows to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Flows in progress at once')
+    parser.add_argument('--chats', type=int, default=3, help='Chats per Wrapped (the top ones)')
+    parser.add_argument('--fields', default='aggregate', help='fields= of /chats/messages (empty for the full payload)')
+    parser.add_argument('--think', type=float, default=0.0, help='Seconds between login and the chat list')
+    parser.add_argument('--first-user', type=int, default=0, help='Phone number index of the first user')
+    parser.add_argument('--max-retries', type=int, default=3, help='Retries of a 429 answer')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Per-request timeout (seconds)')
+    parser.add_argument('--url', help='Running server to test (default: the app in this process)')
+    parser.add_argument('--pid', type=int, action='append', help='Server process to sample RSS of (with --url)')
+    parser.add_argument('--json', help='Also write the report here')
+    parser.add_argument('--compare-cpu-pool', action='store_true',
+                        help='Run in-process with and without the CPU worker tier and compare latencies')
+    args = parser.parse_args()
+
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    if args.compare_cpu_pool:
+        if args.url:
+            parser.error('--compare-cpu-pool runs the app in-process; for --url start one server per setting')
+        reports = run_cpu_pool_variants(args)
+        print_comparison(reports)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(reports, f, indent=2)
+        return
+    if not args.url:
+        configure_in_process()
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,84 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
 from pydantic import BaseModel
 import uuid
 from datetime import datetime, timedelta, timezone
-from telethon.tl.types import MessageService
 import json
 
-from telegram.client import get_client, get_lock
+from telegram.client import close_sessions, connected_client, get_client, get_lock
 from telegram.auth import send_otp, verify_otp
-from telegram.chats import get_top_chats
-from telegram.session_store import load_sessions, save_sessions
+from telegram.chats import fetch_chat_messages, get_top_chats, oldest_visible_id
+from telegram.prefetch import Prefetcher, cached_top_chats
+from telegram.session_store import get_session, put_session, update_session
+import cpu_pool
+from admission import AdmissionRejected, get_controller as get_admission
 from orchestrator import TelegramWrappedOrchestrator
+from telemetry import REGISTRY, ProfilingMiddleware, ServerTimingMiddleware, span
+from telemetry.metrics import CHAT_ARTIFACT_LOOKUPS, MESSAGE_CACHE_LOOKUPS
+from utils import CompressionMiddleware, FastJSONResponse, parse_fields, select_fields, wants
+from utils.summary_card import SummaryCardStore
+from wrapper.chat_artifacts import is_shared_chat, make_watermark, scoped_chat_key
+from wrapper.temporal_analyzer import resolve_timezone
+from wrapper.usage_ledger import PROCESS_USAGE
+
+PIPELINE_QUEUE_SIZE = 2  # Fetched chats waiting for an analysis slot
+CARD_CACHE_CONTROL = "public, max-age=31536000, immutable"  # card URLs are content hashes
+# Heavy modules imported lazily on first use; warmed in the background once the server is up
+PRELOAD_MODULES = [m for m in os.getenv('PRELOAD_MODULES', 'openai,telethon,wordcloud').split(',') if m]
+
+
+def _preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+_preload: asyncio.Task = None
+
+
+async def modules_loaded():
+    """Wait for the background preload before importing any of its modules on the loop
+
+    Importing a package another thread is still importing can hand back a partially
+    initialized module (telethon's circular imports fail that way).
+    """
+    if _preload is not None:
+        await asyncio.shield(_preload)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _preload
+    # Not awaited: /health answers while the imports finish in a worker thread
+    preload = _preload = asyncio.create_task(asyncio.to_thread(_preload_modules))
+    # Prefetched message texts and chat artifacts are deleted once expired, also when nothing new is stored
+    sweepers = [asyncio.create_task(prefetcher.cache.sweep()), asyncio.create_task(prefetcher.artifacts.sweep())]
+    cpu_pool.start()
+    yield
+    preload.cancel()
+    for sweeper in sweepers:
+        sweeper.cancel()
+    prefetcher.shutdown()
+    await close_sessions()
+    cpu_pool.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def admission_busy() -> bool:
+    return await get_admission().queued() > 0
+
+
+# Dialogs and recent chats fetched after login; downloads wait while Wrapped jobs queue for admission
+prefetcher = Prefetcher(busy=admission_busy)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,7 +86,12 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Compression and profiling sit inside Server-Timing so its total and the profiles cover them
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 
 # -------------------------------
 # Pydantic models for requests
@@ -42,6 +113,7 @@ class FetchMessagesRequest(BaseModel):
     phone: str
     code: str
     password: str = None  # Optional, for 2FA
+    timezone: str = None  # Optional IANA name for hour/day stats, defaults to UTC
 
 # -------------------------------
 # Endpoints
@@ -52,20 +124,17 @@ async def send_otp_endpoint(request: OTPRequest):
     phone = request.phone
     session_id = str(uuid.uuid4())
 
-    # Load existing sessions
-    sessions = load_sessions()
-
+    await modules_loaded()
     async with get_lock(session_id):
         client = get_client(session_id)
         # Send OTP — this returns phone_code_hash
         phone_code_hash = await send_otp(client, phone)
 
     # Store session info: phone + phone_code_hash
-    sessions[session_id] = {
+    put_session(session_id, {
         "phone": phone,
         "phone_code_hash": phone_code_hash
-    }
-    save_sessions(sessions)
+    })
 
     return {"session_id": session_id}
 
@@ -76,18 +145,16 @@ async def verify_otp_endpoint(request: OTPVerify):
     code = request.code
     password = request.password
 
-    sessions = load_sessions()
-    session = sessions.get(session_id)
+    session = get_session(session_id)
     if not session:
         raise HTTPException(400, "Invalid session")
 
     phone = session["phone"]
     phone_code_hash = session["phone_code_hash"]
 
+    await modules_loaded()
     async with get_lock(session_id):
-        client = get_client(session_id)
-        if not client.is_connected():
-            await client.connect()
+        client = await connected_client(session_id)
 
         try:
             # 1. Verify the OTP
@@ -98,8 +165,10 @@ async def verify_otp_endpoint(request: OTPVerify):
             user_id = me.id
 
             # 3. Update the session store with the new user_id
-            sessions[session_id]["user_id"] = user_id
-            save_sessions(sessions)
+            update_session(session_id, user_id=user_id)
+
+            # 4. Warm the chat list and the likely chats while the user browses
+            prefetcher.start(session_id, user_id)
 
             return {
                 "status": "authenticated",
@@ -114,76 +183,176 @@ async def verify_otp_endpoint(request: OTPVerify):
 @app.get("/chats/top")
 async def top_chats_endpoint(session_id: str):
     # Load session
-    sessions = load_sessions()
-    session = sessions.get(session_id)
+    session = get_session(session_id)
     if not session:
         raise HTTPException(400, "Invalid session")
 
-    async with get_lock(session_id):
-        client = get_client(session_id)
-        if not client.is_connected():
-            await client.connect()
-        chats = await get_top_chats(client)
+    # Warmed by the login prefetch; checked again after the lock, which a running prefetch holds
+    chats = cached_top_chats(session_id)
+    if chats is None:
+        await modules_loaded()
+        async with get_lock(session_id):
+            chats = cached_top_chats(session_id)
+            if chats is None:
+                client = await connected_client(session_id)
+                chats = await get_top_chats(client)
 
     return {"top_chats": chats}
 
 
-@app.post("/chats/messages")
-async def fetch_messages_endpoint(request: FetchMessagesRequest):
+@app.post("/chats/messages", response_class=FastJSONResponse)
+async def fetch_messages_endpoint(
+    request: FetchMessagesRequest,
+    fields: str = Query(None, description="Comma-separated paths to return, e.g. aggregate.persona,per_chat.top_words"),
+):
     session_id = request.session_id
     chat_ids = request.chat_ids
 
-    sessions = load_sessions()
+    session = get_session(session_id)
 
-    if session_id not in sessions:
+    if session is None:
         raise HTTPException(400, "Invalid session")
 
-    user_id = sessions[session_id]["user_id"]
+    user_id = session["user_id"]
+
+    try:
+        resolve_timezone(request.timezone)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
     # Define the cutoff (1 year ago from now)
     one_year_ago = datetime.now(timezone.utc) - timedelta(days=365)
 
-    all_chat_data = {}
-
-    async with get_lock(session_id):
-        client = get_client(session_id)
-        if not client.is_connected():
-            await client.connect()
-
-        try:
-            for chat_id in chat_ids:
-                messages = []
-                # iter_messages pulls from newest to oldest
-                async for msg in client.iter_messages(chat_id):
-                    # Stop if message is older than 1 year
-                    if msg.date < one_year_ago:
-                        break
-
-                    # Only keep text messages, ignore service messages (joins/leaves)
-                    if msg.text and not isinstance(msg, MessageService):
-                        messages.append({
-                            "text": msg.text,
-                            "date": msg.date.isoformat(),
-                            "sender_id": msg.sender_id
-                        })
-
-                all_chat_data[chat_id] = messages
+    # Fetched chats wait here for analysis; a full queue pauses fetching (bounded memory)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    async def fetch_chats():
+        # A running prefetch finishes the chat it is downloading if it is one of these, otherwise stops
+        prefetcher.yield_to(session_id, chat_ids)
+        await modules_loaded()
+        async with get_lock(session_id):
+            client = await connected_client(session_id)
+
+            try:
+                for chat_id in chat_ids:
+                    # Group chats another member analyzed at this watermark are not downloaded again.
+                    # The lookup goes through this user's own client, so it fails unless they can read the chat,
+                    # and only matches members who can read as far back (groups may hide their history).
+                    with span('watermark', chat_id=chat_id):
+                        latest = await client.get_messages(chat_id, limit=1)
+                        visible_from = None
+                        if is_shared_chat(str(chat_id)):
+                            visible_from = await oldest_visible_id(client, chat_id)
+                            # The persona endpoint looks the chat up under the same key
+                            update_session(session_id, visible_from={str(chat_id): visible_from})
+                    chat_key = scoped_chat_key(str(chat_id), str(user_id), visible_from)
+                    watermark = make_watermark(latest[0].id if latest else 0, one_year_ago)
+                    if orchestrator.artifacts.has(chat_key, watermark):
+                        CHAT_ARTIFACT_LOOKUPS.inc(result="hit")
+                        await queue.put({"cached_chat": chat_key, "watermark": watermark})
+                        continue
+                    CHAT_ARTIFACT_LOOKUPS.inc(result="miss")
+
+                    # Prefetched after login: only messages newer than the download are fetched
+                    cached = await asyncio.to_thread(prefetcher.cache.get, chat_key)
+                    if cached is not None and cached["cutoff"] <= one_year_ago:
+                        MESSAGE_CACHE_LOOKUPS.inc(result="hit")
+                        with span('fetch', chat_id=chat_id, prefetched=True):
+                            newer = []
+                            if latest and latest[0].id > cached["top_id"]:
+                                newer = await fetch_chat_messages(client, chat_id, one_year_ago, min_id=cached["top_id"])
+                        messages = newer + [
+                            m for m in cached["messages"] if datetime.fromisoformat(m["date"]) >= one_year_ago
+                        ]
+                    else:
+                        MESSAGE_CACHE_LOOKUPS.inc(result="miss")
+                        with span('fetch', chat_id=chat_id):
+                            messages = await fetch_chat_messages(client, chat_id, one_year_ago)
+
+                    # Each chat needs format: {data: {chat_id: [msgs]}}
+                    await queue.put({"data": {str(chat_id): messages}, "watermark": watermark, "visible_from": visible_from})
+
+            except Exception as e:
+                raise HTTPException(500, f"Error fetching messages: {str(e)}")
+
+        # End of chats, only after a normal finish: on failure or cancellation the endpoint stops
+        # the consumer, and a put on a full queue nobody reads would never return
+        await queue.put(None)
+
+    # Word clouds are the costliest slice; skip rendering them unless selected
+    selection = parse_fields(fields)
+    orchestrator = TelegramWrappedOrchestrator(
+        wordclouds=wants(selection, "aggregate.wordcloud_image") or wants(selection, "per_chat.wordcloud_image"),
+        summary_cards=wants(selection, "aggregate.summary_card")
+    )
+
+    # Wait for a job slot: bounded globally and per user, small jobs first
+    try:
+        ticket = await get_admission().acquire(str(user_id), cost=len(chat_ids))
+    except AdmissionRejected as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+
+    # Analysis of each chat starts as soon as its fetch completes
+    producer = asyncio.create_task(fetch_chats())
+    consumer = asyncio.create_task(orchestrator.analyze_chat_queue(queue, str(user_id), request.timezone))
+    try:
+        # Whichever side fails first stops the other
+        await asyncio.wait({producer, consumer}, return_when=asyncio.FIRST_EXCEPTION)
+        if producer.done() and producer.exception() is not None:
+            raise producer.exception()
+        return FastJSONResponse(select_fields(await consumer, selection))
+    finally:
+        for task in (producer, consumer):
+            if not task.done():
+                task.cancel()
+        get_admission().release(ticket)
+
+
+@app.get("/chats/queue")
+async def queue_status_endpoint(session_id: str):
+    """The user's Wrapped jobs: running, queued and queue position (poll while a job waits)"""
+    session = get_session(session_id)
+    if not session or "user_id" not in session:
+        raise HTTPException(400, "Invalid session")
+    return await get_admission().status(str(session["user_id"]))
 
-        except Exception as e:
-            raise HTTPException(500, f"Error fetching messages: {str(e)}")
 
-    # Convert to list of chat data dicts for analyze_multi_chat
-    # Each chat needs format: {data: {chat_id: [msgs]}}
-    chats_list = [
-        {"data": {str(chat_id): msgs}}
-        for chat_id, msgs in all_chat_data.items()
-    ]
+@app.get("/chats/{chat_id}/persona")
+async def chat_persona_endpoint(chat_id: int, session_id: str):
+    """Per-chat persona, matched on first access (the Wrapped itself only includes the aggregate one)"""
+    session = get_session(session_id)
+    if not session or "user_id" not in session:
+        raise HTTPException(400, "Invalid session")
 
     orchestrator = TelegramWrappedOrchestrator()
+    visible_from = (session.get("visible_from") or {}).get(str(chat_id))
+    persona = await orchestrator.chat_persona(str(chat_id), str(session["user_id"]), visible_from)
+    if persona is None:
+        raise HTTPException(404, "Chat has not been analyzed yet")
+    return {"chat_id": chat_id, "persona": persona}
+
 
-    return await orchestrator.analyze_multi_chat(chats_list, str(user_id))
+@app.get("/cards/{card_hash}.png")
+async def summary_card_endpoint(card_hash: str):
+    """Shareable summary card of a Wrapped (URL from aggregate.summary_card; waits if still rendering)"""
+    path = await SummaryCardStore().image(card_hash)
+    if path is None:
+        raise HTTPException(404, "Unknown card")
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": CARD_CACHE_CONTROL})
 
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: stage timings, request latency, LLM tokens"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    """Process-wide LLM usage: tokens (incl. provider-cached), cost, time-to-first-token"""
+    return PROCESS_USAGE.summary()
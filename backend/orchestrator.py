@@ -4,19 +4,57 @@ Main interface for analyzing chat exports
 """
 
 import asyncio
-from typing import Dict, List, Any, Optional
-from collections import Counter
+import hashlib
+from typing import Dict, List, Any, Optional, Sequence
+from collections import Counter, defaultdict
+
+import numpy as np
 
 from json_parser.json_parser import TelegramExportParser
+from telemetry import span
 from wrapper.frequency_couner import FrequencyCounter
+from wrapper.deadlines import job_deadline
 from wrapper.llm_analyzer import LLMAnalyzer
+from wrapper.chat_artifacts import ChatArtifactStore, is_shared_chat, scoped_chat_key
+from wrapper.member_stats import MemberStats, empty_member_stats
+from wrapper.message_batch import pack_export, unpack_export
+from wrapper.reply_graph import ReplyGraph
+from wrapper.month_store import MonthStore, is_scored, month_fingerprint
+from wrapper.phrase_counter import PhraseCounter
+from wrapper.temporal_analyzer import TemporalAnalyzer, parse_timestamps
+from wrapper.tokenizer import Tokenizer, detect_languages, get_tokenizer
+from wrapper.usage_ledger import usage_scope
+from cpu_pool import run_cpu
+from utils.summary_card import SummaryCardStore, card_data
+
+PIPELINE_MAX_INFLIGHT = 4  # Chats analyzed concurrently by analyze_chat_queue
 
 
 class TelegramWrappedOrchestrator:
     """Orchestrate full chat analysis pipeline"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        month_store: Optional[MonthStore] = None,
+        wordclouds: bool = True,
+        languages: Optional[Sequence[str]] = None,
+        artifacts: Optional[ChatArtifactStore] = None,
+        summary_cards: bool = True
+    ):
+        """
+        Args:
+            month_store: Per-chat month cache (default: on-disk store)
+            wordclouds: Render word cloud images; off when the caller won't use them ('' is returned)
+            languages: Stopword languages for every chat (default: detected per chat)
+            artifacts: Chat analyses shared between members (default: on-disk store)
+            summary_cards: Render the shareable summary card in the background ('' is returned when off)
+        """
         self.llm = LLMAnalyzer()
+        self.month_store = month_store if month_store is not None else MonthStore()
+        self.artifacts = artifacts if artifacts is not None else ChatArtifactStore()
+        self.wordclouds = wordclouds
+        self.summary_cards = summary_cards
+        self.languages = tuple(languages) if languages else None
 
     def get_chat_users(self, json_data: Dict) -> Dict[str, Dict]:
         """Get users in chat before analysis
@@ -32,81 +70,524 @@ class TelegramWrappedOrchestrator:
         parser.filter_text_messages()
         return parser.get_user_stats()
 
-    async def analyze_chat(self, json_data: Dict, user_id: str) -> Dict[str, Any]:
+    async def analyze_chat(
+        self,
+        json_data: Dict,
+        user_id: str,
+        tz: Optional[str] = None,
+        include_persona: bool = False
+    ) -> Dict[str, Any]:
         """Analyze single chat for a specific user
 
         Args:
-            json_data: Raw Telegram export JSON
+            json_data: Raw Telegram export JSON, optionally with a 'watermark' (its artifact is then
+                stored for other members) and, for a group, the user's 'visible_from' message id
+                (see scoped_chat_key), or {'cached_chat': key} to use a stored artifact instead
             user_id: Target user ID to analyze
+            tz: User's IANA timezone for temporal stats (None = UTC)
+            include_persona: Match the chat persona now; otherwise only an already cached
+                one is returned and the rest are computed on demand (see chat_persona)
 
         Returns:
             Full analysis results dict
         """
-        # 1. Parse JSON
-        parser = TelegramExportParser(json_data)
-        parser.load_export()
-        parser.filter_text_messages()
-        parser.add_month_field()
+        # 1-2. Local analysis in the CPU tier, so fetching and LLM calls keep running meanwhile
+        if json_data.get('cached_chat'):
+            result, state, chat_key, dirty = await run_cpu(
+                self._analyze_cached_chat, json_data['cached_chat'], user_id, tz,
+                self.month_store, self.artifacts, self.wordclouds, self.llm.sentiment_mode
+            )
+        else:
+            # Only the compact batch crosses to the worker (packed off the event loop)
+            batch = await asyncio.to_thread(pack_export, json_data)
+            result, state, chat_key, dirty = await run_cpu(
+                self._analyze_chat_local, batch, user_id, tz, self.month_store, self.wordclouds, self.languages,
+                self.artifacts, json_data.get('watermark'), self.llm.sentiment_mode, json_data.get('visible_from')
+            )
+
+        # 3. Sentiment analysis (all messages for context) - only dirty months hit the LLM
+        # Bounded by the job deadline (set by analyze_multi_chat, or here for a single chat)
+        with job_deadline(), usage_scope(chat_key):
+            sentiment = await self._score_sentiment_months(state, dirty)
+
+            # 4. Persona: off the critical path unless asked for, reused while the chat is unchanged
+            persona = self._cached_persona(state, str(user_id))
+            if persona is None and include_persona:
+                top_words = list(result['word_frequency'].keys())[:20]
+                persona = await self.llm.match_persona(sentiment, top_words, essential=False)
+                self._cache_persona(state, str(user_id), persona)
+            # Merged under the chat's lock: concurrent requests and other members keep their changes
+            await asyncio.to_thread(self.month_store.save, chat_key, state, str(user_id))
+
+        result['sentiment_by_month'] = sentiment
+        result['persona'] = persona
+        result['yearly_vibe'] = persona.get('yearly_vibe', '') if persona else ''
+        return result
+
+    @staticmethod
+    def _analyze_chat_local(
+        batch: Dict,
+        user_id: str,
+        tz: Optional[str],
+        month_store: MonthStore,
+        wordclouds: bool,
+        languages: Optional[Sequence[str]] = None,
+        artifacts: Optional[ChatArtifactStore] = None,
+        watermark: Optional[str] = None,
+        sentiment_mode: str = 'llm',
+        visible_from: Optional[int] = None
+    ) -> tuple:
+        """Everything in analyze_chat that needs no API calls (CPU-bound, runs in a CPU worker)
+
+        A staticmethod with picklable arguments, so it can run in another process.
+        The chat arrives as a message batch (see wrapper.message_batch).
 
-        # Get all messages (for sentiment context)
-        all_data = parser.get_structured_data()
+        Returns:
+            (result without sentiment/persona, month store state, chat_key, {dirty month: samples})
+        """
+        with span('unpack'):
+            json_data = unpack_export(batch)
+        artifact, messages = TelegramWrappedOrchestrator._build_artifact(json_data, languages)
+
+        # Incremental state: only months whose contents changed get recomputed
+        chat_key = scoped_chat_key('_'.join(artifact['chat_ids']), str(user_id), visible_from)
+        state = month_store.load(chat_key)
+
+        # Month samples for whatever sentiment is missing or stale (chat-wide, shared by all members)
+        with span('sampling'):
+            dirty = TelegramWrappedOrchestrator._prepare_sentiment_months(state, messages, sentiment_mode)
+
+        # Only groups and channels: a private chat's key is its owner's alone, nobody else could reuse it
+        if artifacts is not None and watermark and is_shared_chat(chat_key):
+            # Months travel with the artifact: a member arriving before this request saves
+            # its month state still finds the samples to score (sampled here for months already scored,
+            # the month store does not keep samples)
+            by_month = TelegramWrappedOrchestrator._messages_by_month(messages)
+            artifact['months'] = {
+                month: {
+                    'fingerprint': bucket['fingerprint'],
+                    'samples': dirty[month] if month in dirty else LLMAnalyzer.sample_month(by_month[month])
+                }
+                for month, bucket in state['months'].items()
+            }
+            with span('artifact_save'):
+                artifacts.save(chat_key, artifact, watermark)
+
+        result = TelegramWrappedOrchestrator._member_result(artifact, str(user_id), tz, state, wordclouds)
+        return result, state, chat_key, dirty
+
+    @staticmethod
+    def _analyze_cached_chat(
+        chat_key: str,
+        user_id: str,
+        tz: Optional[str],
+        month_store: MonthStore,
+        artifacts: ChatArtifactStore,
+        wordclouds: bool,
+        sentiment_mode: str = 'llm'
+    ) -> tuple:
+        """_analyze_chat_local from a stored chat artifact: no parsing or chat-wide work
 
-        # Get user-specific messages
-        user_messages = parser.get_user_messages(user_id)
-        user_text = '\n'.join(msg.get('text', '') for msg in user_messages)
+        Returns:
+            Same as _analyze_chat_local
+        """
+        with span('artifact_load'):
+            artifact = artifacts.load(chat_key)
+        if artifact is None:
+            raise LookupError(f"Chat artifact {chat_key} is gone, retry the request")
+        state = month_store.load(chat_key)
+
+        # The artifact's months whose stored sentiment is missing (not saved yet), stale, failed or from another mode
+        with span('sampling'):
+            dirty = TelegramWrappedOrchestrator._reuse_sentiment_months(state, artifact['months'], sentiment_mode)
+        result = TelegramWrappedOrchestrator._member_result(artifact, str(user_id), tz, state, wordclouds)
+        return result, state, chat_key, dirty
+
+    @staticmethod
+    def _build_artifact(json_data: Dict, languages: Optional[Sequence[str]] = None) -> tuple:
+        """Chat-wide analysis, the same for every member (see ChatArtifactStore for the layout)
 
-        # 2. Frequency analysis (local, no API)
-        freq_counter = FrequencyCounter(user_text)
-        word_freq = freq_counter.count_words(top_n=50)
-        emoji_freq = freq_counter.count_emojis()
-        wordcloud_b64 = freq_counter.generate_wordcloud()
+        Returns:
+            (artifact, all parsed messages with month field)
+        """
+        # 1. Parse JSON
+        with span('parse'):
+            parser = TelegramExportParser(json_data)
+            parser.load_export()
+            parser.filter_text_messages()
+            parser.add_month_field()
+
+            # Get all messages (for sentiment context)
+            all_data = parser.get_structured_data()
+
+            # Stopword languages, detected once per chat from a sample of its text
+            if not languages:
+                languages = detect_languages([msg.get('text', '') for msg in parser.messages])
+            tokenizer = get_tokenizer(tuple(sorted(set(languages))))
+
+        # Per-member stats for everyone in one pass (also buckets messages by member)
+        with span('members'):
+            members = MemberStats(parser.messages, tokenizer)
+            member_stats = members.compute()
+
+        # Timestamps + reply graph (vectorized over all dated messages)
+        with span('replies'):
+            dated = [msg for msg in parser.messages if msg.get('date')]
+            all_timestamps = parse_timestamps([msg['date'] for msg in dated])
+            replies = ReplyGraph(dated, all_timestamps)
+
+        artifact = {
+            'chat_ids': all_data.get('chat_ids', []),
+            'date_range': parser.get_date_range(),
+            'total_in_chat': len(parser.messages),
+            'languages': tokenizer.languages,
+            'members': member_stats,
+            'leaderboard': members.leaderboard(),
+            'messages_by_member': dict(members.messages_by_member),
+            'timestamps': all_timestamps,
+            'from_ids': np.array([msg['from_id'] for msg in dated], dtype=str),
+            'replies': replies
+        }
+        return artifact, all_data['messages']
 
-        # 3. Sentiment analysis (all messages for context) - ASYNC PARALLEL
-        sentiment = await self.llm.analyze_sentiment_by_month(all_data['messages'])
+    @staticmethod
+    def _member_result(artifact: Dict, user_id: str, tz: Optional[str], state: Dict, wordclouds: bool) -> Dict[str, Any]:
+        """One member's Wrapped slice of a chat artifact
 
-        # 4. Persona matching based on sentiment + words - ASYNC
-        top_words = list(word_freq.keys())[:20]
-        persona = await self.llm.match_persona(sentiment, top_words)
+        The artifact holds every member's messages: only user_id's slice and
+        the chat-wide stats any member sees (leaderboard, reply graph) are read.
 
-        # 5. Build result
-        total_in_chat = len(parser.messages)
+        Returns:
+            Result without sentiment/persona
+        """
+        tokenizer = get_tokenizer(artifact['languages'])
+        user_messages = artifact['messages_by_member'].get(user_id, [])
+
+        # 2. Frequency analysis (local, no API) - per month, merged
+        with span('count'):
+            word_counts, emoji_counts = TelegramWrappedOrchestrator._update_user_months(
+                state, user_id, user_messages, tokenizer
+            )
+            freq_counter = FrequencyCounter.from_frequencies(word_counts, emoji_counts)
+            word_freq = freq_counter.count_words(top_n=50)
+            emoji_freq = freq_counter.count_emojis()
+            phrases = TelegramWrappedOrchestrator._merge_user_phrases(state['users'][user_id])
+        wordcloud_b64 = ''
+        if wordclouds:
+            with span('wordcloud'):
+                wordcloud_b64 = freq_counter.generate_wordcloud()
+
+        # Temporal activity + reply stats
+        with span('temporal'):
+            timestamps = artifact['timestamps'][artifact['from_ids'] == user_id]
+            activity = TemporalAnalyzer(timestamps, tz).get_stats()
+        with span('replies'):
+            replies = artifact['replies'].get_stats(user_id)
+
+        total_in_chat = artifact['total_in_chat']
         user_count = len(user_messages)
 
         return {
             'user_id': user_id,
-            'chat_ids': all_data.get('chat_ids', []),
-            'date_range': parser.get_date_range(),
+            'chat_ids': artifact['chat_ids'],
+            'date_range': artifact['date_range'],
             'message_stats': {
                 'total_in_chat': total_in_chat,
                 'user_count': user_count,
                 'user_percentage': round(user_count / total_in_chat * 100, 1) if total_in_chat else 0
             },
+            'languages': list(artifact['languages']),
             'word_frequency': word_freq,
             'emoji_frequency': emoji_freq,
             'wordcloud_image': wordcloud_b64,
-            'sentiment_by_month': sentiment,
-            'persona': persona,
-            'yearly_vibe': persona.get('yearly_vibe', ''),
+            'sentiment_by_month': None,  # Filled in by analyze_chat
+            'persona': None,
+            'yearly_vibe': '',
             'top_words': list(word_freq.keys())[:10],
             'top_emojis': list(emoji_freq.keys())[:5],
-            # Store parsed user messages for multi-chat aggregation
-            '_user_messages': user_messages
+            'top_phrases': phrases.top(),
+            'activity': activity,
+            'member_stats': artifact['members'].get(user_id) or empty_member_stats(user_id),
+            'leaderboard': artifact['leaderboard'],
+            'replies': replies,
+            # User's texts, phrase state and timestamps for multi-chat aggregation (internal, stripped from responses)
+            '_user_texts': [msg.get('text', '') for msg in user_messages],
+            '_phrases': phrases.to_dict(),
+            '_timestamps': timestamps
+        }
+
+    @staticmethod
+    def _update_user_months(state: Dict, user_id: str, user_messages: List[Dict], tokenizer: Tokenizer) -> tuple:
+        """Refresh the user's changed month buckets and merge all months
+
+        Args:
+            state: Month store state for the chat (updated in place)
+            user_id: Target user ID
+            user_messages: User's parsed messages (with month field)
+            tokenizer: Chat's tokenizer; buckets counted by another one are recounted
+
+        Returns:
+            (word_counts, emoji_counts) merged across months
+        """
+        by_month = defaultdict(list)
+        for msg in user_messages:
+            by_month[msg.get('month', 'unknown')].append(msg)
+
+        stored = state['users'].get(user_id, {})
+        user_months = {}
+        for month, msgs in by_month.items():
+            fingerprint = month_fingerprint(msgs)
+            bucket = stored.get(month)
+            stale = not bucket or bucket.get('fingerprint') != fingerprint or bucket.get('tokenizer') != tokenizer.key
+            if stale or 'phrases' not in bucket:
+                counter = FrequencyCounter('\n'.join(msg.get('text', '') for msg in msgs), tokenizer, phrases=True)
+                bucket = {
+                    'fingerprint': fingerprint,
+                    'tokenizer': tokenizer.key,
+                    'message_count': len(msgs),
+                    'word_counts': counter.count_words(top_n=None),
+                    'emoji_counts': counter.count_emojis(),
+                    'phrases': counter.count_phrases().to_dict()
+                }
+            user_months[month] = bucket
+
+        # Months absent from the current window are dropped
+        state['users'][user_id] = user_months
+        return TelegramWrappedOrchestrator._merge_user_months(user_months)
+
+    @staticmethod
+    def _render_wordcloud(text: str, languages: Sequence[str]) -> str:
+        """Aggregate word cloud image (picklable entry point for the CPU tier)"""
+        return FrequencyCounter(text, get_tokenizer(tuple(sorted(set(languages))))).generate_wordcloud()
+
+    @staticmethod
+    def _merge_user_months(user_months: Dict[str, Dict]) -> tuple:
+        """(word_counts, emoji_counts) summed over the user's month buckets"""
+        word_counts = Counter()
+        emoji_counts = Counter()
+        for bucket in user_months.values():
+            word_counts.update(bucket['word_counts'])
+            emoji_counts.update(bucket['emoji_counts'])
+        return word_counts, emoji_counts
+
+    @staticmethod
+    def _merge_user_phrases(user_months: Dict[str, Dict]) -> PhraseCounter:
+        """Phrase counts summed over the user's month buckets"""
+        return PhraseCounter.from_states(bucket.get('phrases') for bucket in user_months.values())
+
+    @staticmethod
+    def _messages_by_month(messages: List[Dict]) -> Dict[str, List[Dict]]:
+        by_month = defaultdict(list)
+        for msg in messages:
+            by_month[msg.get('month', 'unknown')].append(msg)
+        return by_month
+
+    @staticmethod
+    def _prepare_sentiment_months(state: Dict, messages: List[Dict], mode: str = 'llm') -> Dict[str, List[str]]:
+        """Keep months whose messages are unchanged, sample the rest for re-scoring
+
+        Args:
+            state: Month store state for the chat (updated in place)
+            messages: All parsed messages in the chat (with month field)
+            mode: Sentiment mode; months scored in another mode are re-scored
+
+        Returns:
+            {month: samples} for months that need (re-)scoring
+        """
+        by_month = TelegramWrappedOrchestrator._messages_by_month(messages)
+        stored = state['months']
+        months = {}
+        dirty = {}
+        for month, msgs in by_month.items():
+            fingerprint = month_fingerprint(msgs)
+            bucket = stored.get(month)
+            if bucket and bucket.get('fingerprint') == fingerprint and is_scored(bucket, mode):
+                months[month] = bucket
+                continue
+            months[month] = {'fingerprint': fingerprint, 'mode': mode, 'sentiment': None}
+            dirty[month] = LLMAnalyzer.sample_month(msgs)
+
+        state['months'] = months
+        return dirty
+
+    @staticmethod
+    def _reuse_sentiment_months(state: Dict, months: Dict[str, Dict], mode: str = 'llm') -> Dict[str, List[str]]:
+        """_prepare_sentiment_months from an artifact's month fingerprints and samples
+
+        Returns:
+            {month: samples} for months that need (re-)scoring
+        """
+        stored = state['months']
+        buckets = {}
+        dirty = {}
+        for month, window in months.items():
+            bucket = stored.get(month)
+            if bucket and bucket.get('fingerprint') == window['fingerprint'] and is_scored(bucket, mode):
+                buckets[month] = bucket
+                continue
+            buckets[month] = {'fingerprint': window['fingerprint'], 'mode': mode, 'sentiment': None}
+            dirty[month] = window['samples']
+
+        state['months'] = buckets
+        return dirty
+
+    async def _score_sentiment_months(self, state: Dict, dirty: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """Score the dirty months and merge them with the stored ones
+
+        Returns:
+            {month: sentiment dict} for every month in the current window
+        """
+        months = state['months']
+        fresh = await self.llm.score_months(dirty)
+        for month, result in fresh.items():
+            months[month]['sentiment'] = result
+            months[month]['mode'] = self.llm.sentiment_mode
+            # Failed and deadline-fallback months are not cached so the next run retries them
+            months[month]['retry'] = result.get('primary') == 'error' or bool(result.get('pending'))
+
+        return {month: bucket['sentiment'] for month, bucket in sorted(months.items())}
+
+    @staticmethod
+    def _persona_key(state: Dict, user_id: str) -> str:
+        """Fingerprint of everything a chat persona depends on (chat months + the user's months)"""
+        digest = hashlib.sha1()
+        for month, bucket in sorted(state['months'].items()):
+            digest.update(f"m|{month}|{bucket.get('fingerprint')}|{bucket.get('mode')}|{bucket.get('retry')}\n".encode('utf-8'))
+        for month, bucket in sorted(state['users'].get(user_id, {}).items()):
+            digest.update(f"u|{month}|{bucket.get('fingerprint')}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _cached_persona(self, state: Dict, user_id: str) -> Optional[Dict[str, Any]]:
+        cached = state['personas'].get(user_id)
+        if cached and cached.get('key') == self._persona_key(state, user_id):
+            return cached['persona']
+        return None
+
+    def _cache_persona(self, state: Dict, user_id: str, persona: Dict[str, Any]):
+        # Errors and deadline/budget fallbacks are retried on the next request
+        if persona.get('persona_id') == 'error' or persona.get('pending'):
+            return
+        state['personas'][user_id] = {'key': self._persona_key(state, user_id), 'persona': persona}
+
+    async def chat_persona(self, chat_key: str, user_id: str, visible_from: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Persona for one analyzed chat, matched on first access and cached in the month store
+
+        Args:
+            chat_key: The chat's id (scoped to the user, like the analysis)
+            user_id: Target user ID
+            visible_from: For a group, the user's oldest readable message id when it was analyzed
+
+        Returns:
+            Persona dict, or None if the chat was never analyzed for this user
+        """
+        user_id = str(user_id)
+        chat_key = scoped_chat_key(chat_key, user_id, visible_from)
+        state = self.month_store.load(chat_key)
+        user_months = state['users'].get(user_id)
+        if not state['months'] or user_months is None:
+            return None
+
+        persona = self._cached_persona(state, user_id)
+        if persona is not None:
+            return persona
+
+        sentiment = {
+            month: bucket['sentiment']
+            for month, bucket in sorted(state['months'].items())
+            if bucket.get('sentiment')
         }
+        word_counts, _ = self._merge_user_months(user_months)
+        top_words = list(FrequencyCounter.from_frequencies(word_counts, {}).count_words(top_n=20).keys())
+        with job_deadline(), usage_scope(chat_key):
+            persona = await self.llm.match_persona(sentiment, top_words)
+
+        # Cached under the chat's lock on the latest state; skipped if the chat changed meanwhile
+        key = self._persona_key(state, user_id)
+
+        def cache(latest: Dict):
+            if self._persona_key(latest, user_id) == key:
+                self._cache_persona(latest, user_id, persona)
 
-    async def analyze_multi_chat(self, chats: List[Dict], user_id: str) -> Dict[str, Any]:
+        await asyncio.to_thread(self.month_store.update, chat_key, cache)
+        return persona
+
+    async def analyze_multi_chat(self, chats: List[Dict], user_id: str, tz: Optional[str] = None) -> Dict[str, Any]:
         """Aggregate stats across multiple chats - PARALLEL
 
         Args:
             chats: List of raw Telegram export JSONs
             user_id: Target user ID to analyze
+            tz: User's IANA timezone for temporal stats (None = UTC)
 
         Returns:
             {per_chat: [...], aggregate: {...}}
         """
-        # Run all chat analyses in parallel
-        tasks = [self.analyze_chat(chat_data, user_id) for chat_data in chats]
-        per_chat_results = await asyncio.gather(*tasks)
+        # Run all chat analyses in parallel, LLM calls bounded by one job deadline
+        with job_deadline():
+            tasks = [self.analyze_chat(chat_data, user_id, tz) for chat_data in chats]
+            per_chat_results = await asyncio.gather(*tasks)
+            return await self.aggregate(per_chat_results, user_id, tz)
+
+    async def analyze_chat_queue(
+        self,
+        queue: asyncio.Queue,
+        user_id: str,
+        tz: Optional[str] = None,
+        max_inflight: int = PIPELINE_MAX_INFLIGHT
+    ) -> Dict[str, Any]:
+        """Analyze chats as a producer puts them on the queue, then aggregate
+
+        Each chat starts as soon as it arrives, so analysis overlaps fetching. At
+        most max_inflight chats are analyzed at once; while all slots are busy
+        nothing is taken off the queue, so a bounded queue makes the producer wait.
+        All LLM calls of the job, the aggregate persona included, share one job deadline.
+
+        Args:
+            queue: Raw Telegram export JSONs, None marks the end
+            user_id: Target user ID to analyze
+            tz: User's IANA timezone for temporal stats (None = UTC)
+            max_inflight: Chats analyzed concurrently
+
+        Returns:
+            {per_chat: [...], aggregate: {...}} like analyze_multi_chat (chats in arrival order)
+        """
+        slots = asyncio.Semaphore(max_inflight)
+        tasks = []
+
+        async def run(chat_data: Dict) -> Dict[str, Any]:
+            try:
+                return await self.analyze_chat(chat_data, user_id, tz)
+            finally:
+                slots.release()
+
+        # Tasks copy the context when created, so every chat runs under this deadline
+        with job_deadline():
+            try:
+                while True:
+                    await slots.acquire()
+                    chat_data = await queue.get()
+                    if chat_data is None:
+                        slots.release()
+                        break
+                    tasks.append(asyncio.create_task(run(chat_data)))
+                per_chat_results = await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+            return await self.aggregate(per_chat_results, user_id, tz)
+
+    async def aggregate(self, per_chat_results: List[Dict], user_id: str, tz: Optional[str] = None) -> Dict[str, Any]:
+        """Combine analyze_chat results into the Wrapped response
+
+        Args:
+            per_chat_results: analyze_chat outputs (with their internal '_' fields)
+            user_id: Target user ID
+            tz: User's IANA timezone for temporal stats (None = UTC)
 
+        Returns:
+            {per_chat: [...], aggregate: {...}}
+        """
         all_word_freq = Counter()
         all_emoji_freq = Counter()
         sentiment_by_month_raw = {}  # {month: [list of sentiment dicts]}
@@ -126,8 +607,10 @@ class TelegramWrappedOrchestrator:
                 sentiment_by_month_raw[month].append(data)
 
             # Use pre-parsed user messages (avoid duplicate parsing)
-            user_msgs = result.get('_user_messages', [])
-            all_user_text.extend(msg.get('text', '') for msg in user_msgs)
+            all_user_text.extend(result.get('_user_texts', []))
+
+        # Phrase states merge like word counts; scores are recomputed over all chats
+        all_phrases = PhraseCounter.from_states(result.get('_phrases') for result in per_chat_results)
 
         # Merge sentiments: keep most common emotion per month (tiebreaker: highest confidence)
         all_sentiment = {}
@@ -167,30 +650,44 @@ class TelegramWrappedOrchestrator:
                 'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
                 'vibe_summary': vibes[0] if vibes else ''
             }
+            if any(s.get('pending') for s in sentiments):
+                all_sentiment[month]['pending'] = True
 
-        # Generate aggregate wordcloud
+        # Generate aggregate wordcloud (in the CPU tier)
         combined_text = '\n'.join(all_user_text)
-        freq_counter = FrequencyCounter(combined_text)
-        aggregate_wordcloud = freq_counter.generate_wordcloud()
+        aggregate_wordcloud = ''
+        if self.wordclouds:
+            with span('wordcloud'):
+                languages = {language for r in per_chat_results for language in r['languages']}
+                aggregate_wordcloud = await run_cpu(self._render_wordcloud, combined_text, languages)
+
+        # Temporal activity across all chats + per-chat weekly timelines
+        all_timestamps = np.concatenate([r['_timestamps'] for r in per_chat_results]) if per_chat_results else np.empty(0, dtype=np.int64)
+        aggregate_activity = TemporalAnalyzer(all_timestamps, tz).get_stats()
+        chat_timelines = {
+            '_'.join(r['chat_ids']): r['activity']['weekly_timeline']
+            for r in per_chat_results
+        }
 
         # Persona matching on aggregate sentiment + words - ASYNC
         aggregate_top_words = [w for w, _ in all_word_freq.most_common(20)]
-        aggregate_persona = await self.llm.match_persona(all_sentiment, aggregate_top_words)
+        with job_deadline(), usage_scope('aggregate'):
+            aggregate_persona = await self.llm.match_persona(all_sentiment, aggregate_top_words)
 
         # Total stats
         total_messages = sum(r['message_stats']['user_count'] for r in per_chat_results)
 
-        # Remove internal _user_messages from results before returning
+        # Remove internal _user_texts/_phrases/_timestamps from results before returning
         clean_results = []
         for r in per_chat_results:
             clean_r = {k: v for k, v in r.items() if not k.startswith('_')}
             clean_results.append(clean_r)
 
-        return {
+        result = {
             'per_chat': clean_results,
             'aggregate': {
                 'user_id': user_id,
-                'total_chats': len(chats),
+                'total_chats': len(per_chat_results),
                 'total_messages': total_messages,
                 'word_frequency': dict(all_word_freq.most_common(50)),
                 'emoji_frequency': dict(all_emoji_freq.most_common(20)),
@@ -199,6 +696,17 @@ class TelegramWrappedOrchestrator:
                 'persona': aggregate_persona,
                 'yearly_vibe': aggregate_persona.get('yearly_vibe', ''),
                 'top_words': [w for w, _ in all_word_freq.most_common(10)],
-                'top_emojis': [e for e, _ in all_emoji_freq.most_common(5)]
+                'top_emojis': [e for e, _ in all_emoji_freq.most_common(5)],
+                'top_phrases': all_phrases.top(),
+                'hour_distribution': aggregate_activity.pop('hour_distribution'),
+                'activity': aggregate_activity,
+                'chat_timelines': chat_timelines,
+                'usage': self.llm.usage.summary()
             }
         }
+
+        # Not awaited: the card renders in the CPU tier while the client shows the Wrapped
+        result['aggregate']['summary_card'] = (
+            f"/cards/{SummaryCardStore().schedule(card_data(result['aggregate']))}.png" if self.summary_cards else ''
+        )
+        return result
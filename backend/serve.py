@@ -0,0 +1,42 @@
+"""
+API Supervisor
+Runs the API in N worker processes sharing one listening socket
+
+    python serve.py                     # WEB_CONCURRENCY workers, or one per core
+    python serve.py --workers 4 --port 8000
+
+Workers share login sessions through the SQLite session store and serialize
+use of each Telegram session with a file lock (see telegram.client.SessionLock),
+so any worker can serve any request. Admission limits are shared through the
+same store (see admission); metrics and LLM usage are per worker.
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+from telegram.session_store import init_store
+
+DEFAULT_WORKERS = int(os.getenv('WEB_CONCURRENCY', '0')) or os.cpu_count() or 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'info').lower())
+    args = parser.parse_args()
+
+    # Relative paths (sessions/, cache/) resolve from backend/ whatever the caller's cwd
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    # Create the store and import the legacy JSON once, before workers race for it
+    init_store()
+
+    # uvicorn supervises the workers: restarts any that die, forwards SIGINT/SIGTERM
+    uvicorn.run('main:app', host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == '__main__':
+    main()
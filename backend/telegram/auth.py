@@ -1,11 +1,10 @@
-from telethon.errors import SessionPasswordNeededError
-
 async def send_otp(client, phone):
     await client.connect()
     result = await client.send_code_request(phone)
     return result.phone_code_hash
 
 async def verify_otp(client, phone, code, phone_code_hash, password: str = None):
+    from telethon.errors import SessionPasswordNeededError
     await client.connect()
     
     try:
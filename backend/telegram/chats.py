@@ -1,20 +1,77 @@
-from telethon.tl.functions.messages import GetHistoryRequest
-from telethon.tl.types import Channel, Chat, User
+from datetime import datetime
+from typing import Callable, Optional
+
+
+async def get_top_dialogs(client, limit=50):
+    """Non-archived dialogs, most recently active first"""
+    dialogs = [d for d in await client.get_dialogs() if not d.archived]
+    dialogs.sort(key=lambda d: d.message.date.timestamp() if d.message else 0, reverse=True)
+    return dialogs[:limit]
+
+
+def chat_summary(dialog):
+    return {
+        "chat_id": dialog.id,
+        "name": dialog.name,
+        "last_message_date": dialog.message.date if dialog.message else None,
+        "unread_count": dialog.unread_count
+    }
+
 
 async def get_top_chats(client, limit=50):
-    dialogs = await client.get_dialogs()
-
-    top_chats = []
-    for d in dialogs:
-        if not d.archived:
-            top_chats.append({
-                "chat_id": d.id,
-                "name": d.name,
-                "last_message_date": d.message.date if d.message else None,
-                "unread_count": d.unread_count
-            })
+    # Sorted by last message date descending (most recently active chats first)
+    return [chat_summary(d) for d in await get_top_dialogs(client, limit)]
+
 
-    # Sort by last message date descending (most recently active chats first)
-    top_chats.sort(key=lambda x: x["last_message_date"] or 0, reverse=True)
+async def oldest_visible_id(client, chat_id: int) -> int:
+    """Id of the oldest message this account can read in the chat (0 if none)
 
-    return top_chats[:limit]
\ No newline at end of file
+    For a member of a group that hides its history from new members this is
+    where their view starts, not the group's first message.
+    """
+    oldest = await client.get_messages(chat_id, limit=1, reverse=True)
+    return oldest[0].id if oldest else 0
+
+
+async def fetch_chat_messages(
+    client,
+    chat_id: int,
+    cutoff: datetime,
+    min_id: int = 0,
+    should_stop: Optional[Callable[[int], bool]] = None
+) -> Optional[list]:
+    """Text messages of a chat newer than cutoff (and than min_id), newest first
+
+    Args:
+        client: Connected TelegramClient
+        chat_id: Chat to read
+        cutoff: Oldest message date kept
+        min_id: Only messages with a higher id (extends an earlier download)
+        should_stop: Called with the number of messages read so far; True abandons the download
+
+    Returns:
+        Message dicts, or None if should_stop abandoned the download
+    """
+    from telethon.tl.types import MessageService
+
+    messages = []
+    read = 0
+    # iter_messages pulls from newest to oldest
+    async for msg in client.iter_messages(chat_id, min_id=min_id):
+        # Stop if message is older than 1 year
+        if msg.date < cutoff:
+            break
+        read += 1
+        if should_stop is not None and should_stop(read):
+            return None
+
+        # Only keep text messages, ignore service messages (joins/leaves)
+        if msg.text and not isinstance(msg, MessageService):
+            messages.append({
+                "id": msg.id,
+                "text": msg.text,
+                "date": msg.date.isoformat(),
+                "sender_id": msg.sender_id,
+                "reply_to_msg_id": msg.reply_to_msg_id
+            })
+    return messages
@@ -1,19 +1,41 @@
-from telethon import TelegramClient
 from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Optional
 import os
 import asyncio
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker only, the in-process lock is all there is
+    fcntl = None
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
 
 load_dotenv()
 
-api_id = int(os.getenv("API_ID"))
+# TELEGRAM_BACKEND=fake swaps in the synthetic stand-in (load tests; see telegram.fake_client)
+TELEGRAM_BACKEND = os.getenv("TELEGRAM_BACKEND", "telethon")
+api_id = int(os.getenv("API_ID") or 0) if TELEGRAM_BACKEND == "fake" else int(os.getenv("API_ID"))
 api_hash = os.getenv("API_HASH")
 
-# Cache connected clients to avoid SQLite locking
-_clients: dict[str, TelegramClient] = {}
-_locks: dict[str, asyncio.Lock] = {}
+LOCK_POLL_MIN = 0.01  # seconds between attempts on a session held by another worker
+LOCK_POLL_MAX = 0.25
+# Seconds a released session stays connected (and flock'ed) in this worker for its next request;
+# cut short as soon as another worker asks for the session
+CLIENT_LINGER_SECONDS = float(os.getenv("TELEGRAM_CLIENT_LINGER_SECONDS", "30"))
+LINGER_POLL = 0.05  # seconds between checks for another worker asking for a lingering session
+
+# Clients of sessions this worker holds the flock for (dropped when it lets go, see SessionLock)
+_clients: dict[str, "TelegramClient"] = {}
+_locks: dict[str, "SessionLock"] = {}
 
-def get_client(session_id: str) -> TelegramClient:
+def get_client(session_id: str) -> "TelegramClient":
     """Get or create a TelegramClient for the given session_id."""
+    if TELEGRAM_BACKEND == "fake":
+        from telegram.fake_client import FakeTelegramClient as TelegramClient
+    else:
+        from telethon import TelegramClient  # imported on first use, not at API startup
     os.makedirs("sessions", exist_ok=True)
 
     if session_id not in _clients:
@@ -25,8 +47,134 @@ def get_client(session_id: str) -> TelegramClient:
 
     return _clients[session_id]
 
-def get_lock(session_id: str) -> asyncio.Lock:
-    """Get a lock for the given session to prevent concurrent access."""
+
+async def connected_client(session_id: str) -> "TelegramClient":
+    """get_client, connected. Call with the session's lock held."""
+    client = get_client(session_id)
+    if not client.is_connected():
+        await client.connect()
+    return client
+
+
+class SessionLock:
+    """Exclusive use of one Telegram session across tasks and worker processes.
+
+    An asyncio.Lock orders tasks inside this worker; an flock on
+    sessions/<session_id>.lock keeps other workers off the same Telethon
+    session file meanwhile. The flock is polled, so waiting never blocks the loop.
+
+    Telethon also writes the session file outside of requests (update state,
+    entity cache), so the client is disconnected and dropped before the flock
+    is released: its last writes land under the lock and the next holder, in
+    any worker, opens the file fresh.
+
+    Connecting costs round trips, so on release the worker keeps the flock
+    and the connected client for CLIENT_LINGER_SECONDS: the session's next
+    request in this worker (the prefetcher's next chat, the user's next
+    endpoint) finds it connected. A worker waiting for the flock touches
+    sessions/<session_id>.want, and the holder lets go within LINGER_POLL.
+    """
+
+    def __init__(self, session_id: str):
+        self._session_id = session_id
+        self._lock = asyncio.Lock()
+        self._path = f"sessions/{session_id}.lock"
+        self._want_path = f"sessions/{session_id}.want"
+        self._fd = None
+        self._linger: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        await self._lock.acquire()
+        # Holding the asyncio lock, so a lingering close is not under way: take over its flock
+        if self._linger is not None:
+            self._linger.cancel()
+            self._linger = None
+        if self._fd is not None:
+            return self
+        try:
+            if fcntl is not None:
+                os.makedirs("sessions", exist_ok=True)
+                self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                delay = LOCK_POLL_MIN
+                while True:
+                    try:
+                        fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        self._ask()
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, LOCK_POLL_MAX)
+        except BaseException:
+            self._close_fd()
+            self._lock.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        if fcntl is None or CLIENT_LINGER_SECONDS <= 0 or any(exc):
+            # Failed requests start over with a fresh client
+            try:
+                await self._disconnect()
+            finally:
+                self._close_fd()
+                self._lock.release()
+            return
+        self._linger = asyncio.ensure_future(self._linger_then_close(time.time()))
+        self._lock.release()
+
+    def _ask(self):
+        """Ask the worker holding the session to let go (see _wanted)"""
+        try:
+            with open(self._want_path, "a"):
+                pass
+            os.utime(self._want_path)
+        except OSError:
+            pass
+
+    def _wanted(self, since: float) -> bool:
+        try:
+            return os.path.getmtime(self._want_path) >= since
+        except OSError:
+            return False
+
+    async def _linger_then_close(self, released: float):
+        deadline = time.monotonic() + CLIENT_LINGER_SECONDS
+        while time.monotonic() < deadline and not self._wanted(released):
+            await asyncio.sleep(LINGER_POLL)
+        await self.close()
+
+    async def close(self):
+        """Disconnect and let go of the flock now (waits for this worker's current holder)"""
+        async with self._lock:
+            if self._linger is not None and self._linger is not asyncio.current_task():
+                self._linger.cancel()
+            self._linger = None
+            try:
+                await self._disconnect()
+            finally:
+                self._close_fd()
+
+    async def _disconnect(self):
+        client = _clients.pop(self._session_id, None)
+        if client is not None:
+            await client.disconnect()  # also closes the session file
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)  # closing drops the flock
+            self._fd = None
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+
+def get_lock(session_id: str) -> SessionLock:
+    """Get a lock for the given session to prevent concurrent access (across workers too)."""
     if session_id not in _locks:
-        _locks[session_id] = asyncio.Lock()
+        _locks[session_id] = SessionLock(session_id)
     return _locks[session_id]
+
+
+async def close_sessions():
+    """Disconnect every lingering client and release its session (shutdown)"""
+    await asyncio.gather(*(lock.close() for lock in list(_locks.values())), return_exceptions=True)
@@ -0,0 +1,231 @@
+"""
+Local Telegram Stand-in
+Drop-in replacement for TelegramClient serving a synthetic account fleet, for load tests and offline runs
+
+Selected with TELEGRAM_BACKEND=fake (see telegram.client.get_client). Any
+phone number logs in with any code; the digits of the number pick one of
+FAKE_TELEGRAM_USERS users. Every user sits in a few of FAKE_TELEGRAM_GROUPS
+shared groups and has private chats with the next few users, and both sides
+of a chat see the same history, so cross-user sharing behaves as in
+production. Histories are generated on the fly from a per-chat seed (newest
+first, like iter_messages), so the stand-in holds no message data in memory.
+
+Every request waits FAKE_TELEGRAM_LATENCY_MS ("median" or "median,sigma",
+lognormal), iter_messages once per 100-message page like Telethon, and
+connect() CONNECT_ROUND_TRIPS times (TCP, then initConnection). With
+probability FAKE_TELEGRAM_FLOOD_RATE a request hits a flood wait of
+FAKE_TELEGRAM_FLOOD_SECONDS: slept through at or below flood_sleep_threshold,
+raised as FloodWaitError above it, as Telethon does.
+
+A FAKE_TELEGRAM_HIDDEN_HISTORY share of the groups hide their history from
+new members: every member but the first joined at some point of the history
+and only sees messages from there on.
+
+Like Telethon, the login lives in the session file (<session>.session), so a
+client opened for the same session in another worker is signed in too.
+"""
+
+import asyncio
+import math
+import os
+import random
+import zlib
+from datetime import datetime, time, timedelta, timezone
+from types import SimpleNamespace
+from typing import AsyncIterator, List, Optional
+
+from wrapper.fake_llm import parse_latency_profile
+
+FAKE_TELEGRAM_USERS = int(os.getenv('FAKE_TELEGRAM_USERS', '100'))
+FAKE_TELEGRAM_GROUPS = int(os.getenv('FAKE_TELEGRAM_GROUPS', '20'))
+FAKE_TELEGRAM_MESSAGES = int(os.getenv('FAKE_TELEGRAM_MESSAGES', '2000'))  # median messages per chat
+FAKE_TELEGRAM_LATENCY_MS = os.getenv('FAKE_TELEGRAM_LATENCY_MS', '0')
+FAKE_TELEGRAM_FLOOD_RATE = float(os.getenv('FAKE_TELEGRAM_FLOOD_RATE', '0'))  # chance per request
+FAKE_TELEGRAM_FLOOD_SECONDS = int(os.getenv('FAKE_TELEGRAM_FLOOD_SECONDS', '5'))
+FAKE_TELEGRAM_HIDDEN_HISTORY = float(os.getenv('FAKE_TELEGRAM_HIDDEN_HISTORY', '0'))  # share of groups hiding history
+
+GROUP_OFFSETS = (0, 1, 3)  # user n is in groups n, n+1 and n+3 (mod FAKE_TELEGRAM_GROUPS)
+PRIVATE_CHATS = 4  # private chats with users n+1 .. n+4
+USER_ID_BASE = 7000000000
+GROUP_ID_BASE = -1009000000000
+PAGE_SIZE = 100  # messages per history request
+CONNECT_ROUND_TRIPS = 2  # a connect with a stored auth key: TCP handshake, then initConnection
+HISTORY_DAYS = 400  # histories reach past the 1-year window, so the cutoff is exercised
+MESSAGES_SIGMA = 0.8  # lognormal spread of chat sizes
+MAX_SIZE_FACTOR = 20  # largest chat, in medians
+
+WORDS = ('hello', 'tmr', 'lunch', 'lol', 'meeting', 'weekend', 'movie', 'coffee', 'deadline', 'gym',
+         'party', 'train', 'ok', 'sure', 'later', 'photo', 'birthday', 'rain', 'game', 'see', 'you',
+         'the', 'is', 'going', 'to', 'what', 'time', 'haha', 'nice', 'tired')
+EMOJIS = ('😀', '😂', '🔥', '❤️', '👍', '🎉')
+
+
+def user_id_for(index: int) -> int:
+    return USER_ID_BASE + index % FAKE_TELEGRAM_USERS
+
+
+def _user_index(user_id: int) -> int:
+    return (user_id - USER_ID_BASE) % FAKE_TELEGRAM_USERS
+
+
+def _group_members(group: int) -> List[int]:
+    return [user_id_for(n) for n in range(FAKE_TELEGRAM_USERS) if (group - n) % FAKE_TELEGRAM_GROUPS in GROUP_OFFSETS]
+
+
+class FakeChat:
+    """One conversation's history, identical for every member"""
+
+    def __init__(self, key: str, name: str, members: List[int], anchor: datetime):
+        self.name = name
+        self.members = members
+        self.anchor = anchor
+        self.seed = zlib.crc32(key.encode('utf-8'))
+        size = random.Random(self.seed).lognormvariate(math.log(FAKE_TELEGRAM_MESSAGES), MESSAGES_SIGMA)
+        self.total = max(1, int(min(size, MAX_SIZE_FACTOR * FAKE_TELEGRAM_MESSAGES)))
+        self.spacing = timedelta(days=HISTORY_DAYS) / self.total
+        self.first_visible = 1  # oldest message id the requesting member can read
+
+    def messages(self, min_id: int = 0):
+        """Messages newest first, down to min_id (exclusive) or the oldest visible one"""
+        rng = random.Random(self.seed)
+        for message_id in range(self.total, max(min_id, self.first_visible - 1), -1):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(2, 9))]
+            if rng.random() < 0.2:
+                words.append(rng.choice(EMOJIS))
+            yield SimpleNamespace(
+                id=message_id,
+                date=self.anchor - self.spacing * (self.total - message_id) - timedelta(seconds=rng.randint(0, 59)),
+                text=' '.join(words),
+                sender_id=rng.choice(self.members),
+                reply_to_msg_id=message_id - rng.randint(1, 5) if message_id > 5 and rng.random() < 0.15 else None
+            )
+
+
+class FakeTelegramClient:
+    """The TelegramClient surface the backend uses, over a synthetic fleet"""
+
+    def __init__(self, session: str, api_id: int = 0, api_hash: str = '', seed: Optional[int] = None):
+        self.session = session
+        self.flood_sleep_threshold = 60  # Telethon's default
+        self.median_latency, self.sigma = parse_latency_profile(FAKE_TELEGRAM_LATENCY_MS)
+        self._rng = random.Random(seed if seed is not None else zlib.crc32(session.encode('utf-8')))
+        self._connected = False
+        self._phone: Optional[str] = None
+        self._user_id: Optional[int] = self._load_login()
+        # Histories end at the start of today, so every worker and user sees the same watermark
+        self._anchor = datetime.combine(datetime.now(timezone.utc).date(), time(), tzinfo=timezone.utc)
+        self.requests = 0
+        self.connects = 0
+
+    def _load_login(self) -> Optional[int]:
+        try:
+            with open(f"{self.session}.session", 'r', encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _save_login(self):
+        with open(f"{self.session}.session", 'w', encoding='utf-8') as f:
+            f.write(str(self._user_id))
+
+    async def _request(self):
+        """One round trip: latency, then maybe a flood wait"""
+        self.requests += 1
+        if self.median_latency > 0:
+            latency = self._rng.lognormvariate(0, self.sigma) * self.median_latency if self.sigma else self.median_latency
+            await asyncio.sleep(latency)
+        if FAKE_TELEGRAM_FLOOD_RATE and self._rng.random() < FAKE_TELEGRAM_FLOOD_RATE:
+            if FAKE_TELEGRAM_FLOOD_SECONDS > self.flood_sleep_threshold:
+                from telethon.errors import FloodWaitError
+                raise FloodWaitError(request=None, capture=FAKE_TELEGRAM_FLOOD_SECONDS)
+            await asyncio.sleep(FAKE_TELEGRAM_FLOOD_SECONDS)
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self):
+        if not self._connected:
+            self.connects += 1
+            for _ in range(CONNECT_ROUND_TRIPS):
+                await self._request()
+            self._connected = True
+
+    async def disconnect(self):
+        self._connected = False
+
+    async def send_code_request(self, phone: str):
+        await self._request()
+        self._phone = phone
+        return SimpleNamespace(phone_code_hash=f"fake-{zlib.crc32(phone.encode('utf-8')):08x}")
+
+    async def sign_in(self, phone: Optional[str] = None, code: Optional[str] = None, phone_code_hash: Optional[str] = None,
+                      password: Optional[str] = None):
+        await self._request()
+        phone = phone or self._phone or '0'
+        self._user_id = user_id_for(int(''.join(c for c in phone if c.isdigit()) or 0))
+        self._save_login()
+
+    async def get_me(self):
+        await self._request()
+        if self._user_id is None:
+            raise RuntimeError('Not signed in')
+        return SimpleNamespace(id=self._user_id, first_name=f"User {_user_index(self._user_id)}")
+
+    def _chat(self, chat_id: int) -> FakeChat:
+        if self._user_id is None:
+            raise RuntimeError('Not signed in')
+        if chat_id < 0:
+            group = GROUP_ID_BASE - chat_id
+            members = _group_members(group)
+            if self._user_id not in members:
+                raise ValueError(f"Could not find the input entity for {chat_id}")
+            chat = FakeChat(f"group:{group}", f"Group {group}", members, self._anchor)
+            hidden = random.Random(chat.seed ^ 0x5EED).random() < FAKE_TELEGRAM_HIDDEN_HISTORY
+            if hidden and self._user_id != members[0]:
+                chat.first_visible = 1 + zlib.crc32(f"{group}:{self._user_id}".encode('utf-8')) % chat.total
+            return chat
+        pair = sorted((self._user_id, chat_id))
+        return FakeChat(f"private:{pair[0]}:{pair[1]}", f"User {_user_index(chat_id)}", pair, self._anchor)
+
+    def _chat_ids(self) -> List[int]:
+        index = _user_index(self._user_id)
+        groups = [GROUP_ID_BASE - (index + offset) % FAKE_TELEGRAM_GROUPS for offset in GROUP_OFFSETS]
+        privates = [user_id_for(index + k) for k in range(1, PRIVATE_CHATS + 1)]
+        return list(dict.fromkeys(groups + [c for c in privates if c != self._user_id]))
+
+    async def get_dialogs(self):
+        await self._request()
+        dialogs = []
+        for chat_id in self._chat_ids():
+            chat = self._chat(chat_id)
+            dialogs.append(SimpleNamespace(
+                id=chat_id, name=chat.name, archived=False, unread_count=0, message=next(chat.messages())
+            ))
+        return dialogs
+
+    async def get_messages(self, chat_id: int, limit: int = 1, reverse: bool = False, **kwargs):
+        """Newest (or with reverse, oldest) messages; .total is the visible chat size (limit=0 only counts)"""
+        await self._request()
+        chat = self._chat(chat_id)
+        source = reversed(list(chat.messages())) if reverse and limit else chat.messages()
+        messages = []
+        for message in source:
+            if len(messages) >= limit:
+                break
+            messages.append(message)
+        return _TotalList(messages, chat.total - chat.first_visible + 1)
+
+    async def iter_messages(self, chat_id: int, min_id: int = 0, **kwargs) -> AsyncIterator:
+        chat = self._chat(chat_id)
+        for i, message in enumerate(chat.messages(min_id)):
+            if i % PAGE_SIZE == 0:
+                await self._request()
+            yield message
+
+
+class _TotalList(list):
+    """list with the .total of Telethon's TotalList"""
+
+    def __init__(self, items, total: int):
+        super().__init__(items)
+        self.total = total
@@ -3,6 +3,10 @@ from datetime import datetime, timedelta, timezone
 from telethon import TelegramClient
 from telethon.tl.types import MessageService
 
+from telemetry import get_logger, log_event, span
+
+logger = get_logger('telegram.fetch')
+
 async def fetch_yearly_histories(client: TelegramClient, chat_ids: list):
     """
     Iterates through a list of chats and fetches text messages from the last 365 days.
@@ -15,25 +19,28 @@ async def fetch_yearly_histories(client: TelegramClient, chat_ids: list):
     all_data = {}
 
     for chat_id in chat_ids:
-        print(f"Fetching history for chat: {chat_id}...")
+        log_event(logger, 'fetch_start', chat_id=chat_id)
         chat_messages = []
         
         try:
             # offset_date fetches messages OLDER than the date. 
             # To get messages NEWER than a year ago, we iterate normally 
             # and stop when we hit a message older than our cutoff.
-            async for message in client.iter_messages(chat_id):
-                # Stop if we've gone back further than 1 year
-                if message.date < one_year_ago:
-                    break
-                
-                # Filter for text only (ignores service messages, polls, etc.)
-                if message.text and not isinstance(message, MessageService):
-                    chat_messages.append({
-                        "text": message.text,
-                        "date": message.date.isoformat(),
-                        "sender_id": message.sender_id
-                    })
+            with span('fetch', chat_id=chat_id):
+                async for message in client.iter_messages(chat_id):
+                    # Stop if we've gone back further than 1 year
+                    if message.date < one_year_ago:
+                        break
+
+                    # Filter for text only (ignores service messages, polls, etc.)
+                    if message.text and not isinstance(message, MessageService):
+                        chat_messages.append({
+                            "id": message.id,
+                            "text": message.text,
+                            "date": message.date.isoformat(),
+                            "sender_id": message.sender_id,
+                            "reply_to_msg_id": message.reply_to_msg_id
+                        })
             
             all_data[chat_id] = chat_messages
             
@@ -41,7 +48,7 @@ async def fetch_yearly_histories(client: TelegramClient, chat_ids: list):
             await asyncio.sleep(1) 
             
         except Exception as e:
-            print(f"Error fetching chat {chat_id}: {e}")
+            log_event(logger, 'fetch_error', level='error', chat_id=chat_id, error=str(e))
             all_data[chat_id] = []
 
     return all_data
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Message Cache
+Chat messages downloaded ahead of a Wrapped request, extended instead of re-downloaded
+
+An entry holds a chat's text messages from its newest id (top_id) back to
+the cutoff it was downloaded with. A request whose own cutoff is newer only
+fetches messages above top_id and drops the ones that left its window, so an
+entry stays useful after the chat moves on. Keys are scoped chat keys (see
+scoped_chat_key).
+
+Entries hold raw private message texts, so they are not kept longer than
+needed: an entry is served for MESSAGE_CACHE_TTL (1 hour), an expired entry
+is deleted when read, and every API worker sweeps the directory at startup
+and every MESSAGE_CACHE_SWEEP_SECONDS (5 minutes). While the API runs, no
+entry is on disk longer than the TTL plus one sweep interval.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+MESSAGE_CACHE_DIR = os.getenv('MESSAGE_CACHE_DIR', 'cache/messages')
+MESSAGE_CACHE_TTL = float(os.getenv('MESSAGE_CACHE_TTL', '3600'))  # seconds an entry is served
+MESSAGE_CACHE_SWEEP_SECONDS = float(os.getenv('MESSAGE_CACHE_SWEEP_SECONDS', '300'))  # between expiry sweeps
+
+
+class MessageCache:
+    """File-backed message cache, one JSON file per chat
+
+    get() and put() parse or write up to a whole chat: call them off the event loop.
+    """
+
+    def __init__(self, root: str = MESSAGE_CACHE_DIR, ttl: float = MESSAGE_CACHE_TTL):
+        self.root = root
+        self.ttl = ttl
+
+    def _path(self, chat_key: str) -> str:
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in chat_key)
+        return os.path.join(self.root, f"{safe_key}.json")
+
+    def _fresh(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < self.ttl
+        except OSError:
+            return False
+
+    def _check(self, path: str) -> bool:
+        """Whether the entry at path is fresh; an expired one is deleted"""
+        if self._fresh(path):
+            return True
+        self._remove(path)
+        return False
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Missing, or another worker removed it first
+
+    def has(self, chat_key: str) -> bool:
+        """Whether a fresh entry exists (no parsing)"""
+        return self._check(self._path(chat_key))
+
+    def get(self, chat_key: str) -> Optional[Dict[str, Any]]:
+        """Fresh entry as {top_id, cutoff (datetime), messages}, or None"""
+        path = self._path(chat_key)
+        if not self._check(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            entry['cutoff'] = datetime.fromisoformat(entry['cutoff'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry
+
+    def put(self, chat_key: str, messages: List[Dict], top_id: int, cutoff: datetime):
+        """Atomically store a chat's messages (expired entries are left to sweep)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(chat_key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'top_id': top_id, 'cutoff': cutoff.isoformat(), 'messages': messages}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict_expired(self):
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.root, name)
+            if name.endswith('.json') and not self._fresh(path):
+                self._remove(path)
+
+    async def sweep(self, interval: float = MESSAGE_CACHE_SWEEP_SECONDS):
+        """Evict expired entries now and every interval seconds (run as a background task)"""
+        while True:
+            await asyncio.to_thread(self.evict_expired)
+            await asyncio.sleep(interval)
@@ -0,0 +1,212 @@
+"""
+Speculative Prefetch
+Background work started at login so the chat list and the first Wrapped are ready sooner
+
+Once a user verifies their OTP, a low-priority job per session:
+  1. warms the dialog list served by /chats/top (kept in the session store,
+     so every API worker sees it),
+  2. adds a cheap size estimate (total message count) to the first chats,
+  3. downloads the most recently active chats into the MessageCache.
+
+The job takes the session lock one step (one chat) at a time. A Wrapped
+request for the session makes it yield: a download of a chat the request
+wants is finished, anything else is abandoned at the next message. Downloads
+are bounded per user (chats, messages read, seconds; a download crossing the
+budget is abandoned), skip chats whose shared analysis is already current,
+and only start while no Wrapped job waits for admission.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from telemetry import get_logger, log_event, span
+from telemetry.metrics import PREFETCH_CHATS_TOTAL
+from wrapper.chat_artifacts import ChatArtifactStore, is_shared_chat, make_watermark, scoped_chat_key
+
+from telegram.chats import chat_summary, fetch_chat_messages, get_top_dialogs, oldest_visible_id
+from telegram.client import connected_client, get_lock
+from telegram.message_cache import MessageCache
+from telegram.session_store import get_session, update_session
+
+PREFETCH_CHATS = int(os.getenv('PREFETCH_CHATS', '3'))  # chats downloaded per user, 0 = dialogs and estimates only
+PREFETCH_ESTIMATE_CHATS = int(os.getenv('PREFETCH_ESTIMATE_CHATS', '20'))  # chats given a size estimate
+PREFETCH_MAX_MESSAGES = int(os.getenv('PREFETCH_MAX_MESSAGES', '30000'))  # messages downloaded per user
+PREFETCH_MAX_SECONDS = float(os.getenv('PREFETCH_MAX_SECONDS', '120'))  # wall time per user
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '2'))  # users prefetched at once per process
+DIALOG_CACHE_TTL = float(os.getenv('DIALOG_CACHE_TTL', '300'))  # seconds a warmed dialog list is served
+YIELD_CHECK_MESSAGES = 500  # messages between checks for a yield requested by another worker
+
+logger = get_logger('telegram.prefetch')
+
+
+def cached_top_chats(session_id: str) -> Optional[List[Dict]]:
+    """Dialog list warmed by a prefetch (None if missing or older than DIALOG_CACHE_TTL)"""
+    session = get_session(session_id) or {}
+    cached = session.get('top_chats')
+    if not cached or time.time() - cached.get('at', 0) > DIALOG_CACHE_TTL:
+        return None
+    return cached['chats']
+
+
+def store_top_chats(session_id: str, chats: List[Dict]):
+    update_session(session_id, top_chats={'at': time.time(), 'chats': [
+        {**chat, 'last_message_date': chat['last_message_date'].isoformat() if chat['last_message_date'] else None}
+        for chat in chats
+    ]})
+
+
+class PrefetchJob:
+    """One session's prefetch; yield_to() is how a foreground request takes over"""
+
+    def __init__(self, session_id: str, user_id: str):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.started = time.monotonic()
+        self.wanted: Optional[set] = None  # chat ids of the request this job yields to
+        self.current: Optional[int] = None  # chat being downloaded
+        self.messages = 0  # messages read by finished downloads (budget)
+        self.reading = 0  # messages read by the running download
+        self.task: Optional[asyncio.Task] = None
+
+    def yield_to(self, chat_ids: List[int]):
+        self.wanted = set(chat_ids)
+
+    def _poll_yield(self):
+        if self.wanted is None:
+            requested = (get_session(self.session_id) or {}).get('prefetch_yield')
+            if requested is not None:
+                self.wanted = set(requested)
+
+    def yielding(self) -> bool:
+        """Whether to stop before the next step"""
+        self._poll_yield()
+        return self.wanted is not None or self.over_budget()
+
+    def abandon_download(self, read: int) -> bool:
+        """should_stop for the running download: yield unless the request wants this chat, or over budget"""
+        self.reading = read
+        if read % YIELD_CHECK_MESSAGES == 0:
+            self._poll_yield()
+        if self.wanted is not None:
+            return self.current not in self.wanted
+        return self.over_budget()
+
+    def over_budget(self) -> bool:
+        return (self.messages + self.reading > PREFETCH_MAX_MESSAGES
+                or time.monotonic() - self.started > PREFETCH_MAX_SECONDS)
+
+
+class Prefetcher:
+    """Prefetch jobs of one API process"""
+
+    def __init__(
+        self,
+        cache: Optional[MessageCache] = None,
+        artifacts: Optional[ChatArtifactStore] = None,
+        busy: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        """
+        Args:
+            cache: Where downloaded chats go
+            artifacts: Shared chat analyses (current ones are not downloaded)
+            busy: Async check, True while foreground work is waiting; downloads don't start then
+        """
+        self.cache = cache or MessageCache()
+        self.artifacts = artifacts or ChatArtifactStore()
+        self.busy = busy
+        self.jobs: Dict[str, PrefetchJob] = {}
+        self._slots = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+    def start(self, session_id: str, user_id: str) -> PrefetchJob:
+        """Start prefetching for a freshly authenticated session (no-op if one is running)"""
+        job = self.jobs.get(session_id)
+        if job is not None and job.task is not None and not job.task.done():
+            return job
+        update_session(session_id, prefetch_yield=None)
+        job = PrefetchJob(session_id, str(user_id))
+        job.task = asyncio.create_task(self._run(job))
+        job.task.add_done_callback(lambda _: self.jobs.pop(session_id, None) if self.jobs.get(session_id) is job else None)
+        self.jobs[session_id] = job
+        return job
+
+    def yield_to(self, session_id: str, chat_ids: List[int]):
+        """A Wrapped request for these chats is about to take the session (any worker's job yields)"""
+        update_session(session_id, prefetch_yield=list(chat_ids))
+        job = self.jobs.get(session_id)
+        if job is not None:
+            job.yield_to(chat_ids)
+
+    def cancel(self, session_id: str):
+        job = self.jobs.pop(session_id, None)
+        if job is not None and job.task is not None:
+            job.task.cancel()
+
+    def shutdown(self):
+        for session_id in list(self.jobs):
+            self.cancel(session_id)
+
+    async def _run(self, job: PrefetchJob):
+        try:
+            async with self._slots:
+                await self._prefetch(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Best effort: the foreground path fetches whatever is missing
+            log_event(logger, 'prefetch_error', level='warning', session_id=job.session_id, error=str(e))
+
+    async def _prefetch(self, job: PrefetchJob):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=365)
+        lock = get_lock(job.session_id)
+
+        # 1. Dialog list for /chats/top (the client is only valid while the lock is held)
+        async with lock:
+            client = await connected_client(job.session_id)
+            with span('prefetch_dialogs'):
+                dialogs = await get_top_dialogs(client)
+        chats = [chat_summary(d) for d in dialogs]
+        store_top_chats(job.session_id, chats)
+
+        # 2. Size estimates: a limit=0 history request only returns the count (small requests, one lock section)
+        async with lock:
+            client = await connected_client(job.session_id)
+            for chat in chats[:PREFETCH_ESTIMATE_CHATS]:
+                if job.yielding():
+                    break
+                chat['message_count'] = (await client.get_messages(chat['chat_id'], limit=0)).total
+        store_top_chats(job.session_id, chats)
+
+        # 3. Most recently active chats into the message cache, within the budget
+        downloaded = 0
+        for dialog in dialogs:
+            if downloaded >= PREFETCH_CHATS or job.yielding() or (self.busy is not None and await self.busy()):
+                break
+            if dialog.message is None:
+                continue
+            job.current, job.reading = dialog.id, 0
+            async with lock:
+                client = await connected_client(job.session_id)
+                # Keyed as the Wrapped request keys it: groups by how far back this member can read
+                visible_from = await oldest_visible_id(client, dialog.id) if is_shared_chat(str(dialog.id)) else None
+                chat_key = scoped_chat_key(str(dialog.id), job.user_id, visible_from)
+                current = self.cache.has(chat_key) or self.artifacts.has(chat_key, make_watermark(dialog.message.id, cutoff))
+                if not current:
+                    with span('prefetch_fetch', chat_id=dialog.id):
+                        messages = await fetch_chat_messages(client, dialog.id, cutoff, should_stop=job.abandon_download)
+            job.current = None
+            if current:
+                continue
+            if messages is None:
+                PREFETCH_CHATS_TOTAL.inc(outcome='over_budget' if job.wanted is None else 'yielded')
+                break
+            job.messages += job.reading
+            job.reading = 0
+            await asyncio.to_thread(self.cache.put, chat_key, messages, dialog.message.id, cutoff)
+            PREFETCH_CHATS_TOTAL.inc(outcome='downloaded')
+            downloaded += 1
+
+        log_event(logger, 'prefetch_done', session_id=job.session_id, chats=downloaded,
+                  seconds=round(time.monotonic() - job.started, 2), yielded=job.wanted is not None)
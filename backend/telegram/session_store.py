@@ -1,15 +1,103 @@
+"""
+Session Store
+Login sessions (phone, code hash, user id) in SQLite, shared by every API worker process
+
+Each update is a single statement, so concurrent workers never overwrite each
+other's changes. A legacy sessions/session_map.json is imported on first use.
+"""
+
 import json
 import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+SESSION_DIR = "sessions"
+SESSION_DB = os.getenv("SESSION_DB", os.path.join(SESSION_DIR, "sessions.db"))
+SESSION_FILE = os.path.join(SESSION_DIR, "session_map.json")  # Legacy single-process store
+BUSY_TIMEOUT = 5.0  # seconds a writer waits for another process's transaction
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    """Per-thread, per-process connection (sqlite connections must not cross a fork)"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+    os.makedirs(os.path.dirname(SESSION_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(SESSION_DB, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+    conn.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+    _import_legacy(conn)
+    _local.conn, _local.pid = conn, os.getpid()
+    return conn
 
-SESSION_FILE = "sessions/session_map.json"
 
-def load_sessions():
+def _import_legacy(conn: sqlite3.Connection):
     if not os.path.exists(SESSION_FILE):
-        return {}
-    with open(SESSION_FILE, "r") as f:
-        return json.load(f)
-
-def save_sessions(sessions):
-    os.makedirs("sessions", exist_ok=True)
-    with open(SESSION_FILE, "w") as f:
-        json.dump(sessions, f)
\ No newline at end of file
+        return
+    try:
+        with open(SESSION_FILE, "r") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError):
+        return
+    conn.executemany(
+        "INSERT OR IGNORE INTO sessions (session_id, data) VALUES (?, ?)",
+        [(session_id, json.dumps(data)) for session_id, data in legacy.items()]
+    )
+    try:
+        os.replace(SESSION_FILE, f"{SESSION_FILE}.imported")
+    except FileNotFoundError:
+        pass  # Another worker imported it first
+
+
+def init_store():
+    """Create the database (and import the legacy file) before workers start"""
+    _connect()
+
+
+def shared_db() -> sqlite3.Connection:
+    """This thread's connection to the store, for other state the workers share (see admission)"""
+    return _connect()
+
+
+def get_session(session_id: str) -> Optional[Dict]:
+    row = _connect().execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put_session(session_id: str, data: Dict):
+    _connect().execute(
+        "INSERT INTO sessions (session_id, data) VALUES (?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data",
+        (session_id, json.dumps(data))
+    )
+
+
+def update_session(session_id: str, **fields) -> bool:
+    """Merge fields into an existing session atomically (JSON merge patch: None removes a key)
+
+    Returns:
+        False if the session does not exist
+    """
+    cursor = _connect().execute(
+        "UPDATE sessions SET data = json_patch(data, ?) WHERE session_id = ?",
+        (json.dumps(fields), session_id)
+    )
+    return cursor.rowcount > 0
+
+
+def load_sessions() -> Dict[str, Dict]:
+    """All sessions as {session_id: data}"""
+    return {session_id: json.loads(data) for session_id, data in _connect().execute("SELECT session_id, data FROM sessions")}
+
+
+def save_sessions(sessions: Dict[str, Dict]):
+    """Upsert every session in the map (prefer put_session/update_session for single changes)"""
+    conn = _connect()
+    conn.executemany(
+        "INSERT INTO sessions (session_id, data) VALUES (?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data",
+        [(session_id, json.dumps(data)) for session_id, data in sessions.items()]
+    )
@@ -0,0 +1,12 @@
+"""
+Telemetry
+Timing spans, Prometheus metrics and structured logging
+"""
+
+from .logging import get_logger, log_event
+from .metrics import REGISTRY
+from .middleware import ServerTimingMiddleware
+from .profiling import ProfilingMiddleware, profile_job
+from .tracing import span
+
+__all__ = ['span', 'REGISTRY', 'ServerTimingMiddleware', 'ProfilingMiddleware', 'profile_job', 'get_logger', 'log_event']
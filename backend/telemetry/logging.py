@@ -0,0 +1,55 @@
+"""
+Structured Logging
+One key=value line per event; level checks happen before any formatting
+"""
+
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+_configured = False
+
+
+class KeyValueFormatter(logging.Formatter):
+    """'ts level logger event k=v ...' - grep- and parser-friendly"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, 'fields', None) or {}
+        pairs = ' '.join(f'{k}={_quote(v)}' for k, v in fields.items())
+        line = f"{self.formatTime(record, '%Y-%m-%dT%H:%M:%S')} {record.levelname.lower()} {record.name} {record.getMessage()}"
+        if pairs:
+            line = f"{line} {pairs}"
+        if record.exc_info:
+            line = f"{line}\n{self.formatException(record.exc_info)}"
+        return line
+
+
+def _quote(value) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return text
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the 'wrapped' namespace, configured once"""
+    global _configured
+    if not _configured:
+        root = logging.getLogger('wrapped')
+        if not root.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(KeyValueFormatter())
+            root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+    return logging.getLogger(f'wrapped.{name}')
+
+
+def log_event(logger: logging.Logger, event: str, level: str = 'info', **fields):
+    """Log an event with fields, skipping all work when the level is disabled"""
+    levelno = logging.getLevelName(level.upper())
+    if logger.isEnabledFor(levelno):
+        logger.log(levelno, event, extra={'fields': fields})
@@ -0,0 +1,167 @@
+"""
+Metrics Registry
+Counters, gauges and fixed-bucket histograms rendered in the Prometheus text format
+"""
+
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers sub-ms parsing of small chats up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge:
+    """Value that goes up and down per label set (queue depth, jobs running)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}  # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {int(cumulative)}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {int(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(key)} {int(cumulative)}"
+
+
+class Registry:
+    """Named metrics of one process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._metrics.setdefault(name, Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram('wrapped_stage_seconds', 'Time spent per pipeline stage')
+HTTP_SECONDS = REGISTRY.histogram('http_request_duration_seconds', 'API request latency')
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', 'API requests by route and status')
+LLM_TOKENS = REGISTRY.counter('llm_tokens_total', 'LLM tokens by stage and kind (prompt, completion, cached)')
+LLM_TTFT_SECONDS = REGISTRY.histogram('llm_time_to_first_token_seconds', 'Time to first streamed token')
+LLM_FALLBACKS = REGISTRY.counter('llm_fallbacks_total', 'LLM results replaced locally, by stage and reason')
+ADMISSION_QUEUED = REGISTRY.gauge('wrapped_jobs_queued', 'Wrapped jobs waiting for admission')
+ADMISSION_RUNNING = REGISTRY.gauge('wrapped_jobs_running', 'Wrapped jobs admitted and running')
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram('wrapped_job_queue_wait_seconds', 'Time a Wrapped job waited for admission')
+ADMISSION_REJECTED = REGISTRY.counter('wrapped_jobs_rejected_total', 'Wrapped jobs turned away with 429, by reason')
+CHAT_ARTIFACT_LOOKUPS = REGISTRY.counter('wrapped_chat_artifact_lookups_total', 'Shared chat analysis lookups by result (hit skips the download)')
+PREFETCH_CHATS_TOTAL = REGISTRY.counter('wrapped_prefetch_chats_total', 'Chats downloaded ahead after login, by outcome (downloaded, yielded, over_budget)')
+MESSAGE_CACHE_LOOKUPS = REGISTRY.counter('wrapped_message_cache_lookups_total', 'Prefetched message lookups by result (hit only fetches newer messages)')
@@ -0,0 +1,44 @@
+"""
+Request Timing Middleware
+Adds Server-Timing to API responses and records request latency metrics
+"""
+
+import time
+
+from .metrics import HTTP_REQUESTS, HTTP_SECONDS
+from .tracing import server_timing, start_request
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware (no body buffering, works with streaming responses)"""
+
+    def __init__(self, app, skip_paths=('/metrics',)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path') in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        spans = start_request()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                header = server_timing(spans, time.perf_counter() - start).encode('latin-1')
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Route template (e.g. /chats/{chat_id}/persona) keeps label cardinality bounded
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or 'unmatched'
+            labels = {'method': scope.get('method', ''), 'route': path, 'status': str(status)}
+            HTTP_SECONDS.observe(time.perf_counter() - start, **labels)
+            HTTP_REQUESTS.inc(**labels)
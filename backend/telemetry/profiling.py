@@ -0,0 +1,223 @@
+"""
+On-demand Profiling
+Opt-in per-request profiling (admin header or sampling rate) with event-loop lag tracking
+
+Enable with PROFILE_ADMIN_TOKEN (then send "X-Profile: <token>") and/or
+PROFILE_SAMPLE_RATE (fraction of requests). With neither set the middleware
+is a plain pass-through. Artifacts land in PROFILE_DIR/<request id>/:
+
+    summary.json   duration, event-loop lag stats, hottest functions
+    stacks.txt     collapsed stacks ("frame;frame;frame count"), flamegraph-ready
+    profile.pstats cProfile output (PROFILE_MODE=cprofile only)
+"""
+
+import asyncio
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from .logging import get_logger, log_event
+from .tracing import _request_spans, summarize
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'sample')  # 'sample' (all threads) or 'cprofile' (loop thread, exact)
+PROFILE_PATHS = ('/chats/messages',)
+
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+LAG_INTERVAL = 0.01  # seconds between event-loop heartbeats
+LAG_BLOCKED_THRESHOLD = 0.05  # heartbeats later than this count as blocked time
+MAX_STACK_DEPTH = 64
+TOP_FUNCTIONS = 30
+
+logger = get_logger('profiling')
+
+
+class LoopLagMonitor:
+    """Heartbeat task measuring how late the event loop wakes it up"""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.blocked_seconds = 0.0
+        self.blocked_events = 0
+        self.beats = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - expected
+            self.beats += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= LAG_BLOCKED_THRESHOLD:
+                self.blocked_seconds += lag
+                self.blocked_events += 1
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'blocked_ms': round(self.blocked_seconds * 1000, 1),
+            'blocked_events': self.blocked_events,
+            'heartbeats': self.beats
+        }
+
+
+class StackSampler:
+    """Background thread sampling every thread's Python stack"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                names = []
+                while frame is not None and len(names) < MAX_STACK_DEPTH:
+                    names.append(self._frame_name(frame))
+                    frame = frame.f_back
+                if names:
+                    self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> Dict[str, int]:
+        """Self samples per function (leaf frames)"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return dict(leaves.most_common(limit))
+
+    def write(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def should_profile(headers: Dict[str, str]) -> bool:
+    """Admin header with the right token, or a random sample"""
+    if PROFILE_ADMIN_TOKEN and headers.get('x-profile') == PROFILE_ADMIN_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@asynccontextmanager
+async def profile_job(request_id: Optional[str] = None, mode: str = PROFILE_MODE, root: str = PROFILE_DIR):
+    """Profile everything inside the block and write artifacts to root/<request_id>/
+
+    Yields:
+        The request id used for the artifact directory
+    """
+    request_id = request_id or uuid.uuid4().hex
+    out_dir = os.path.join(root, ''.join(c if c.isalnum() or c in '-_' else '_' for c in request_id))
+    lag = LoopLagMonitor()
+    sampler = StackSampler() if mode == 'sample' else None
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+
+    lag.start()
+    await asyncio.sleep(0)  # let the heartbeat arm before the profiled code can block the loop
+    if sampler:
+        sampler.start()
+    if profiler:
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield request_id
+    finally:
+        duration = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        await lag.stop()
+
+        os.makedirs(out_dir, exist_ok=True)
+        summary = {
+            'request_id': request_id,
+            'mode': mode,
+            'duration_ms': round(duration * 1000, 1),
+            'event_loop': lag.stats()
+        }
+        spans = _request_spans.get()
+        if spans:
+            summary['stages'] = {stage: {'ms': round(seconds * 1000, 1), 'count': count}
+                                 for stage, (seconds, count) in summarize(spans).items()}
+        if sampler:
+            sampler.write(os.path.join(out_dir, 'stacks.txt'))
+            summary['samples'] = sampler.samples
+            summary['top_functions'] = sampler.top_functions()
+        if profiler:
+            profiler.dump_stats(os.path.join(out_dir, 'profile.pstats'))
+        with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        log_event(logger, 'profile_written', request_id=request_id, dir=out_dir,
+                  duration_ms=summary['duration_ms'], blocked_ms=summary['event_loop']['blocked_ms'])
+
+
+class ProfilingMiddleware:
+    """Profiles selected requests; a plain pass-through when profiling is not configured"""
+
+    def __init__(self, app, paths=PROFILE_PATHS):
+        self.app = app
+        self.paths = set(paths)
+        self.enabled = bool(PROFILE_ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope['type'] != 'http' or scope.get('path') not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        if not should_profile(headers):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get('x-request-id') or uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', request_id.encode('latin-1'))]
+            await send(message)
+
+        async with profile_job(request_id):
+            await self.app(scope, receive, send_with_id)
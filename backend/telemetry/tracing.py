@@ -0,0 +1,69 @@
+"""
+Timing Spans
+Per-stage timers feeding the stage histogram and the current request's Server-Timing header
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from .logging import get_logger, log_event
+from .metrics import STAGE_SECONDS
+
+logger = get_logger('telemetry.span')
+
+# (stage, seconds) of the request being served; shared with tasks and threads it spawns
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_spans', default=None)
+
+
+def start_request() -> List[Tuple[str, float]]:
+    """Begin collecting spans for the current request (returns the collector)"""
+    spans: List[Tuple[str, float]] = []
+    _request_spans.set(spans)
+    return spans
+
+
+def record_span(stage: str, seconds: float):
+    """Record an already-measured stage (e.g. timed in a worker process)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """Time a block as one pipeline stage
+
+    Args:
+        stage: Low-cardinality stage name, used as the metric label
+        fields: Extra context (chat id, sizes...) for the debug log only
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_span(stage, elapsed)
+        log_event(logger, 'span', level='debug', stage=stage, ms=round(elapsed * 1000, 2), **fields)
+
+
+def summarize(spans: List[Tuple[str, float]]) -> Dict[str, Tuple[float, int]]:
+    """{stage: (total seconds, count)} in first-seen order"""
+    totals: Dict[str, Tuple[float, int]] = {}
+    for stage, seconds in list(spans):
+        total, count = totals.get(stage, (0.0, 0))
+        totals[stage] = (total + seconds, count + 1)
+    return totals
+
+
+def server_timing(spans: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Server-Timing header value; stages that ran in parallel report their summed time"""
+    parts = [
+        f'{stage};dur={seconds * 1000:.1f};desc="x{count}"' if count > 1 else f'{stage};dur={seconds * 1000:.1f}'
+        for stage, (seconds, count) in summarize(spans).items()
+    ]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
@@ -1,3 +1,8 @@
 from .wordcloud_generator import WordCloudGenerator, generate_wordcloud, THEMES
+from .compression import CompressionMiddleware
+from .serialization import FastJSONResponse, parse_fields, select_fields, wants
 
-__all__ = ['WordCloudGenerator', 'generate_wordcloud', 'THEMES']
+__all__ = [
+    'WordCloudGenerator', 'generate_wordcloud', 'THEMES',
+    'CompressionMiddleware', 'FastJSONResponse', 'parse_fields', 'select_fields', 'wants'
+]
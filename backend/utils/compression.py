@@ -0,0 +1,157 @@
+"""
+Response Compression
+Negotiated brotli/gzip compression as pure ASGI middleware
+
+brotli is used when the package is installed and the client accepts it, gzip
+otherwise. Small and already-encoded responses pass through untouched; large
+single-body responses are compressed in a worker thread to keep the event loop free.
+"""
+
+import asyncio
+import gzip
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024  # bytes; below this the headers cost more than they save
+COMPRESS_THREAD_SIZE = 256 * 1024  # bytes; larger bodies are compressed off the event loop
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5  # 11 (the default) is far too slow for per-request compression
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header (None = send identity)"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def merge_vary(headers: list) -> list:
+    """Headers with Accept-Encoding added to Vary (an existing Vary is extended, not duplicated)"""
+    values = [value.decode('latin-1') for key, value in headers if key.lower() == b'vary']
+    fields = [f.strip() for value in values for f in value.split(',') if f.strip()]
+    if '*' in fields or any(f.lower() == 'accept-encoding' for f in fields):
+        return headers
+    merged = ', '.join(fields + ['Accept-Encoding'])
+    return [(key, value) for key, value in headers if key.lower() != b'vary'] + [(b'vary', merged.encode('latin-1'))]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor for multi-chunk (streaming) bodies"""
+
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.finish() if last else out + self._brotli.flush()
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Compresses responses for clients that send Accept-Encoding"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        accept = ''
+        for key, value in scope.get('headers', []):
+            if key == b'accept-encoding':
+                accept = value.decode('latin-1')
+                break
+        encoding = negotiate(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        streamer: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, streamer, passthrough
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if start_message is not None:
+                headers = list(start_message.get('headers', []))
+                names = {key.lower() for key, _ in headers}
+                content_type = next((value.decode('latin-1') for key, value in headers if key.lower() == b'content-type'), '')
+                if (b'content-encoding' in names
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                headers = [(key, value) for key, value in headers if key.lower() != b'content-length']
+                headers.append((b'content-encoding', encoding.encode('latin-1')))
+                headers = merge_vary(headers)
+                if not more_body:
+                    if len(body) >= COMPRESS_THREAD_SIZE:
+                        body = await asyncio.to_thread(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+                    start_message['headers'] = headers
+                    await send(start_message)
+                    start_message = None
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+
+                start_message['headers'] = headers
+                await send(start_message)
+                start_message = None
+                streamer = _StreamCompressor(encoding)
+
+            await send({'type': 'http.response.body', 'body': streamer.chunk(body, last=not more_body),
+                        'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,100 @@
+"""
+Response Serialization
+Field selection and fast JSON encoding for API responses
+
+orjson is used when installed (several times faster than the stdlib encoder on
+the Wrapped payload); otherwise compact stdlib JSON with the same output shape.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Selection tree: {key: subtree}, an empty subtree selects the whole value
+FieldTree = Dict[str, 'FieldTree']
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldTree]:
+    """Parse a fields query value like "aggregate.persona,per_chat.top_words"
+
+    Args:
+        fields: Comma-separated dotted paths; lists are traversed element-wise
+
+    Returns:
+        Selection tree, or None to select everything
+    """
+    if not fields or not fields.strip():
+        return None
+    tree: FieldTree = {}
+    for path in fields.split(','):
+        keys = [key for key in path.strip().split('.') if key]
+        if not keys:
+            continue
+        node = tree
+        for i, key in enumerate(keys):
+            if key in node and not node[key]:
+                break  # An ancestor is already selected whole
+            node = node.setdefault(key, {})
+            if i == len(keys) - 1:
+                node.clear()
+    return tree or None
+
+
+def select_fields(data: Any, tree: Optional[FieldTree]) -> Any:
+    """Keep only the selected paths (unknown keys are ignored)"""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: select_fields(data[key], sub) for key, sub in tree.items() if key in data}
+    return data
+
+
+def wants(tree: Optional[FieldTree], path: str) -> bool:
+    """Whether a dotted path is part of the selection (lets callers skip computing unused slices)"""
+    if tree is None:
+        return True
+    node = tree
+    for key in path.split('.'):
+        if key not in node:
+            return False
+        node = node[key]
+        if not node:
+            return True
+    return True
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_default, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    """JSONResponse using dumps(); return it directly to skip FastAPI's jsonable_encoder pass"""
+
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
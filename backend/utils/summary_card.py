@@ -0,0 +1,406 @@
+"""
+Summary Card Renderer
+Shareable PNG of a Wrapped (persona, top words and emojis, monthly vibe strip), rendered once on the server
+
+card_data() picks the few aggregate fields the card shows and card_hash()
+names the image after them, so a card is rendered once per distinct content
+and its URL never changes meaning (served with immutable cache headers).
+Rendering runs in the CPU tier; the card data is stored next to the image,
+so any API worker can render a card another worker scheduled.
+
+Cards are kept while in use: one not scheduled or served for CARD_TTL (30
+days) is deleted, as are the least recently used ones beyond CARD_MAX_CARDS.
+Its URL then answers 404.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from telemetry import get_logger, log_event
+
+CARD_DIR = os.getenv('CARD_DIR', 'cache/cards')
+# Bundled Pillow font when unset; point these at fonts with the scripts and emoji users need (e.g. Noto)
+CARD_FONT_PATH = os.getenv('CARD_FONT_PATH')
+CARD_BOLD_FONT_PATH = os.getenv('CARD_BOLD_FONT_PATH') or CARD_FONT_PATH
+CARD_EMOJI_FONT_PATH = os.getenv('CARD_EMOJI_FONT_PATH')  # color emoji font (default: Noto Color Emoji if installed)
+CARD_VERSION = 1  # bump when the layout changes: every card gets a new hash
+CARD_TTL = float(os.getenv('CARD_TTL', str(30 * 24 * 3600)))  # seconds since a card was last used
+CARD_MAX_CARDS = int(os.getenv('CARD_MAX_CARDS', '10000'))  # most recently used cards kept (~40-100 KB each)
+CARD_SWEEP_SECONDS = 600  # at most one eviction sweep per process this often
+CARD_SIZE = (1080, 1350)  # 4:5, the portrait size feeds and stories crop least
+CARD_HASH_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+EMOJI_FONT_SIZE = 109  # the only size bitmap color emoji fonts (CBDT) render at
+EMOJI_FONT_CANDIDATES = ('/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf', '/usr/share/fonts/noto/NotoColorEmoji.ttf')
+MONO_EMOJI_FONT_CANDIDATES = ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans.ttf')
+MISSING_GLYPH = '\U000F0000'  # private use: no font draws it
+
+BACKGROUND_TOP = (26, 26, 46)
+BACKGROUND_BOTTOM = (15, 15, 26)
+ACCENT = (0, 136, 204)
+ACCENT_LIGHT = (0, 198, 255)
+TEXT = (255, 255, 255)
+TEXT_MUTED = (140, 140, 155)
+PANEL = (255, 255, 255, 14)
+
+# Vibe strip colours, one per label of wrapper.emotions.EMOTIONS
+EMOTION_COLORS = {
+    'chaotic energy': (255, 149, 0),
+    'unhinged': (255, 59, 48),
+    'main character vibes': (255, 204, 0),
+    'villain arc': (88, 86, 214),
+    'cozy': (162, 132, 94),
+    'wholesome': (52, 199, 89),
+    'salty': (142, 142, 147),
+    'dramatic': (175, 82, 222),
+    'hype': (255, 45, 85),
+    'nostalgic': (90, 200, 250),
+    'simp mode': (255, 105, 180),
+    'down bad': (0, 122, 255),
+    'existential crisis': (72, 72, 74),
+    'flirty': (255, 55, 95),
+    'petty': (48, 176, 199),
+}
+UNKNOWN_EMOTION_COLOR = (58, 58, 70)
+
+_pending: Dict[str, asyncio.Future] = {}  # card hash -> render in progress in this process
+_last_sweep = 0.0
+
+logger = get_logger('summary_card')
+
+
+def card_data(aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields a summary card shows, from a Wrapped aggregate"""
+    persona = aggregate.get('persona') or {}
+    sentiment = aggregate.get('sentiment_by_month') or {}  # keyed '01'..'12'
+    days = (aggregate.get('activity') or {}).get('daily_activity') or {}
+    last_day = max(days) if days else ''
+    # Chronological over the window, ending with the last active month
+    end_month = int(last_day[5:7]) if last_day else 12
+    order = [f"{(end_month + k) % 12 + 1:02d}" for k in range(12)]
+    return {
+        'year': int(last_day[:4]) if last_day else None,
+        'persona_name': persona.get('persona_name', ''),
+        'show': persona.get('show', ''),
+        'yearly_vibe': aggregate.get('yearly_vibe') or persona.get('yearly_vibe', ''),
+        'total_messages': aggregate.get('total_messages', 0),
+        'total_chats': aggregate.get('total_chats', 0),
+        'top_words': list(aggregate.get('top_words', []))[:5],
+        'top_emojis': list(aggregate.get('top_emojis', []))[:5],
+        'months': [[month, sentiment[month].get('primary', '')] for month in order if month in sentiment],
+    }
+
+
+def card_hash(card: Dict[str, Any]) -> str:
+    """Content hash naming a card's image"""
+    payload = json.dumps({'version': CARD_VERSION, 'card': card}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def _font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    path = CARD_BOLD_FONT_PATH if bold else CARD_FONT_PATH
+    if path:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def _fit(draw: ImageDraw.ImageDraw, text: str, font, width: int) -> str:
+    """Text shortened with an ellipsis to fit width"""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text.rstrip() + '…'
+
+
+def _wrap(draw: ImageDraw.ImageDraw, text: str, font, width: int, max_lines: int) -> List[str]:
+    lines: List[str] = []
+    for word in text.split():
+        if lines and draw.textlength(f"{lines[-1]} {word}", font=font) <= width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = _fit(draw, lines[-1] + ' …', font, width)
+    return lines
+
+
+def _has_glyph(font, char: str) -> bool:
+    """Whether font draws char as something other than its missing-glyph box"""
+    def ink(text: str) -> bytes:
+        image = Image.new('L', (font.size * 2, font.size * 2))
+        ImageDraw.Draw(image).text((0, 0), text, font=font, fill=255)
+        return image.tobytes()
+
+    return ink(char) != ink(MISSING_GLYPH)
+
+
+def _emoji_glyphs(emojis: List[str], size: int) -> List[Image.Image]:
+    """RGBA images of the emojis some available font can draw (others are left out, never drawn as boxes)
+
+    A color emoji font is drawn at its native size and scaled down; otherwise
+    the text fonts' monochrome glyphs are used where they exist.
+    """
+    color_path = CARD_EMOJI_FONT_PATH or next((p for p in EMOJI_FONT_CANDIDATES if os.path.exists(p)), None)
+    if color_path:
+        font, native = ImageFont.truetype(color_path, EMOJI_FONT_SIZE), EMOJI_FONT_SIZE
+        fonts, color = [font], True
+    else:
+        native, color = size, False
+        fonts = [_font(size)] + [ImageFont.truetype(p, size) for p in MONO_EMOJI_FONT_CANDIDATES if os.path.exists(p)]
+
+    glyphs = []
+    for emoji in emojis:
+        font = next((f for f in fonts if _has_glyph(f, emoji[:1])), None)
+        if font is None:
+            continue
+        glyph = Image.new('RGBA', (native * 2, native * 2), (0, 0, 0, 0))
+        ImageDraw.Draw(glyph).text((0, 0), emoji, font=font, fill=TEXT, embedded_color=color)
+        bbox = glyph.getbbox()
+        if bbox:
+            glyph = glyph.crop(bbox)
+            glyph.thumbnail((size, size), Image.LANCZOS)
+            glyphs.append(glyph)
+    return glyphs
+
+
+def render_summary_card(card: Dict[str, Any]) -> bytes:
+    """PNG bytes of a summary card (picklable entry point for the CPU tier)
+
+    Args:
+        card: card_data() output
+    """
+    width, height = CARD_SIZE
+    margin = 80
+    inner = width - 2 * margin
+
+    image = Image.new('RGBA', CARD_SIZE)
+    gradient = Image.linear_gradient('L').resize(CARD_SIZE)
+    image.paste(Image.composite(
+        Image.new('RGBA', CARD_SIZE, BACKGROUND_BOTTOM + (255,)),
+        Image.new('RGBA', CARD_SIZE, BACKGROUND_TOP + (255,)),
+        gradient
+    ))
+    overlay = Image.new('RGBA', CARD_SIZE, (0, 0, 0, 0))
+    panels = ImageDraw.Draw(overlay)
+    draw = ImageDraw.Draw(image)
+
+    # Header: year and accent rule
+    y = margin
+    title_font = _font(96, bold=True)
+    year = str(card['year']) if card.get('year') else 'Wrapped'
+    draw.text((margin, y), year, font=title_font, fill=ACCENT)
+    rule_x = margin + int(draw.textlength(year, font=title_font)) + 40
+    draw.rounded_rectangle((rule_x, y + 52, width - margin, y + 60), radius=4, fill=ACCENT)
+    draw.text((rule_x, y + 72), 'TELEGRAM WRAPPED', font=_font(26, bold=True), fill=TEXT_MUTED)
+    y += 150
+
+    # Persona: initial tile, name, show, yearly vibe
+    vibe_font = _font(30)
+    vibe_lines = _wrap(draw, card.get('yearly_vibe', ''), vibe_font, inner - 60, 3)
+    panel_height = 200 + 42 * len(vibe_lines)
+    panels.rounded_rectangle((margin, y, width - margin, y + panel_height), radius=32, fill=PANEL)
+    draw.rounded_rectangle((margin + 30, y + 30, margin + 170, y + 170), radius=24, fill=ACCENT)
+    name = card.get('persona_name') or '?'
+    draw.text((margin + 100, y + 100), name[:1].upper(), font=_font(84, bold=True), fill=TEXT, anchor='mm')
+    draw.text((margin + 200, y + 48), _fit(draw, name, _font(56, bold=True), inner - 230),
+              font=_font(56, bold=True), fill=TEXT)
+    draw.text((margin + 200, y + 118), _fit(draw, card.get('show', ''), _font(32), inner - 230),
+              font=_font(32), fill=ACCENT_LIGHT)
+    for i, line in enumerate(vibe_lines):
+        draw.text((margin + 30, y + 196 + 42 * i), line, font=vibe_font, fill=TEXT_MUTED)
+    y += panel_height + 60
+
+    # Stats
+    label_font = _font(24, bold=True)
+    value_font = _font(72, bold=True)
+    for i, (label, value, color) in enumerate((
+        ('MESSAGES SENT', f"{card.get('total_messages', 0):,}", TEXT),
+        ('CHATS', f"{card.get('total_chats', 0):,}", ACCENT),
+    )):
+        x = margin + i * inner // 2
+        draw.text((x, y), label, font=label_font, fill=TEXT_MUTED)
+        draw.text((x, y + 36), value, font=value_font, fill=color)
+    y += 160
+
+    # Top words as chips
+    if card.get('top_words'):
+        draw.text((margin, y), 'TOP WORDS', font=label_font, fill=TEXT_MUTED)
+        y += 44
+        chip_font = _font(34, bold=True)
+        x = margin
+        for rank, word in enumerate(card.get('top_words', []), start=1):
+            text = f"{rank} {word}"
+            chip_width = int(draw.textlength(text, font=chip_font)) + 44
+            if x + chip_width > width - margin:
+                break
+            panels.rounded_rectangle((x, y, x + chip_width, y + 64), radius=16, fill=PANEL)
+            draw.text((x + 22, y + 32), text, font=chip_font, fill=TEXT, anchor='lm')
+            x += chip_width + 16
+        y += 110
+
+    # Top emojis
+    glyphs = _emoji_glyphs(card.get('top_emojis', []), 72)
+    if glyphs:
+        draw.text((margin, y), 'TOP EMOJIS', font=label_font, fill=TEXT_MUTED)
+        for i, glyph in enumerate(glyphs):
+            image.alpha_composite(glyph, (margin + i * 100 + (72 - glyph.width) // 2, y + 44 + (72 - glyph.height) // 2))
+        y += 160
+
+    # Monthly vibe strip: one cell per month, coloured by its primary emotion
+    months = card.get('months', [])
+    if months:
+        draw.text((margin, y), 'MONTHLY VIBES', font=label_font, fill=TEXT_MUTED)
+        y += 44
+        gap = 10
+        cell = (inner - gap * (len(months) - 1)) / len(months)
+        month_font = _font(22, bold=True)
+        for i, (month, emotion) in enumerate(months):
+            x0 = margin + i * (cell + gap)
+            draw.rounded_rectangle((x0, y, x0 + cell, y + 80), radius=12,
+                                   fill=EMOTION_COLORS.get(emotion, UNKNOWN_EMOTION_COLOR))
+            initial = 'JFMAMJJASOND'[int(month) - 1]
+            draw.text((x0 + cell / 2, y + 104), initial, font=month_font, fill=TEXT_MUTED, anchor='mm')
+        # Legend: the most frequent vibes
+        legend_font = _font(26)
+        x = margin
+        for emotion, _ in Counter(e for _, e in months if e in EMOTION_COLORS).most_common(3):
+            draw.rounded_rectangle((x, y + 146, x + 26, y + 172), radius=6, fill=EMOTION_COLORS[emotion])
+            draw.text((x + 38, y + 159), emotion, font=legend_font, fill=TEXT, anchor='lm')
+            x += 38 + int(draw.textlength(emotion, font=legend_font)) + 40
+
+    # Footer
+    draw.text((width / 2, height - 40), 'TELEGRAMWRAPPED.COM', font=label_font, fill=TEXT_MUTED, anchor='mm')
+
+    image = Image.alpha_composite(image, overlay).convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class SummaryCardStore:
+    """File-backed cards: {hash}.json (card data) and {hash}.png (rendered image)"""
+
+    def __init__(self, root: str = CARD_DIR):
+        self.root = root
+
+    def path(self, card_hash: str, suffix: str = 'png') -> str:
+        return os.path.join(self.root, f"{card_hash}.{suffix}")
+
+    def _write(self, path: str, payload: bytes):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def schedule(self, card: Dict[str, Any]) -> str:
+        """Store the card data and start rendering it in the background (needs a running loop)
+
+        Returns:
+            The card's hash; its image is at /cards/{hash}.png
+        """
+        self._sweep()
+        digest = card_hash(card)
+        self._touch(digest)
+        if not os.path.exists(self.path(digest)):
+            if not os.path.exists(self.path(digest, 'json')):
+                self._write(self.path(digest, 'json'), json.dumps(card, ensure_ascii=False).encode('utf-8'))
+            self.render(digest, card)
+        return digest
+
+    def render(self, card_hash: str, card: Dict[str, Any]) -> asyncio.Future:
+        """Render a card unless this process already is (the same future is shared)"""
+        future = _pending.get(card_hash)
+        if future is None:
+            future = asyncio.ensure_future(self._render(card_hash, card))
+            _pending[card_hash] = future
+            future.add_done_callback(lambda done: self._finished(card_hash, done))
+        return future
+
+    @staticmethod
+    def _finished(card_hash: str, future: asyncio.Future):
+        _pending.pop(card_hash, None)
+        if not future.cancelled() and future.exception() is not None:
+            # Retried on the next request for the image
+            log_event(logger, 'card_render_error', level='warning', card=card_hash, error=str(future.exception()))
+
+    async def _render(self, card_hash: str, card: Dict[str, Any]) -> str:
+        from cpu_pool import run_cpu  # the API side only; workers never schedule renders
+
+        path = self.path(card_hash)
+        self._write(path, await run_cpu(render_summary_card, card))
+        return path
+
+    async def image(self, card_hash: str) -> Optional[str]:
+        """Path of a card's PNG, rendering it first if only its data exists (None if unknown)"""
+        if not CARD_HASH_PATTERN.match(card_hash):
+            return None
+        path = self.path(card_hash)
+        if os.path.exists(path):
+            self._touch(card_hash)
+            return path
+        if card_hash in _pending:
+            return await asyncio.shield(_pending[card_hash])
+        try:
+            with open(self.path(card_hash, 'json'), 'r', encoding='utf-8') as f:
+                card = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return await asyncio.shield(self.render(card_hash, card))
+
+    def _touch(self, card_hash: str):
+        """Mark a card as used now (its data file's mtime)"""
+        try:
+            os.utime(self.path(card_hash, 'json'))
+        except OSError:
+            pass  # Not stored yet
+
+    def _sweep(self):
+        global _last_sweep
+        now = time.time()
+        if now - _last_sweep >= CARD_SWEEP_SECONDS:
+            _last_sweep = now
+            self.evict(now)
+
+    def evict(self, now: Optional[float] = None):
+        """Delete cards unused for CARD_TTL, then the least recently used beyond CARD_MAX_CARDS"""
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        last_used: Dict[str, float] = {}
+        for name in names:
+            digest, _, suffix = name.partition('.')
+            if suffix not in ('json', 'png') or digest in _pending:
+                continue
+            try:
+                mtime = os.path.getmtime(os.path.join(self.root, name))
+            except OSError:
+                continue
+            # The data file is touched on use; an image without one goes by its own age
+            if suffix == 'json' or digest not in last_used:
+                last_used[digest] = mtime
+        by_age = sorted(last_used, key=last_used.get)
+        stale = [digest for digest in by_age if now - last_used[digest] > CARD_TTL]
+        kept = len(by_age) - len(stale)
+        stale += [digest for digest in by_age if now - last_used[digest] <= CARD_TTL][:max(0, kept - CARD_MAX_CARDS)]
+        for digest in stale:
+            for suffix in ('png', 'json'):
+                try:
+                    os.remove(self.path(digest, suffix))
+                except OSError:
+                    pass  # Already gone (or removed by another worker)
@@ -3,11 +3,36 @@ Word Cloud Generator for User Messages
 Generates visual word clouds from text data
 """
 
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
-from typing import Dict, Optional
+import os
+from typing import Dict
+
+from PIL import Image, ImageDraw, ImageFont
+
+# wordcloud's bundled font has no CJK, Arabic or Indic glyphs; point this at one that does (e.g. Noto Sans CJK)
+WORDCLOUD_FONT_PATH = os.getenv('WORDCLOUD_FONT_PATH')
+
+
+def _colormap_color_func(colormap: str):
+    """Word color function like wordcloud's own, minus its matplotlib.pyplot import"""
+    from matplotlib import colormaps
+    cmap = colormaps[colormap]
+
+    def color_func(word, font_size, position, orientation, random_state=None, **kwargs):
+        r, g, b, _ = (max(0.0, 255.0 * c) for c in cmap(random_state.uniform(0, 1)))
+        return f"rgb({r:.0f}, {g:.0f}, {b:.0f})"
+
+    return color_func
+
+
+def _word_cloud(colormap: str, **kwargs):
+    """WordCloud instance; the package (and matplotlib behind it) loads on first use"""
+    os.environ.setdefault('MPLBACKEND', 'Agg')  # headless server, never a GUI backend
+    from wordcloud import WordCloud
+    if WORDCLOUD_FONT_PATH:
+        kwargs.setdefault('font_path', WORDCLOUD_FONT_PATH)
+    return WordCloud(color_func=_colormap_color_func(colormap), **kwargs)
 
 
 class WordCloudGenerator:
@@ -39,7 +64,7 @@ class WordCloudGenerator:
             return self._generate_empty_wordcloud()
 
         # Create word cloud
-        wordcloud = WordCloud(
+        wordcloud = _word_cloud(
             width=self.width,
             height=self.height,
             background_color=self.background_color,
@@ -50,7 +75,7 @@ class WordCloudGenerator:
         ).generate(text)
 
         # Convert to image
-        return self._wordcloud_to_base64(wordcloud)
+        return self._image_to_base64(wordcloud.to_image())
 
     def generate_from_frequencies(self, frequencies: Dict[str, int]) -> str:
         """Generate word cloud from word frequency dict
@@ -65,7 +90,7 @@ class WordCloudGenerator:
             return self._generate_empty_wordcloud()
 
         # Create word cloud from frequencies
-        wordcloud = WordCloud(
+        wordcloud = _word_cloud(
             width=self.width,
             height=self.height,
             background_color=self.background_color,
@@ -74,47 +99,28 @@ class WordCloudGenerator:
             min_font_size=10
         ).generate_from_frequencies(frequencies)
 
-        return self._wordcloud_to_base64(wordcloud)
-
-    def _wordcloud_to_base64(self, wordcloud: WordCloud) -> str:
-        """Convert WordCloud to base64 string"""
-        # Create figure
-        plt.figure(figsize=(self.width/100, self.height/100), dpi=100)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.tight_layout(pad=0)
+        return self._image_to_base64(wordcloud.to_image())
 
-        # Save to bytes
+    @staticmethod
+    def _image_to_base64(image: Image.Image) -> str:
+        """Encode a PIL image as a PNG data URI"""
         buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', pad_inches=0)
-        plt.close()
-
-        # Encode to base64
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
+        image.save(buffer, format='PNG', optimize=True)
+        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
 
         return f"data:image/png;base64,{img_base64}"
 
     def _generate_empty_wordcloud(self) -> str:
         """Generate placeholder for empty data"""
-        # Create empty figure
-        plt.figure(figsize=(self.width/100, self.height/100), dpi=100)
-        plt.text(
-            0.5, 0.5,
-            'No data available',
-            ha='center', va='center',
-            fontsize=20, color='gray'
-        )
-        plt.axis('off')
+        image = Image.new('RGB', (self.width, self.height), self.background_color)
+        draw = ImageDraw.Draw(image)
+        try:
+            font = ImageFont.load_default(size=20)
+        except TypeError:  # Pillow < 10.1 has a single fixed-size bitmap font
+            font = ImageFont.load_default()
+        draw.text((self.width / 2, self.height / 2), 'No data available', fill='gray', font=font, anchor='mm')
 
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight')
-        plt.close()
-
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-
-        return f"data:image/png;base64,{img_base64}"
+        return self._image_to_base64(image)
 
     def save_to_file(self, text: str, output_path: str, max_words: int = 100):
         """Generate and save word cloud to file
@@ -124,7 +130,7 @@ class WordCloudGenerator:
             output_path: Path to save PNG file
             max_words: Maximum words in cloud
         """
-        wordcloud = WordCloud(
+        wordcloud = _word_cloud(
             width=self.width,
             height=self.height,
             background_color=self.background_color,
@@ -134,12 +140,7 @@ class WordCloudGenerator:
             min_font_size=10
         ).generate(text)
 
-        plt.figure(figsize=(self.width/100, self.height/100), dpi=100)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.tight_layout(pad=0)
-        plt.savefig(output_path, bbox_inches='tight', pad_inches=0)
-        plt.close()
+        wordcloud.to_file(output_path)
 
 
 # Preset themes
@@ -1,7 +1,12 @@
 from .frequency_couner import FrequencyCounter
 from .llm_analyzer import LLMAnalyzer
+from .month_store import MonthStore
+from .member_stats import MemberStats
+from .phrase_counter import PhraseCounter
+from .tokenizer import Tokenizer, detect_languages, register_stopwords
 
 # Backward compat alias
 GeminiAnalyzer = LLMAnalyzer
 
-__all__ = ['LLMAnalyzer', 'GeminiAnalyzer', 'FrequencyCounter']
+__all__ = ['LLMAnalyzer', 'GeminiAnalyzer', 'FrequencyCounter', 'MonthStore', 'MemberStats',
+           'PhraseCounter', 'Tokenizer', 'detect_languages', 'register_stopwords']
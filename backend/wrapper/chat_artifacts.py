@@ -0,0 +1,183 @@
+"""
+Chat Artifact Store
+Per-chat analysis shared by every member who generates a Wrapped, keyed by chat and data watermark
+
+Parsing, member stats, the reply graph and month samples of a group chat are
+the same whichever member asks; only the slice handed out differs. The first
+member's analysis is stored here, and later members with the same watermark
+skip the download and the chat-wide work. An artifact holds every member's
+messages, so the orchestrator only ever reads the requesting user's slice
+out of it, and private chats are never shared (see scoped_chat_key).
+
+Groups can hide history from new members, so members only share a group's
+artifact (and month state, and message cache entry) when they can read the
+same messages: group keys carry the member's oldest readable message id.
+
+Artifacts hold raw message texts, so like the message cache they are kept
+briefly: one is served for ARTIFACT_TTL (1 hour) after it was saved, an
+expired one is deleted when looked up, the least recently used beyond
+ARTIFACT_MAX_CHATS are deleted, and every API worker sweeps the directory
+every ARTIFACT_SWEEP_SECONDS (5 minutes).
+"""
+
+import asyncio
+import os
+import pickle
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+ARTIFACT_DIR = os.getenv('ARTIFACT_DIR', 'cache/artifacts')
+ARTIFACT_VERSION = 2  # bump when the artifact layout changes
+ARTIFACT_TTL = float(os.getenv('ARTIFACT_TTL', '3600'))  # seconds an artifact is served after it was saved
+ARTIFACT_MAX_CHATS = int(os.getenv('ARTIFACT_MAX_CHATS', '1000'))  # most recently used artifacts kept
+ARTIFACT_SWEEP_SECONDS = float(os.getenv('ARTIFACT_SWEEP_SECONDS', '300'))  # between expiry sweeps
+
+
+def is_shared_chat(chat_key: str) -> bool:
+    """Group and channel ids (negative) name one conversation for all members"""
+    return all(part.startswith('-') for part in chat_key.split('_'))
+
+
+def scoped_chat_key(chat_key: str, user_id: str, visible_from: Optional[int] = None) -> str:
+    """Cache key of a chat as seen by user_id
+
+    A private chat's id is the other person's user id, so A's and C's chats
+    with B share it: those keys get their owner appended. A group key gets
+    the member's oldest readable message id (see oldest_visible_id): members
+    who joined a group that hides its history see less of it than others.
+
+    Args:
+        chat_key: Chat id, or '_'-joined ids for a multi-chat export
+        user_id: User the analysis is for
+        visible_from: Oldest message id user_id can read in the group (None for a complete export)
+    """
+    if not is_shared_chat(chat_key):
+        return f"{chat_key}-u{user_id}"
+    if visible_from is not None:
+        return f"{chat_key}-from{visible_from}"
+    return chat_key
+
+
+def make_watermark(top_message_id: int, cutoff: datetime) -> str:
+    """Identifies a chat's analyzed window: newest message id and the 1-year cutoff day
+
+    A new message changes the id; the window sliding by a day changes the cutoff.
+    """
+    return f"{top_message_id}:{cutoff.date().isoformat()}"
+
+
+class ChatArtifactStore:
+    """File-backed artifacts, one pickle per chat plus a small watermark file
+
+    The pickle's mtime is when the artifact was saved (TTL); the watermark
+    file's is when it was last used (size cap).
+
+    Artifact layout:
+        {
+          'version', 'chat_ids', 'date_range', 'total_in_chat', 'languages',
+          'members': {user_id: member stats}, 'leaderboard': [...],
+          'messages_by_member': {user_id: [parsed messages]},
+          'timestamps': int64 array, 'from_ids': str array (dated messages),
+          'replies': ReplyGraph,
+          'months': {month: {fingerprint, samples}}   # sentiment input, see MonthStore
+        }
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR, ttl: float = ARTIFACT_TTL, max_chats: int = ARTIFACT_MAX_CHATS):
+        self.root = root
+        self.ttl = ttl
+        self.max_chats = max_chats
+
+    def _path(self, chat_key: str, suffix: str) -> str:
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in chat_key)
+        return os.path.join(self.root, f"{safe_key}.{suffix}")
+
+    def _fresh(self, path: str, now: Optional[float] = None) -> bool:
+        try:
+            return (time.time() if now is None else now) - os.path.getmtime(path) < self.ttl
+        except OSError:
+            return False
+
+    @staticmethod
+    def _remove(*paths: str):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Missing, or another worker removed it first
+
+    def watermark(self, chat_key: str) -> Optional[str]:
+        """Watermark of the stored artifact (None if there is none or it expired, which deletes it)"""
+        if not self._fresh(self._path(chat_key, 'pkl')):
+            self._remove(self._path(chat_key, 'pkl'), self._path(chat_key, 'watermark'))
+            return None
+        try:
+            with open(self._path(chat_key, 'watermark'), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def has(self, chat_key: str, watermark: str) -> bool:
+        """Whether a stored artifact covers exactly this watermark (cheap: no unpickling)"""
+        return self.watermark(chat_key) == watermark
+
+    def load(self, chat_key: str) -> Optional[Dict[str, Any]]:
+        """Stored artifact, or None if missing, unreadable or from another layout version"""
+        try:
+            with open(self._path(chat_key, 'pkl'), 'rb') as f:
+                artifact = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if not isinstance(artifact, dict) or artifact.get('version') != ARTIFACT_VERSION:
+            return None
+        try:
+            os.utime(self._path(chat_key, 'watermark'))  # Last used, for the size cap
+        except OSError:
+            pass
+        return artifact
+
+    def save(self, chat_key: str, artifact: Dict[str, Any], watermark: str):
+        """Atomically write an artifact, then its watermark (readers never see a watermark without data)"""
+        os.makedirs(self.root, exist_ok=True)
+        for suffix, payload in (
+            ('pkl', pickle.dumps({**artifact, 'version': ARTIFACT_VERSION}, protocol=pickle.HIGHEST_PROTOCOL)),
+            ('watermark', watermark.encode('utf-8'))
+        ):
+            path = self._path(chat_key, suffix)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+    def evict(self, now: Optional[float] = None):
+        """Delete expired artifacts (and leftovers of interrupted writes), then the least recently used beyond max_chats"""
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        present = set(names)
+        last_used: Dict[str, float] = {}
+        for name in names:
+            path = os.path.join(self.root, name)
+            stem, _, suffix = name.partition('.')
+            if suffix == 'pkl':
+                if not self._fresh(path, now):
+                    self._remove(path, os.path.join(self.root, f"{stem}.watermark"))
+                    continue
+                try:
+                    last_used[stem] = os.path.getmtime(os.path.join(self.root, f"{stem}.watermark"))
+                except OSError:
+                    last_used[stem] = os.path.getmtime(path) if os.path.exists(path) else 0.0  # Watermark not written yet
+            elif suffix.endswith('.tmp') or (suffix == 'watermark' and f"{stem}.pkl" not in present):
+                if not self._fresh(path, now):
+                    self._remove(path)
+        for stem in sorted(last_used, key=last_used.get)[:max(0, len(last_used) - self.max_chats)]:
+            self._remove(os.path.join(self.root, f"{stem}.pkl"), os.path.join(self.root, f"{stem}.watermark"))
+
+    async def sweep(self, interval: float = ARTIFACT_SWEEP_SECONDS):
+        """Evict artifacts now and every interval seconds (run as a background task)"""
+        while True:
+            await asyncio.to_thread(self.evict)
+            await asyncio.sleep(interval)
@@ -0,0 +1,146 @@
+"""
+LLM Deadlines and Hedged Requests
+Per-call timeouts, per-job deadlines and tail-latency hedging for completion calls
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+LLM_CALL_TIMEOUT = float(os.getenv('LLM_CALL_TIMEOUT', '30'))  # seconds per completion call (incl. hedge)
+LLM_JOB_DEADLINE = float(os.getenv('LLM_JOB_DEADLINE', '90'))  # seconds for all LLM work of one Wrapped
+LLM_HEDGE = os.getenv('LLM_HEDGE', '1') not in ('0', 'false', 'no')
+
+HEDGE_PERCENTILE = 95  # Duplicate a call once it runs past this latency percentile
+HEDGE_MIN_SAMPLES = 20  # Observed calls needed before hedging starts
+HEDGE_MIN_DELAY = 0.25  # seconds, never hedge earlier than this
+LATENCY_WINDOW = 200  # Recent call latencies kept for the percentile
+
+_job_deadline: ContextVar[Optional[float]] = ContextVar('llm_job_deadline', default=None)
+
+
+class LLMTimeout(Exception):
+    """A completion call (or the whole job) ran out of time"""
+
+
+@contextmanager
+def job_deadline(seconds: Optional[float] = LLM_JOB_DEADLINE):
+    """Bound all LLM calls made inside the block (including gathered tasks)
+
+    Nested blocks keep the outer, earlier deadline.
+    """
+    if seconds is None or _job_deadline.get() is not None:
+        yield
+        return
+    token = _job_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _job_deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current job deadline (None = no deadline)"""
+    deadline = _job_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        return float(np.percentile(np.fromiter(self._samples, dtype=np.float64), q))
+
+    def hedge_delay(self) -> Optional[float]:
+        """When to send the duplicate request (None until enough calls were seen)"""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.percentile(HEDGE_PERCENTILE))
+
+
+# Process-wide: analyzers are created per request, the latency picture is not
+SHARED_LATENCY = LatencyTracker()
+
+
+async def hedged_call(
+    make_call: Callable[[], Awaitable[Any]],
+    timeout: float,
+    hedge_delay: Optional[float] = None,
+    stats: Optional[Dict[str, int]] = None,
+    make_hedge: Optional[Callable[[], Optional[Awaitable[Any]]]] = None
+) -> Any:
+    """Run make_call() with a timeout, duplicating it once after hedge_delay
+
+    The first successful result wins and the other call is cancelled. If one
+    copy fails while the other is still running, the survivor is awaited.
+
+    Args:
+        make_call: Factory returning a fresh awaitable per attempt
+        timeout: Overall seconds for the call, hedge included
+        hedge_delay: Seconds before the duplicate is sent (None = never)
+        stats: Optional counters updated in place ('hedged', 'hedge_wins')
+        make_hedge: Factory for the duplicate (default: make_call); returning None skips the hedge,
+            e.g. when no concurrency slot or budget is free for it
+
+    Returns:
+        The winning call's result
+
+    Raises:
+        LLMTimeout: Nothing finished within timeout
+    """
+    if timeout <= 0:
+        raise LLMTimeout("No time left for LLM call")
+
+    start = time.monotonic()
+    primary = asyncio.ensure_future(make_call())
+    pending = {primary}
+    hedge = None
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            elapsed = time.monotonic() - start
+            wait_for = timeout - elapsed
+            if hedge is None and hedge_delay is not None and hedge_delay - elapsed < wait_for:
+                wait_for = hedge_delay - elapsed
+            done, pending = await asyncio.wait(pending, timeout=max(wait_for, 0), return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge and stats is not None:
+                        stats['hedge_wins'] = stats.get('hedge_wins', 0) + 1
+                    return task.result()
+                error = task.exception()
+
+            if time.monotonic() - start >= timeout:
+                break
+            if hedge is None and hedge_delay is not None and pending and time.monotonic() - start >= hedge_delay:
+                attempt = (make_hedge or make_call)()
+                if attempt is None:
+                    hedge_delay = None
+                    continue
+                hedge = asyncio.ensure_future(attempt)
+                pending.add(hedge)
+                if stats is not None:
+                    stats['hedged'] = stats.get('hedged', 0) + 1
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+    if error is not None and not pending:
+        raise error
+    raise LLMTimeout(f"LLM call exceeded {timeout:.1f}s")
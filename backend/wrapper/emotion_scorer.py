@@ -0,0 +1,236 @@
+"""
+Local Emotion Scorer
+Lexicon/emoji/punctuation features mapped to the shared emotion labels without API calls
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Any
+
+import numpy as np
+
+from .emotions import EMOTIONS
+from .frequency_couner import EMOJI_PATTERN
+
+LOCAL_CONFIDENCE_THRESHOLD = 0.45  # Hybrid mode sends months below this to the LLM
+MIN_EVIDENCE_PER_MESSAGE = 0.15  # Feature hits per message needed for full confidence
+SOFTMAX_TEMPERATURE = 0.35
+
+# Words and emoji that signal an emotion (weight 1.0 each)
+LEXICON: Dict[str, List[str]] = {
+    'chaotic energy': [
+        'lmao', 'lmfao', 'wtf', 'omg', 'crazy', 'insane', 'wild', 'random', 'chaos', 'chaotic',
+        'bruhhh', 'yolo', '💀', '🤪', '🤣', '😂'
+    ],
+    'unhinged': [
+        'unhinged', 'psycho', 'deranged', 'screaming', 'scream', 'feral', 'kill', 'murder',
+        'rage', 'fuming', '🙃', '😵', '🤡', '🤬'
+    ],
+    'main character vibes': [
+        'slay', 'slayed', 'iconic', 'queen', 'king', 'myself', 'glowup', 'glow', 'era', 'aesthetic',
+        'outfit', 'confident', 'vibes', '💅', '✨', '👑', '😎', '📸'
+    ],
+    'villain arc': [
+        'revenge', 'hate', 'enemy', 'evil', 'blocked', 'block', 'karma', 'deserve', 'deserved',
+        'betrayed', 'traitor', 'snake', '😈', '🔪', '🐍', '🖕'
+    ],
+    'cozy': [
+        'home', 'tea', 'coffee', 'bed', 'sleep', 'sleepy', 'nap', 'chill', 'rain', 'blanket',
+        'movie', 'netflix', 'warm', 'soup', 'cook', 'cooking', '☕', '🍵', '🛌', '🧸', '🌧'
+    ],
+    'wholesome': [
+        'thanks', 'thank', 'love', 'proud', 'happy', 'sweet', 'kind', 'hug', 'hugs', 'congrats',
+        'congratulations', 'grateful', 'bless', 'care', 'support', '❤', '🥰', '🤗', '😊', '🙏', '💛'
+    ],
+    'salty': [
+        'ugh', 'annoying', 'whatever', 'seriously', 'bruh', 'tired', 'mad', 'annoyed', 'pissed',
+        'irritating', 'unfair', 'rude', '🙄', '😒', '😤', '😑'
+    ],
+    'dramatic': [
+        'literally', 'dying', 'dead', 'worst', 'disaster', 'crying', 'cry', 'cried', 'tragic',
+        'devastated', 'nightmare', 'omfg', '😭', '😩', '😱', '💔'
+    ],
+    'hype': [
+        'lets', 'hype', 'excited', 'party', 'win', 'won', 'fire', 'lit', 'goat', 'epic', 'yay',
+        'woohoo', 'lesgo', 'finally', 'amazing', 'awesome', '🔥', '🎉', '🚀', '💯', '🙌', '🥳'
+    ],
+    'nostalgic': [
+        'remember', 'memories', 'memory', 'throwback', 'childhood', 'old', 'used', 'miss',
+        'missed', 'ago', 'school', 'reunion', '🥲', '📼'
+    ],
+    'simp mode': [
+        'cute', 'babe', 'baby', 'bae', 'beautiful', 'handsome', 'crush', 'adore', 'gorgeous',
+        'pretty', 'perfect', '😍', '🥺', '💕', '💖', '💗'
+    ],
+    'down bad': [
+        'lonely', 'single', 'desperate', 'pls', 'please', 'need', 'hungry', 'broke', 'sad',
+        'cant', 'help', '🥵', '🫠', '😔', '😞'
+    ],
+    'existential crisis': [
+        'life', 'meaning', 'future', 'career', 'exam', 'exams', 'stress', 'stressed', 'anxiety',
+        'lost', 'purpose', 'deadline', 'deadlines', 'burnout', 'die', '🤯', '😶'
+    ],
+    'flirty': [
+        'hey', 'wink', 'kiss', 'kisses', 'date', 'dinner', 'tonight', 'handsome', 'sexy', 'hot',
+        'xoxo', 'miss', '😉', '😘', '😏', '💋', '😚'
+    ],
+    'petty': [
+        'technically', 'anyway', 'anyways', 'fine', 'noted', 'sure', 'k', 'kk', 'lol', 'cool',
+        'interesting', 'wow', 'imagine', 'receipts', '😌', '💁', '🤭'
+    ],
+}
+
+# Punctuation/style features: name -> {emotion: weight}
+STYLE_WEIGHTS: Dict[str, Dict[str, float]] = {
+    'exclaim': {'hype': 0.5, 'dramatic': 0.3, 'chaotic energy': 0.2},
+    'question': {'existential crisis': 0.3, 'petty': 0.2},
+    'ellipsis': {'nostalgic': 0.4, 'existential crisis': 0.3, 'petty': 0.2},
+    'caps': {'chaotic energy': 0.5, 'unhinged': 0.5, 'dramatic': 0.3},
+    'laugh': {'chaotic energy': 0.6, 'wholesome': 0.2},
+    'elongated': {'dramatic': 0.4, 'simp mode': 0.3, 'flirty': 0.2},
+}
+
+# Weak prior so empty months land on the defaults the LLM path also uses
+PRIOR = {'wholesome': 0.2, 'cozy': 0.15}
+
+WORD_PATTERN = re.compile(r"[a-z']+")
+CAPS_PATTERN = re.compile(r'\b[A-Z]{3,}\b')
+LAUGH_PATTERN = re.compile(r'\b(?:a?(?:ha){2,}h?|(?:he){2,}|lo+l+|xd+)\b', re.IGNORECASE)
+ELONGATED_PATTERN = re.compile(r'([a-z])\1{2,}')
+
+
+def _compile():
+    """Vocabulary index + dense weight matrix, built once at import"""
+    vocab: Dict[str, int] = {}
+    rows: List[Dict[str, float]] = []
+    for emotion, terms in LEXICON.items():
+        for term in terms:
+            idx = vocab.setdefault(term, len(vocab))
+            if idx == len(rows):
+                rows.append({})
+            rows[idx][emotion] = rows[idx].get(emotion, 0.0) + 1.0
+    style_offset = len(vocab)
+    for name in STYLE_WEIGHTS:
+        vocab[f'__{name}__'] = len(vocab)
+        rows.append(STYLE_WEIGHTS[name])
+
+    weights = np.zeros((len(vocab), len(EMOTIONS)), dtype=np.float64)
+    for idx, row in enumerate(rows):
+        for emotion, weight in row.items():
+            weights[idx, EMOTIONS.index(emotion)] = weight
+    prior = np.array([PRIOR.get(e, 0.0) for e in EMOTIONS], dtype=np.float64)
+    return vocab, weights, prior, style_offset
+
+
+VOCAB, WEIGHTS, PRIOR_VECTOR, STYLE_OFFSET = _compile()
+
+
+class EmotionScorer:
+    """Score months of messages against the fixed emotion labels"""
+
+    def featurize(self, texts: List[str]) -> np.ndarray:
+        """Feature counts for one month
+
+        Args:
+            texts: Message texts of the month
+
+        Returns:
+            Vector of length len(VOCAB)
+        """
+        joined = '\n'.join(texts)
+        tokens = WORD_PATTERN.findall(joined.lower())
+        tokens.extend(''.join(EMOJI_PATTERN.findall(joined)))
+
+        indices = [VOCAB[t] for t in tokens if t in VOCAB]
+        features = np.bincount(indices, minlength=len(VOCAB)).astype(np.float64) if indices else np.zeros(len(VOCAB))
+
+        features[VOCAB['__exclaim__']] = joined.count('!')
+        features[VOCAB['__question__']] = joined.count('?')
+        features[VOCAB['__ellipsis__']] = joined.count('...')
+        features[VOCAB['__caps__']] = len(CAPS_PATTERN.findall(joined))
+        features[VOCAB['__laugh__']] = len(LAUGH_PATTERN.findall(joined))
+        features[VOCAB['__elongated__']] = len(ELONGATED_PATTERN.findall(joined.lower()))
+        return features
+
+    def score_months(self, month_samples: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+        """Score all months with one matrix product
+
+        Args:
+            month_samples: {month: [texts]}
+
+        Returns:
+            {month: {primary, secondary, confidence, vibe_summary, source}}
+        """
+        if not month_samples:
+            return {}
+
+        months = sorted(month_samples)
+        features = np.vstack([self.featurize(month_samples[m]) for m in months])
+        message_counts = np.array([max(len(month_samples[m]), 1) for m in months], dtype=np.float64)
+
+        # Per-message rates so busy months don't get inflated scores
+        rates = features / message_counts[:, None]
+        scores = rates @ WEIGHTS + PRIOR_VECTOR
+
+        logits = scores / SOFTMAX_TEMPERATURE
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        # Little lexical evidence -> low confidence, whatever the softmax says
+        evidence = features[:, :STYLE_OFFSET].sum(axis=1) / message_counts
+        coverage = np.minimum(1.0, evidence / MIN_EVIDENCE_PER_MESSAGE)
+
+        ranked = np.argsort(-probs, axis=1, kind='stable')
+        results = {}
+        for i, month in enumerate(months):
+            primary = EMOTIONS[ranked[i, 0]]
+            secondary = EMOTIONS[ranked[i, 1]]
+            confidence = float(probs[i, ranked[i, 0]] + probs[i, ranked[i, 1]]) * float(coverage[i])
+            results[month] = {
+                'primary': primary,
+                'secondary': secondary,
+                'confidence': round(min(confidence, 1.0), 2),
+                'vibe_summary': f"Mostly {primary} with a side of {secondary}",
+                'source': 'local'
+            }
+        return results
+
+
+def match_persona_local(sentiment_by_month: Dict[str, Dict], personas: Dict[str, Dict]) -> Dict[str, Any]:
+    """Pick the persona whose traits mention the user's emotions most often
+
+    Args:
+        sentiment_by_month: {month: {primary, secondary, ...}}
+        personas: PERSONAS catalogue from llm_analyzer
+
+    Returns:
+        Same shape as LLMAnalyzer.match_persona
+    """
+    emotions = Counter()
+    for v in sentiment_by_month.values():
+        if v.get('primary') and v.get('primary') != 'error':
+            emotions[v['primary']] += 2
+        if v.get('secondary') and v.get('secondary') != 'error':
+            emotions[v['secondary']] += 1
+
+    best_id, best_score = 'jake', 0
+    for pid, persona in personas.items():
+        traits = persona['traits'].lower()
+        score = sum(count for emotion, count in emotions.items() if emotion in traits)
+        if score > best_score:
+            best_id, best_score = pid, score
+
+    persona = personas[best_id]
+    total = sum(emotions.values())
+    top = [e for e, _ in emotions.most_common(2)]
+    return {
+        'persona_id': best_id,
+        'match_reason': f"Your chats were mostly {' and '.join(top)}." if top else '',
+        'confidence': round(best_score / total, 2) if total else 0.0,
+        'yearly_vibe': f"A year of {top[0]} energy" if top else '',
+        'persona_name': persona['name'],
+        'show': persona['show'],
+        'traits': persona['traits'],
+        'source': 'local'
+    }
@@ -0,0 +1,10 @@
+"""
+Emotion Labels
+The fixed label set shared by the LLM prompts, the local scorer, the LLM stand-in and the summary card
+"""
+
+EMOTIONS = [
+    'chaotic energy', 'unhinged', 'main character vibes', 'villain arc',
+    'cozy', 'wholesome', 'salty', 'dramatic', 'hype', 'nostalgic',
+    'simp mode', 'down bad', 'existential crisis', 'flirty', 'petty'
+]
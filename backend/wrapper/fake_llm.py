@@ -0,0 +1,192 @@
+"""
+Local LLM Stand-in
+Drop-in replacement for AsyncOpenAI used for offline runs, benchmarks and load tests
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from .emotions import EMOTIONS
+
+FAKE_LLM_LATENCY_MS = os.getenv('FAKE_LLM_LATENCY_MS', '0')  # "median" or "median,sigma" (lognormal)
+
+# Provider-style prefix caching: prefixes of at least this many tokens are cached in blocks
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+CACHE_SPEEDUP = 0.5  # Fraction of latency saved when the whole prompt is cached
+STREAM_CHUNK_CHARS = 32
+
+
+def prompt_hash(messages: List[Dict]) -> str:
+    """Stable key for a chat completion request (used by recordings)"""
+    content = '\n'.join(f"{m.get('role', '')}:{m.get('content', '')}" for m in messages)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def parse_latency_profile(spec: str) -> Tuple[float, float]:
+    """'800,0.5' -> (0.8s median, 0.5 sigma)"""
+    parts = [p.strip() for p in spec.split(',') if p.strip()]
+    median_ms = float(parts[0]) if parts else 0.0
+    sigma = float(parts[1]) if len(parts) > 1 else 0.0
+    return median_ms / 1000.0, sigma
+
+
+def load_recordings(path: str) -> Dict[str, str]:
+    """Recordings JSONL ({prompt_hash, response} per line) -> {hash: response}"""
+    recordings = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry['prompt_hash']] = entry['response']
+    return recordings
+
+
+class _Completions:
+    def __init__(self, owner: 'FakeAsyncOpenAI'):
+        self._owner = owner
+
+    async def create(self, model: str, messages: List[Dict], stream: bool = False, **kwargs):
+        if stream:
+            return self._owner._stream(messages, **kwargs)
+        return await self._owner._complete(messages, **kwargs)
+
+
+class FakeAsyncOpenAI:
+    """Answers chat completions from recordings, or synthesizes well-formed responses
+
+    Responses follow the exact output formats the prompts ask for, so the
+    normal parsing code runs unchanged.
+    """
+
+    def __init__(
+        self,
+        recordings_path: Optional[str] = None,
+        latency_profile: Optional[Tuple[float, float]] = None,
+        seed: Optional[int] = None
+    ):
+        self.recordings = load_recordings(recordings_path) if recordings_path else {}
+        self.median_latency, self.sigma = latency_profile or parse_latency_profile(FAKE_LLM_LATENCY_MS)
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self._prefixes = set()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def sample_latency(self) -> float:
+        if self.median_latency <= 0:
+            return 0.0
+        return self._rng.lognormvariate(0, self.sigma) * self.median_latency if self.sigma else self.median_latency
+
+    def _cached_tokens(self, messages: List[Dict]) -> int:
+        """Tokens of the leading system prefix already seen (and long enough to be cached)"""
+        prefix = ''.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+        tokens = len(prefix) // 4
+        if tokens < CACHE_MIN_TOKENS:
+            return 0
+        key = hashlib.sha1(prefix.encode('utf-8')).hexdigest()
+        if key not in self._prefixes:
+            self._prefixes.add(key)
+            return 0
+        return tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+
+    def _prepare(self, messages: List[Dict]) -> Tuple[str, SimpleNamespace, float]:
+        """(content, usage, latency) for one request"""
+        self.calls += 1
+        prompt = '\n'.join(m.get('content', '') for m in messages)
+        key = prompt_hash(messages)
+        content = self.recordings.get(key) or self._synthesize(messages, key)
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        cached_tokens = self._cached_tokens(messages)
+        latency = self.sample_latency()
+        if prompt_tokens:
+            latency *= 1 - CACHE_SPEEDUP * cached_tokens / prompt_tokens
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens)
+        )
+        return content, usage, latency
+
+    async def _complete(self, messages: List[Dict], **kwargs) -> SimpleNamespace:
+        content, usage, latency = self._prepare(messages)
+        if latency:
+            await asyncio.sleep(latency)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage
+        )
+
+    async def _stream(self, messages: List[Dict], **kwargs):
+        """Chunks like the OpenAI stream; latency is time to first token, usage comes last"""
+        content, usage, latency = self._prepare(messages)
+        if latency:
+            await asyncio.sleep(latency)
+        for i in range(0, len(content), STREAM_CHUNK_CHARS):
+            delta = SimpleNamespace(content=content[i:i + STREAM_CHUNK_CHARS])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            await asyncio.sleep(0)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    @staticmethod
+    def _pick(options: List[str], *parts: str) -> str:
+        digest = hashlib.sha1('|'.join(parts).encode('utf-8')).digest()
+        return options[digest[0] % len(options)]
+
+    @staticmethod
+    def _section(text: str, header: str) -> List[str]:
+        """Lines of a prompt section: after the line starting with header, up to the next blank line"""
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            if line.startswith(header):
+                section = []
+                for item in lines[i + 1:]:
+                    if not item.strip():
+                        break
+                    section.append(item)
+                return section
+        return []
+
+    def _synthesize(self, messages: List[Dict], key: str) -> str:
+        """Deterministic response in the format the system prompt asks for"""
+        system = '\n'.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+        prompt = '\n'.join(m.get('content', '') for m in messages if m.get('role') != 'system')
+        if 'persona_id:' in system:
+            persona_ids = [
+                line.split(':', 1)[0].strip('- ').strip()
+                for line in self._section(system, 'PERSONAS')
+                if line.startswith('- ') and ':' in line
+            ]
+            persona_id = self._pick(persona_ids or ['jake'], key)
+            return (
+                f"persona_id: {persona_id}\n"
+                f"match_reason: Synthetic match from the local stand-in.\n"
+                f"confidence: 0.5\n"
+                f"yearly_vibe: A very reproducible year"
+            )
+
+        months = []
+        for line in prompt.split('\n'):
+            if line.startswith('Analyze these months:'):
+                months = [m.strip() for m in line.split(':', 1)[1].split(',') if m.strip()]
+                break
+
+        blocks = []
+        for month in months:
+            primary = self._pick(EMOTIONS, key, month, 'primary')
+            secondary = self._pick([e for e in EMOTIONS if e != primary], key, month, 'secondary')
+            blocks.append(
+                f"[{month}]\n"
+                f"primary: {primary}\n"
+                f"secondary: {secondary}\n"
+                f"confidence: 0.7\n"
+                f"vibe_summary: Synthetic vibe for {month}"
+            )
+        return '\n\n'.join(blocks)
@@ -5,37 +5,28 @@ Local word/emoji counting without API calls
 
 import re
 from collections import Counter
+from functools import lru_cache
 from typing import Dict, List, Optional
 
-try:
-    from backend.utils.wordcloud_generator import WordCloudGenerator
-except ImportError:
-    WordCloudGenerator = None
-
-# Common English stopwords + telegram-specific
-STOPWORDS = {
-    # English common
-    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-    'of', 'with', 'by', 'from', 'is', 'it', 'this', 'that', 'was', 'are',
-    'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-    'should', 'may', 'might', 'can', 'just', 'not', 'no', 'yes', 'so', 'if',
-    'then', 'than', 'when', 'what', 'where', 'who', 'which', 'how', 'why',
-    'all', 'each', 'every', 'both', 'few', 'more', 'most', 'other', 'some',
-    'such', 'only', 'own', 'same', 'too', 'very', 'also', 'any', 'as', 'about',
-    'up', 'out', 'into', 'over', 'after', 'before', 'between', 'under', 'again',
-    'there', 'here', 'they', 'them', 'their', 'he', 'him', 'his', 'she', 'her',
-    'we', 'us', 'our', 'you', 'your', 'my', 'me', 'i', 'am', 'been', 'being',
-    'get', 'got', 'getting', 'go', 'going', 'went', 'come', 'coming', 'came',
-    'like', 'know', 'think', 'want', 'see', 'look', 'make', 'take', 'say', 'said',
-    'well', 'back', 'now', 'way', 'even', 'new', 'because', 'still', 'oh', 'ok',
-    'okay', 'yeah', 'ya', 'yea', 'really', 'actually', 'dont', "don't", 'im', "i'm",
-    'its', "it's", 'thats', "that's", 'youre', "you're", 'were', "we're",
-    # Telegram specific
-    'sticker', 'forwarded', 'message', 'replied', 'reply', 'photo', 'video',
-    'voice', 'file', 'gif', 'http', 'https', 'www', 'com', 'ah','eh','mm','hmm','bro',
-    'sis','dude','lol','omg','btw','idk','smh','fyi','ty','thx','np','yw','yall','la','eh',
-    'yeah','uh','uhh','hahaha','hehe','haha','hehehe','yea','ye',
-}
+from .phrase_counter import PhraseCounter
+from .tokenizer import DEFAULT_LANGUAGES, Tokenizer, get_tokenizer, stopwords_for, tokenizer_for
+
+
+@lru_cache(maxsize=1)
+def _wordcloud_generator():
+    """WordCloudGenerator class, or None if the wordcloud stack is unavailable (loaded on first use)"""
+    try:
+        import wordcloud  # noqa: F401  (fail here rather than mid-render)
+        try:
+            from utils.wordcloud_generator import WordCloudGenerator
+        except ImportError:
+            from backend.utils.wordcloud_generator import WordCloudGenerator
+    except ImportError:
+        return None
+    return WordCloudGenerator
+
+# English + chat/platform stopwords (per-language sets live in tokenizer.STOPWORD_SETS)
+STOPWORDS = stopwords_for(DEFAULT_LANGUAGES)
 
 # Emoji regex pattern (covers most Unicode emoji)
 EMOJI_PATTERN = re.compile(
@@ -55,23 +46,51 @@ EMOJI_PATTERN = re.compile(
 )
 
 
+def tokenize_words(text: str, tokenizer: Optional[Tokenizer] = None) -> List[str]:
+    """Extract lowercase words, stopwords removed
+
+    Args:
+        text: Text to tokenize
+        tokenizer: Languages' tokenizer (default: English stopwords)
+    """
+    return (tokenizer or get_tokenizer(DEFAULT_LANGUAGES)).tokenize(text)
+
+
 class FrequencyCounter:
     """Count word and emoji frequencies from text"""
 
-    def __init__(self, text: str):
+    def __init__(self, text: str, tokenizer: Optional[Tokenizer] = None, phrases: bool = False):
         """
         Args:
             text: Full text string from user messages
+            tokenizer: Tokenizer for the chat's languages (default: detected from text)
+            phrases: Also mine bigrams/trigrams, in the same tokenization pass as the words
         """
         self.text = text
+        self.tokenizer = tokenizer
+        self.phrases = phrases
         self._word_freq: Optional[Dict[str, int]] = None
         self._emoji_freq: Optional[Dict[str, int]] = None
+        self._phrase_counter: Optional[PhraseCounter] = None
+
+    @classmethod
+    def from_frequencies(cls, word_freq: Dict[str, int], emoji_freq: Dict[str, int]) -> 'FrequencyCounter':
+        """Build a counter from precomputed frequencies (e.g. merged month buckets)
+
+        Args:
+            word_freq: {word: count}
+            emoji_freq: {emoji: count}
+        """
+        counter = cls('')
+        counter._word_freq = dict(Counter(word_freq).most_common())
+        counter._emoji_freq = dict(Counter(emoji_freq).most_common())
+        return counter
 
-    def count_words(self, top_n: int = 50) -> Dict[str, int]:
+    def count_words(self, top_n: Optional[int] = 50) -> Dict[str, int]:
         """Count word frequencies, filter stopwords
 
         Args:
-            top_n: Return top N words
+            top_n: Return top N words (None for all)
 
         Returns:
             {word: count} sorted by count desc
@@ -80,20 +99,33 @@ class FrequencyCounter:
             # Return cached, sliced to top_n
             return dict(list(self._word_freq.items())[:top_n])
 
-        # Extract words (alphanumeric only)
-        words = re.findall(r'\b[a-zA-Z]{2,}\b', self.text.lower())
-
-        # Filter stopwords
-        filtered = [w for w in words if w not in STOPWORDS]
-
-        # Count
-        counter = Counter(filtered)
+        # Extract words (any script), filter the languages' stopwords, count
+        if self.tokenizer is None:
+            self.tokenizer = tokenizer_for(self.text)
+        if self.phrases:
+            self._phrase_counter = PhraseCounter(self.tokenizer.stopwords)
+            if not self.tokenizer.segment_cjk:  # CJK words are already character bigrams
+                self._phrase_counter.add_tokens(self.tokenizer.phrase_tokens(self.text))
+        if self._phrase_counter is not None and self._phrase_counter.words:
+            counter = self.tokenizer.words_from_tokens(self._phrase_counter.words)
+        else:
+            counter = Counter(self.tokenizer.tokenize(self.text))
 
         # Cache full results
         self._word_freq = dict(counter.most_common())
 
         return dict(counter.most_common(top_n))
 
+    def count_phrases(self) -> PhraseCounter:
+        """Bigram/trigram counts (empty unless built with phrases=True)
+
+        Returns:
+            PhraseCounter; .top() ranks them, .to_dict() stores/merges them
+        """
+        if self._word_freq is None:
+            self.count_words(top_n=None)
+        return self._phrase_counter or PhraseCounter()
+
     def count_emojis(self) -> Dict[str, int]:
         """Count emoji frequencies
 
@@ -125,6 +157,7 @@ class FrequencyCounter:
         Returns:
             Base64 encoded PNG image string, or empty string if wordcloud unavailable
         """
+        WordCloudGenerator = _wordcloud_generator()
         if WordCloudGenerator is None:
             return ''
 
@@ -1,22 +1,36 @@
 import json
 import asyncio
-from typing import Dict, List, Any
-from openai import AsyncOpenAI
-from collections import defaultdict
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Dict, List, Any, Optional
 from dotenv import load_dotenv
 import os
 
+from telemetry import get_logger, log_event, span
+from telemetry.metrics import LLM_FALLBACKS, LLM_TOKENS, LLM_TTFT_SECONDS
+
+from .emotion_scorer import EmotionScorer, LOCAL_CONFIDENCE_THRESHOLD, match_persona_local
+from .emotions import EMOTIONS
+from .deadlines import LLM_CALL_TIMEOUT, LLM_HEDGE, LLMTimeout, SHARED_LATENCY, hedged_call, time_remaining
+from .fake_llm import FakeAsyncOpenAI, prompt_hash
+from .prompts import compile_persona_prefix, compile_sentiment_prefix, persona_user_prompt, sentiment_user_prompt
+from .sampling import MonthSampler
+from .usage_ledger import JOB_TOKEN_BUDGET, PROCESS_USAGE, TINY_SAMPLES_BELOW, BudgetExceeded, UsageLedger
+
+logger = get_logger('llm')
 
 MODEL_NAME = 'gpt-4o-mini'
 MAX_CONCURRENT_REQUESTS = 4  # Limit parallel LLM calls to avoid rate limits
 MAX_RETRIES = 3
 RETRY_BASE_DELAY = 1.0  # seconds
+MONTH_SAMPLE_SIZE = 150  # Max messages per month sent to the LLM (see wrapper/sampling.py for the char budget)
+MONTH_BATCH_SIZE = 4  # Months per LLM call
+LLM_STREAM = os.getenv('LLM_STREAM', '1') not in ('0', 'false', 'no')  # Stream completions to measure TTFT
+
+# Sentiment modes: 'llm' (every month), 'hybrid' (LLM only for low local confidence), 'local' (no API)
+SENTIMENT_MODES = ('llm', 'hybrid', 'local')
 
-GEN_Z_EMOTIONS = [
-    'chaotic energy', 'unhinged', 'main character vibes', 'villain arc',
-    'cozy', 'wholesome', 'salty', 'dramatic', 'hype', 'nostalgic',
-    'simp mode', 'down bad', 'existential crisis', 'flirty', 'petty'
-]
+GEN_Z_EMOTIONS = EMOTIONS
 
 PERSONAS = {
     'rick': {
@@ -96,70 +110,236 @@ PERSONAS = {
     }
 }
 
+# Static system prefixes, compiled once so every call shares a byte-identical cacheable prefix
+SENTIMENT_PREFIX = compile_sentiment_prefix(GEN_Z_EMOTIONS)
+PERSONA_PREFIX = compile_persona_prefix(PERSONAS)
+
 
 class LLMAnalyzer:
     """Analyze chat messages using OpenAI API with async support"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        sentiment_mode: Optional[str] = None,
+        call_timeout: float = LLM_CALL_TIMEOUT,
+        hedge: bool = LLM_HEDGE,
+        token_budget: Optional[int] = JOB_TOKEN_BUDGET
+    ):
+        """
+        Args:
+            sentiment_mode: 'llm', 'hybrid' or 'local' (default: SENTIMENT_MODE env, else 'llm')
+            call_timeout: Seconds per completion call, capped by the job deadline (see deadlines.job_deadline)
+            hedge: Send a duplicate request when a call runs past the observed p95 latency
+            token_budget: Tokens this analyzer (one Wrapped job) may spend, None/0 = unlimited
+        """
         load_dotenv()
-        self.client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.sentiment_mode = sentiment_mode or os.getenv('SENTIMENT_MODE', 'llm')
+        if self.sentiment_mode not in SENTIMENT_MODES:
+            raise ValueError(f"Unknown sentiment mode: {self.sentiment_mode}")
+
+        # LLM_BACKEND=fake swaps in the local stand-in (optionally replaying LLM_RECORDINGS)
+        if os.getenv('LLM_BACKEND', 'openai') == 'fake':
+            self.client = FakeAsyncOpenAI(recordings_path=os.getenv('LLM_RECORDINGS'))
+        elif self.sentiment_mode == 'local':
+            self.client = None
+        else:
+            from openai import AsyncOpenAI  # ~0.5s to import; keep it off the API cold-start path
+            self.client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.record_path = os.getenv('LLM_RECORD_PATH')
         self.model_name = MODEL_NAME
+        self.local_scorer = EmotionScorer()
         self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.call_timeout = call_timeout
+        self.hedge = hedge
+        self.latency = SHARED_LATENCY
+        self.call_stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'hedges_skipped': 0, 'timeouts': 0}
+        self.stream = LLM_STREAM
+        self.usage = UsageLedger(budget=token_budget)  # This analyzer's (= one Wrapped job's) usage
+
+    def _record(self, messages: List[Dict], response_text: str):
+        """Append a prompt/response pair for later replay by the stand-in (blocking: run in a thread)"""
+        with open(self.record_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'prompt_hash': prompt_hash(messages), 'response': response_text}) + '\n')
+
+    def _time_budget(self) -> float:
+        """Seconds the next call may take: call timeout capped by the job deadline"""
+        remaining = time_remaining()
+        return self.call_timeout if remaining is None else min(self.call_timeout, remaining)
+
+    async def _complete(self, messages: List[Dict], temperature: float, max_tokens: int, stage: str) -> str:
+        """One completion request; records usage, TTFT and the latency used for hedging"""
+        with span('llm', llm_stage=stage):
+            return await self._complete_request(messages, temperature, max_tokens, stage)
+
+    async def _complete_request(self, messages: List[Dict], temperature: float, max_tokens: int, stage: str) -> str:
+        start = time.perf_counter()
+        request = dict(model=self.model_name, messages=messages, temperature=temperature, max_tokens=max_tokens)
+        parts, ttft, usage = [], None, None
+
+        try:
+            if self.stream:
+                stream = await self.client.chat.completions.create(
+                    **request, stream=True, stream_options={'include_usage': True}
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        parts.append(chunk.choices[0].delta.content)
+                    if getattr(chunk, 'usage', None) is not None:
+                        usage = chunk.usage
+                content = ''.join(parts)
+            else:
+                response = await self.client.chat.completions.create(**request)
+                content = response.choices[0].message.content
+                usage = response.usage
+                ttft = None  # Unknown without streaming
+        except asyncio.CancelledError:
+            # A losing hedge or a deadline: the provider still bills the prompt and what was generated
+            if usage is None:
+                usage = self._billed_estimate(messages, parts)
+            self._record_usage(usage, ttft, stage, time.perf_counter() - start, estimated=True)
+            raise
+
+        elapsed = time.perf_counter() - start
+        self.latency.observe(elapsed)
+        self._record_usage(usage, ttft, stage, elapsed)
+        return content
+
+    @staticmethod
+    def _billed_estimate(messages: List[Dict], parts: List[str]) -> SimpleNamespace:
+        """Usage of a call cancelled before the provider reported it (~4 characters per token)"""
+        return SimpleNamespace(
+            prompt_tokens=sum(len(m.get('content', '')) for m in messages) // 4,
+            completion_tokens=sum(len(part) for part in parts) // 4,
+            prompt_tokens_details=None
+        )
+
+    def _record_usage(self, usage: Any, ttft: Optional[float], stage: str, elapsed: float, estimated: bool = False):
+        tokens = self.usage.record(usage, ttft, stage=stage, estimated=estimated)
+        PROCESS_USAGE.record(usage, ttft, estimated=estimated)
+        for kind in ('prompt', 'completion', 'cached'):
+            LLM_TOKENS.inc(tokens[f'{kind}_tokens'], stage=stage, kind=kind)
+        if ttft is not None:
+            LLM_TTFT_SECONDS.observe(ttft, stage=stage)
+        log_event(logger, 'llm_call', stage=stage, ms=round(elapsed * 1000, 1),
+                  ttft_ms=round(ttft * 1000, 1) if ttft is not None else None, cancelled=estimated, **tokens)
+
+    async def _chat(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 512,
+        system: Optional[str] = None,
+        stage: str = 'other'
+    ) -> str:
+        """Make an async chat completion request with budget, deadline, hedging and rate limit handling
+
+        Args:
+            prompt: Variable part of the request (user turn)
+            system: Static prefix (system turn), kept identical across calls for prefix caching
+            stage: Usage ledger tag ('sentiment', 'persona')
+
+        Raises:
+            BudgetExceeded: The job's token budget cannot cover this call
+            LLMTimeout: The call or the job deadline ran out
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+
+        # Worst case for this call, held until its real usage is recorded (a hedge reserves its own)
+        estimate = (len(prompt) + len(system or '')) // 4 + max_tokens
+        self.usage.reserve(estimate)
+        try:
+            return await self._chat_within_deadline(messages, temperature, max_tokens, stage, estimate)
+        finally:
+            self.usage.release(estimate)
+
+    def _start_hedge(self, messages: List[Dict], temperature: float, max_tokens: int, stage: str,
+                     estimate: int) -> Optional[Awaitable[str]]:
+        """Duplicate of a slow call, or None while no concurrency slot or budget is free for it"""
+        if self._semaphore.locked() or not self.usage.fits(estimate):
+            self.call_stats['hedges_skipped'] += 1
+            return None
+        return self._hedge(messages, temperature, max_tokens, stage, estimate)
+
+    async def _hedge(self, messages: List[Dict], temperature: float, max_tokens: int, stage: str, estimate: int) -> str:
+        """A hedge holds its own slot and reservation; its usage is recorded even when it loses"""
+        self.usage.reserve(estimate)
+        try:
+            async with self._semaphore:
+                return await self._complete(messages, temperature, max_tokens, stage)
+        finally:
+            self.usage.release(estimate)
+
+    async def _chat_within_deadline(
+        self,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int,
+        stage: str,
+        estimate: int
+    ) -> str:
+        """Wait for a slot, then retry on rate limits with every attempt hedged and deadline-bounded"""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(self._time_budget(), 0))
+        except asyncio.TimeoutError:
+            self.call_stats['timeouts'] += 1
+            raise LLMTimeout("Job deadline passed while waiting for an LLM slot")
 
-    async def _chat(self, prompt: str, temperature: float = 0.7, max_tokens: int = 512) -> str:
-        """Make an async chat completion request with rate limit handling"""
-        async with self._semaphore:
+        try:
             for attempt in range(MAX_RETRIES):
+                self.call_stats['calls'] += 1
                 try:
-                    response = await self.client.chat.completions.create(
-                        model=self.model_name,
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=temperature,
-                        max_tokens=max_tokens
+                    content = await hedged_call(
+                        lambda: self._complete(messages, temperature, max_tokens, stage),
+                        timeout=self._time_budget(),
+                        hedge_delay=self.latency.hedge_delay() if self.hedge else None,
+                        stats=self.call_stats,
+                        make_hedge=lambda: self._start_hedge(messages, temperature, max_tokens, stage, estimate)
                     )
-                    return response.choices[0].message.content
+                    if self.record_path:
+                        await asyncio.to_thread(self._record, messages, content)
+                    return content
+                except LLMTimeout:
+                    self.call_stats['timeouts'] += 1
+                    raise
                 except Exception as e:
                     error_str = str(e)
                     if '429' in error_str or 'rate_limit' in error_str.lower():
                         delay = RETRY_BASE_DELAY * (2 ** attempt)
-                        print(f"Rate limit hit, retrying in {delay}s (attempt {attempt + 1}/{MAX_RETRIES})")
+                        if delay >= self._time_budget():
+                            self.call_stats['timeouts'] += 1
+                            raise LLMTimeout("No time left to retry after rate limit")
+                        log_event(logger, 'rate_limited', level='warning', stage=stage, retry_in=delay,
+                                  attempt=attempt + 1, max_retries=MAX_RETRIES)
                         await asyncio.sleep(delay)
                     else:
                         raise
             raise Exception(f"Max retries ({MAX_RETRIES}) exceeded for LLM call")
+        finally:
+            self._semaphore.release()
 
-    async def _analyze_month_batch(self, months_data: List[tuple], emotions_str: str) -> Dict[str, Dict]:
+    async def _analyze_month_batch(self, months_data: List[tuple]) -> Dict[str, Dict]:
         """Analyze sentiment for a batch of months in one LLM call"""
-        # Build prompt with all months
-        months_section = []
-        for month, texts in months_data:
-            combined = '\n'.join(texts[:150])  # Fewer msgs per month in batch
-            months_section.append(f"=== {month} ===\n{combined}")
-
-        all_months = '\n\n'.join(months_section)
+        # Low budget: send an evenly spread subset of each month's (chronological) samples. Decided
+        # right before _chat reserves this batch's tokens (no await in between), so batches of chats
+        # scored concurrently see each other's reservations
+        scale = self.usage.sample_scale()
+        if scale < 1.0:
+            step = round(1 / scale)
+            months_data = [(month, texts[::step]) for month, texts in months_data]
+            self.usage.note(f'samples_x{scale}')
         month_names = [m for m, _ in months_data]
-
-        prompt = f"""Analyze the vibe of these chat messages for EACH month listed below.
-
-For EACH month, pick a PRIMARY and SECONDARY emotion from:
-{emotions_str}
-
-Output EXACTLY in this format for each month (one block per month):
-
-[MONTH_NAME]
-primary: [emotion]
-secondary: [emotion]
-confidence: [0.0-1.0]
-vibe_summary: [short 1-sentence summary]
-
-Analyze these months: {', '.join(month_names)}
-
-Messages by month:
-{all_months}"""
+        prompt = sentiment_user_prompt(months_data, MONTH_SAMPLE_SIZE)
 
         try:
-            response_text = await self._chat(prompt, temperature=0.7, max_tokens=256 * len(months_data))
-            print(f"[LLM Sentiment Batch {month_names}]\n{response_text}\n")
+            response_text = await self._chat(
+                prompt, temperature=0.7, max_tokens=256 * len(months_data),
+                system=SENTIMENT_PREFIX, stage='sentiment'
+            )
+            log_event(logger, 'sentiment_response', level='debug', months=','.join(month_names), response=response_text)
 
             results = {}
             current_month = None
@@ -170,9 +350,9 @@ Messages by month:
                 if not line:
                     continue
 
-                # Check if line is a month header
+                # Check if line is a month header ("key: value" lines may mention a month too)
                 line_clean = line.strip('[]').strip()
-                if line_clean in month_names or any(m in line_clean for m in month_names):
+                if line_clean in month_names or (':' not in line and any(m in line_clean for m in month_names)):
                     # Save previous month if exists
                     if current_month and current_data:
                         results[current_month] = current_data
@@ -220,8 +400,20 @@ Messages by month:
 
             return results
 
+        except (LLMTimeout, BudgetExceeded) as e:
+            # Out of time or tokens: score locally now, mark pending so the next run asks the LLM again
+            if isinstance(e, BudgetExceeded):
+                self.usage.note('local_scoring')
+            LLM_FALLBACKS.inc(stage='sentiment', reason=type(e).__name__)
+            log_event(logger, 'sentiment_fallback', level='warning', months=','.join(month_names), reason=str(e))
+            fallback = self.local_scorer.score_months(dict(months_data))
+            for data in fallback.values():
+                data['pending'] = True
+            return fallback
+
         except Exception as e:
-            print(f"Sentiment batch error: {e}")
+            LLM_FALLBACKS.inc(stage='sentiment', reason='error')
+            log_event(logger, 'sentiment_error', level='error', months=','.join(month_names), error=str(e))
             return {
                 month: {
                     'primary': 'error',
@@ -232,72 +424,107 @@ Messages by month:
                 for month, _ in months_data
             }
 
-    async def analyze_sentiment_by_month(self, messages: List[Dict]) -> Dict[str, Dict]:
-        """Analyze vibe per month - BATCHED (3-4 months per call)"""
-        by_month = defaultdict(list)
+    @staticmethod
+    def _sampler() -> MonthSampler:
+        return MonthSampler(max_messages=MONTH_SAMPLE_SIZE)
+
+    @staticmethod
+    def sample_month(messages: List[Dict]) -> List[str]:
+        """Pick the texts of one month that are sent to the LLM (stratified, deduplicated)"""
+        sampler = LLMAnalyzer._sampler()
         for msg in messages:
-            month = msg.get('month', 'unknown')
-            by_month[month].append(msg.get('text', ''))
+            sampler.add('month', msg.get('text', ''), msg.get('date', ''))
+        return sampler.sample('month')
+
+    @staticmethod
+    def build_month_samples(messages: List[Dict]) -> Dict[str, List[str]]:
+        """Sample every month in a single pass over the messages"""
+        sampler = LLMAnalyzer._sampler()
+        sampler.add_messages(messages)
+        return sampler.samples()
+
+    async def score_months(self, month_samples: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """Score pre-sampled months according to sentiment_mode - LLM calls BATCHED (4 months per call)
+
+        Args:
+            month_samples: {month: [sample texts]}, only the months to (re-)score
+
+        Returns:
+            {month: {primary, secondary, confidence, vibe_summary, source}}
+        """
+        if not month_samples:
+            return {}
+
+        if self.sentiment_mode == 'llm':
+            return await self._score_months_llm(month_samples)
+
+        # Local pre-score; hybrid only sends the months it is unsure about
+        results = self.local_scorer.score_months(month_samples)
+        if self.sentiment_mode == 'hybrid':
+            unsure = {
+                month: texts for month, texts in month_samples.items()
+                if results[month]['confidence'] < LOCAL_CONFIDENCE_THRESHOLD
+            }
+            results.update(await self._score_months_llm(unsure))
+        return results
 
-        emotions_str = ', '.join(GEN_Z_EMOTIONS)
-        sorted_months = sorted(by_month.items())
+    async def _score_months_llm(self, month_samples: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """Send months to the LLM in parallel batches"""
+        if not month_samples:
+            return {}
+
+        sorted_months = sorted(month_samples.items())
 
-        # Batch months: 4 months per LLM call
-        BATCH_SIZE = 4
         batches = []
-        for i in range(0, len(sorted_months), BATCH_SIZE):
-            batches.append(sorted_months[i:i + BATCH_SIZE])
+        for i in range(0, len(sorted_months), MONTH_BATCH_SIZE):
+            batches.append(sorted_months[i:i + MONTH_BATCH_SIZE])
 
         # Run batches in parallel
-        tasks = [self._analyze_month_batch(batch, emotions_str) for batch in batches]
+        tasks = [self._analyze_month_batch(batch) for batch in batches]
         batch_results = await asyncio.gather(*tasks)
 
         # Merge all results
         results = {}
         for batch_result in batch_results:
-            results.update(batch_result)
+            for month, data in batch_result.items():
+                data.setdefault('source', 'llm')
+                results[month] = data
 
         return results
 
-    async def match_persona(self, sentiment_by_month: Dict[str, Dict], top_words: List[str] = None) -> Dict[str, Any]:
-        """Match user to a cartoon persona based on aggregated emotions and word usage"""
+    async def analyze_sentiment_by_month(self, messages: List[Dict]) -> Dict[str, Dict]:
+        """Analyze vibe per month - BATCHED (3-4 months per call)"""
+        return await self.score_months(self.build_month_samples(messages))
+
+    async def match_persona(
+        self,
+        sentiment_by_month: Dict[str, Dict],
+        top_words: List[str] = None,
+        essential: bool = True
+    ) -> Dict[str, Any]:
+        """Match user to a cartoon persona based on aggregated emotions and word usage
+
+        Args:
+            essential: False for personas that can be matched locally once the token budget runs low
+        """
+        if self.sentiment_mode == 'local':
+            return match_persona_local(sentiment_by_month, PERSONAS)
+        if not essential and self.usage.fraction_left() < TINY_SAMPLES_BELOW:
+            self.usage.note('local_persona')
+            return match_persona_local(sentiment_by_month, PERSONAS)
+
         all_primary = [v.get('primary', '') for v in sentiment_by_month.values() if v.get('primary') != 'error']
         all_secondary = [v.get('secondary', '') for v in sentiment_by_month.values() if v.get('secondary') != 'error']
         all_vibes = [v.get('vibe_summary', '') for v in sentiment_by_month.values() if v.get('vibe_summary')]
 
         words_str = ', '.join(top_words[:20]) if top_words else 'N/A'
-
-        emotion_summary = f"""
-Primary emotions over time: {', '.join(all_primary)}
-Secondary emotions over time: {', '.join(all_secondary)}
-Vibe summaries: {'; '.join(all_vibes)}
-Top 20 most used words: {words_str}
-"""
-
-        persona_options = '\n'.join([
-            f"- {pid}: {p['name']} ({p['show']}) - {p['traits']}"
-            for pid, p in PERSONAS.items()
-        ])
-
-        prompt = f"""Based on this person's chat vibe analysis and vocabulary, match them to ONE cartoon character.
-
-Consider both their emotional patterns AND their word choices - if their vocabulary matches how a character speaks, weight that heavily.
-
-{emotion_summary}
-
-PERSONAS (pick ONE by ID):
-{persona_options}
-
-Output ONLY in this format:
-persona_id: [id from list above]
-match_reason: [1-2 sentence explanation of why this persona fits, mention specific words if relevant]
-confidence: [0.0-1.0]
-yearly_vibe: [A fun, Gen-Z style 1-sentence summary of their overall vibe for the year, like a Spotify Wrapped tagline]
-"""
+        prompt = persona_user_prompt(all_primary, all_secondary, all_vibes, words_str)
 
         try:
-            response_text = await self._chat(prompt, temperature=0.7, max_tokens=256)
-            print(f"[LLM Persona Response]\n{response_text}\n")
+            response_text = await self._chat(
+                prompt, temperature=0.7, max_tokens=256, system=PERSONA_PREFIX, stage='persona'
+            )
+            log_event(logger, 'persona_response', level='debug', response=response_text)
 
             result = {
                 'persona_id': 'jake',
@@ -333,8 +560,18 @@ yearly_vibe: [A fun, Gen-Z style 1-sentence summary of their overall vibe for th
 
             return result
 
+        except (LLMTimeout, BudgetExceeded) as e:
+            if isinstance(e, BudgetExceeded):
+                self.usage.note('local_persona')
+            LLM_FALLBACKS.inc(stage='persona', reason=type(e).__name__)
+            log_event(logger, 'persona_fallback', level='warning', reason=str(e))
+            result = match_persona_local(sentiment_by_month, PERSONAS)
+            result['pending'] = True
+            return result
+
         except Exception as e:
-            print(f"Persona matching error: {e}")
+            LLM_FALLBACKS.inc(stage='persona', reason='error')
+            log_event(logger, 'persona_error', level='error', error=str(e))
             return {
                 'persona_id': 'error',
                 'persona_name': 'Unknown',
@@ -0,0 +1,154 @@
+"""
+Per-Member Statistics for Group Chats
+Leaderboard stats for every member from a single pass over the messages
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from .frequency_couner import EMOJI_PATTERN
+from .tokenizer import Tokenizer, tokenizer_for
+
+LEADERBOARD_SIZE = 20
+TOP_PARTNERS = 5
+
+
+def empty_member_stats(user_id: str) -> Dict[str, Any]:
+    """Stats of someone with no messages in the chat"""
+    return {
+        'user_id': str(user_id), 'message_count': 0, 'char_count': 0, 'avg_length': 0.0,
+        'emoji_count': 0, 'emoji_rate': 0.0, 'share': 0.0, 'top_words': {},
+        'partners': {}, 'top_partner': None
+    }
+
+
+def _emoji_count(text: str) -> int:
+    return sum(len(e) for e in EMOJI_PATTERN.findall(text))
+
+
+class MemberStats:
+    """Compute message/char/emoji/word stats for all chat members at once"""
+
+    def __init__(self, messages: List[Dict], tokenizer: Optional[Tokenizer] = None):
+        """
+        Args:
+            messages: Parsed messages in chat order (from TelegramExportParser.messages)
+            tokenizer: Tokenizer for the chat's languages (default: detected from the messages)
+        """
+        self.messages = messages
+        self.tokenizer = tokenizer
+        self.messages_by_member: Dict[str, List[Dict]] = defaultdict(list)
+        self._stats: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def compute(self, top_words: int = 10, vectorized: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Stats for every member, sorted by message count desc
+
+        Args:
+            top_words: Top words kept per member (0 skips word counting)
+            vectorized: Use a NumPy group-by for counts/chars/partners
+
+        Returns:
+            {user_id: {user_id, message_count, char_count, avg_length, emoji_count,
+                       emoji_rate, share, top_words, partners, top_partner}}
+        """
+        if self._stats is not None:
+            return self._stats
+
+        if vectorized:
+            totals, partners = self._group_vectorized()
+        else:
+            totals, partners = self._group_single_pass()
+
+        # Regex work runs once per member over the joined text, not per message
+        if top_words and self.tokenizer is None:
+            self.tokenizer = tokenizer_for([msg.get('text', '') for msg in self.messages])
+        total_messages = len(self.messages)
+        stats = {}
+        for uid, (count, chars) in totals.items():
+            member_text = '\n'.join(msg.get('text', '') for msg in self.messages_by_member[uid])
+            emojis = _emoji_count(member_text)
+            words = Counter(self.tokenizer.tokenize(member_text)) if top_words else Counter()
+            member_partners = partners.get(uid, Counter())
+            stats[uid] = {
+                'user_id': uid,
+                'message_count': count,
+                'char_count': chars,
+                'avg_length': round(chars / count, 1) if count else 0.0,
+                'emoji_count': emojis,
+                'emoji_rate': round(emojis / count, 3) if count else 0.0,
+                'share': round(count / total_messages * 100, 1) if total_messages else 0.0,
+                'top_words': dict(words.most_common(top_words)),
+                'partners': dict(member_partners.most_common(TOP_PARTNERS)),
+                'top_partner': member_partners.most_common(1)[0][0] if member_partners else None
+            }
+
+        self._stats = dict(sorted(stats.items(), key=lambda x: x[1]['message_count'], reverse=True))
+        return self._stats
+
+    def _group_single_pass(self) -> tuple:
+        """One loop: counts, chars, member buckets and turn-taking partners"""
+        totals: Dict[str, List[int]] = {}
+        partners: Dict[str, Counter] = defaultdict(Counter)
+        previous = None
+
+        for msg in self.messages:
+            uid = msg.get('from_id')
+            text = msg.get('text', '')
+            entry = totals.get(uid)
+            if entry is None:
+                entry = totals[uid] = [0, 0]
+            entry[0] += 1
+            entry[1] += len(text)
+            self.messages_by_member[uid].append(msg)
+
+            # Adjacent messages from different senders count as talking to each other
+            if previous is not None and previous != uid:
+                partners[uid][previous] += 1
+                partners[previous][uid] += 1
+            previous = uid
+
+        return {uid: tuple(v) for uid, v in totals.items()}, partners
+
+    def _group_vectorized(self) -> tuple:
+        """NumPy group-by over sender codes"""
+        senders = [msg.get('from_id') for msg in self.messages]
+        texts = [msg.get('text', '') for msg in self.messages]
+        for uid, msg in zip(senders, self.messages):
+            self.messages_by_member[uid].append(msg)
+
+        if not senders:
+            return {}, {}
+
+        members, codes = np.unique(np.asarray(senders, dtype=str), return_inverse=True)
+        k = len(members)
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+
+        counts = np.bincount(codes, minlength=k)
+        chars = np.bincount(codes, weights=lengths, minlength=k).astype(np.int64)
+
+        # Symmetric k x k matrix of sender changes between consecutive messages
+        a, b = codes[:-1], codes[1:]
+        changed = a != b
+        pairs = np.bincount(a[changed] * k + b[changed], minlength=k * k).reshape(k, k)
+        pairs = pairs + pairs.T
+
+        ids = [str(m) for m in members]
+        totals = {
+            ids[i]: (int(counts[i]), int(chars[i]))
+            for i in range(k)
+        }
+        partners = {}
+        for i in range(k):
+            row = pairs[i]
+            partners[ids[i]] = Counter({ids[j]: int(row[j]) for j in np.flatnonzero(row)})
+        return totals, partners
+
+    def get_member(self, user_id: str) -> Dict[str, Any]:
+        """Stats slice for one member (empty stats if not in chat)"""
+        return self.compute().get(str(user_id)) or empty_member_stats(user_id)
+
+    def leaderboard(self, limit: int = LEADERBOARD_SIZE) -> List[Dict[str, Any]]:
+        """Top members by message count"""
+        return list(self.compute().values())[:limit]
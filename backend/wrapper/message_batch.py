@@ -0,0 +1,60 @@
+"""
+Message Batches
+Compact form of a fetched chat for shipping to a CPU worker
+
+A fetched chat is a list of small dicts, one per message. Pickled as-is, every
+message costs a dict, its keys and two strings, and the pickling runs in the
+API process in a single call that holds the GIL for the whole chat. A batch
+keeps only what TelegramExportParser reads, drops messages it would skip, and
+stores all texts and all dates as one string each plus their lengths, so
+pickling is a handful of large copies.
+"""
+
+from array import array
+from itertools import accumulate
+from typing import Dict, List
+
+
+def _split(joined: str, lengths: array) -> List[str]:
+    ends = list(accumulate(lengths))
+    return [joined[end - length:end] for end, length in zip(ends, lengths)]
+
+
+def pack_export(json_data: Dict) -> Dict:
+    """{data: {chat_id: [msgs]}} -> message batch (see unpack_export)
+
+    Args:
+        json_data: Export in TelegramExportParser's format; other top-level keys are dropped
+
+    Returns:
+        {chat_id: {ids, sender_ids, reply_to, texts, text_lengths, dates, date_lengths}}
+    """
+    batch = {}
+    for chat_id, messages in json_data.get('data', {}).items():
+        kept = [msg for msg in messages if msg.get('text') and msg['text'].strip()]
+        texts = [msg['text'] for msg in kept]
+        dates = [msg.get('date') or '' for msg in kept]
+        batch[chat_id] = {
+            'ids': [msg.get('id') for msg in kept],
+            'sender_ids': [msg.get('sender_id', '') for msg in kept],
+            'reply_to': [msg.get('reply_to_msg_id') for msg in kept],
+            'texts': ''.join(texts),
+            'text_lengths': array('q', map(len, texts)),
+            'dates': ''.join(dates),
+            'date_lengths': array('q', map(len, dates))
+        }
+    return batch
+
+
+def unpack_export(batch: Dict) -> Dict:
+    """Message batch -> {data: {chat_id: [msgs]}}, as the parser reads it"""
+    data = {}
+    for chat_id, chat in batch.items():
+        data[chat_id] = [
+            {'id': msg_id, 'text': text, 'date': date, 'sender_id': sender_id, 'reply_to_msg_id': reply_to}
+            for msg_id, text, date, sender_id, reply_to in zip(
+                chat['ids'], _split(chat['texts'], chat['text_lengths']), _split(chat['dates'], chat['date_lengths']),
+                chat['sender_ids'], chat['reply_to']
+            )
+        ]
+    return {'data': data}
@@ -0,0 +1,169 @@
+"""
+Month Store for Incremental Re-analysis
+Persists per-chat month buckets so only months with new messages are recomputed
+
+Several requests can work on one chat at once (a user's retries, members of a
+shared group, CPU workers and API workers), so every write is a
+read-modify-write under a per-chat file lock: writers merge their changes
+into whatever was stored meanwhile instead of replacing it.
+
+Only aggregates are stored: month samples (raw message texts) are sentiment
+input, taken from the messages whenever a month is scored, and never
+written here; older states lose theirs on their next write.
+"""
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only, writes stay atomic but unlocked
+    fcntl = None
+
+MONTH_STORE_DIR = os.getenv('MONTH_STORE_DIR', 'cache/months')
+
+
+def month_fingerprint(messages: List[Dict]) -> str:
+    """Hash the contents of a month bucket
+
+    Any added, edited or expired message changes the fingerprint, which marks
+    the month as dirty.
+
+    Args:
+        messages: Parsed messages belonging to one month
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha1()
+    for msg in messages:
+        digest.update(f"{msg.get('date', '')}|{msg.get('from_id', '')}|{msg.get('text', '')}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def is_scored(bucket: Optional[Dict], mode: str) -> bool:
+    """Whether a month bucket holds final sentiment scored in this sentiment mode
+
+    Failed and deadline-fallback months (marked retry) and months scored in
+    another mode (llm / hybrid / local) are scored again.
+    """
+    return bool(bucket and bucket.get('sentiment') and not bucket.get('retry') and bucket.get('mode') == mode)
+
+
+def merge_state(stored: Dict, state: Dict, user_id: Optional[str] = None):
+    """Fold a writer's state into the stored one (in place)
+
+    The writer's months replace the stored window, except that a month the
+    writer could not score keeps a stored score of the same contents. Only
+    user_id's slice of users/personas is taken from the writer, so members of
+    a shared chat never overwrite each other.
+
+    Args:
+        stored: State as currently on disk (updated in place)
+        state: The writer's state
+        user_id: Member whose slice the writer changed (None = every member in state)
+    """
+    months = {}
+    for month, bucket in state['months'].items():
+        theirs = stored['months'].get(month)
+        if (not is_scored(bucket, bucket.get('mode')) and is_scored(theirs, bucket.get('mode'))
+                and theirs.get('fingerprint') == bucket.get('fingerprint')):
+            bucket = theirs
+        months[month] = bucket
+    stored['months'] = months
+
+    for section in ('users', 'personas'):
+        if user_id is None:
+            stored[section].update(state[section])
+        elif user_id in state[section]:
+            stored[section][user_id] = state[section][user_id]
+
+
+class MonthStore:
+    """File-backed store of month-level aggregates, one JSON file per chat
+
+    State layout:
+        {
+          'months': {month: {fingerprint, mode, sentiment, retry}},   # chat-wide
+          'users': {user_id: {month: {fingerprint, tokenizer, message_count, word_counts, emoji_counts, phrases}}},
+          'personas': {user_id: {key, persona}}   # lazily computed per-chat personas
+        }
+    """
+
+    def __init__(self, root: str = MONTH_STORE_DIR):
+        self.root = root
+
+    def _path(self, chat_key: str) -> str:
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in chat_key)
+        return os.path.join(self.root, f"{safe_key}.json")
+
+    @contextmanager
+    def _locked(self, chat_key: str):
+        """Exclusive access to a chat's state across threads and processes (blocking)"""
+        os.makedirs(self.root, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(f"{self._path(chat_key)}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # Releases the lock
+
+    def load(self, chat_key: str) -> Dict:
+        """Load stored state for a chat (empty state if none)"""
+        path = self._path(chat_key)
+        if not os.path.exists(path):
+            return {'months': {}, 'users': {}, 'personas': {}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {'months': {}, 'users': {}, 'personas': {}}
+        state.setdefault('months', {})
+        state.setdefault('users', {})
+        state.setdefault('personas', {})
+        return state
+
+    def update(self, chat_key: str, apply: Callable[[Dict], None]) -> Dict:
+        """Read-modify-write a chat's state under its lock
+
+        Args:
+            chat_key: Chat to update
+            apply: Changes the freshly loaded state in place
+
+        Returns:
+            The state as written
+        """
+        with self._locked(chat_key):
+            state = self.load(chat_key)
+            apply(state)
+            self._write(chat_key, state)
+        return state
+
+    def save(self, chat_key: str, state: Dict, user_id: Optional[str] = None) -> Dict:
+        """Merge a writer's state into the stored one (see merge_state)
+
+        Args:
+            chat_key: Chat to save
+            state: State loaded earlier and changed by this writer
+            user_id: Member whose slice the writer changed (None = every member in state)
+
+        Returns:
+            The state as written
+        """
+        return self.update(chat_key, lambda stored: merge_state(stored, state, user_id))
+
+    def _write(self, chat_key: str, state: Dict):
+        """Atomically write state for a chat"""
+        for bucket in state['months'].values():
+            bucket.pop('samples', None)  # Raw texts, only in states stored before samples were dropped
+        path = self._path(chat_key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,143 @@
+"""
+Phrase Counter for User Messages
+Bigram/trigram mining with bounded memory, collocation scoring and mergeable state
+
+N-grams never cross a message or sentence break, and need at least one
+content word at either end ("see u tmr" yes, "of the" no). While counting,
+only the PHRASE_MAX_TRACKED most frequent phrases survive each prune, so a
+huge chat costs at most about twice that many entries (frequent phrases are
+kept; rare ones may be undercounted). Phrases are ranked by local mutual
+information: count x log2(observed / expected), where expected comes from the
+phrase's word frequencies. Frequent phrases of words that co-occur more than
+chance rank high, while "you are" style pairs of common words don't.
+"""
+
+import math
+import os
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+PHRASE_SIZES = (2, 3)  # bigrams and trigrams
+PHRASE_MIN_COUNT = int(os.getenv('PHRASE_MIN_COUNT', '3'))  # occurrences for a ranked phrase
+PHRASE_MAX_TRACKED = int(os.getenv('PHRASE_MAX_TRACKED', '5000'))  # heavy hitters kept while counting
+PHRASE_STORE_KEEP = 300  # phrases kept per stored state (e.g. month bucket)
+PHRASE_STORE_MIN_COUNT = 1  # the cap bounds stored state; single sightings add up across months
+CHUNK_TOKENS = 200000  # tokens counted per batch before pruning
+
+
+class PhraseCounter:
+    """Count and rank multi-word phrases from a token stream"""
+
+    def __init__(self, stopwords: Iterable[str] = frozenset(), max_tracked: int = PHRASE_MAX_TRACKED):
+        """
+        Args:
+            stopwords: Words that can't start and end a phrase on their own
+            max_tracked: Heavy-hitter cap while counting (memory bound)
+        """
+        self.stopwords = frozenset(stopwords)
+        self.max_tracked = max_tracked
+        self.phrases: Counter = Counter()  # 'see u tmr' -> count
+        self.words: Counter = Counter()  # every word -> count (expected frequencies)
+        self.total_words = 0
+
+    def add_tokens(self, tokens: List[str]):
+        """Count the phrases of a token stream
+
+        Args:
+            tokens: Words in text order, '' at breaks (Tokenizer.phrase_tokens)
+        """
+        words = Counter(tokens)
+        words.pop('', None)
+        self.words.update(words)
+        self.total_words += sum(words.values())
+        for start in range(0, len(tokens), CHUNK_TOKENS):
+            for size in PHRASE_SIZES:
+                # Grams starting in this chunk; zip() counts in C, the filter only sees distinct ones
+                chunk = tokens[start:start + CHUNK_TOKENS + size - 1]
+                grams = Counter(zip(*(islice(chunk, i, None) for i in range(size))))
+                self.phrases.update({' '.join(gram): n for gram, n in grams.items() if self._is_phrase(gram)})
+            if len(self.phrases) > 2 * self.max_tracked:
+                self._prune(self.max_tracked)
+
+    def _is_phrase(self, gram: tuple) -> bool:
+        if '' in gram:
+            return False
+        first, last = gram[0], gram[-1]
+        return (len(first) > 1 and first not in self.stopwords) or (len(last) > 1 and last not in self.stopwords)
+
+    def _prune(self, keep: int, min_count: int = 1):
+        self.phrases = Counter({
+            phrase: n for phrase, n in self.phrases.most_common(keep) if n >= min_count
+        })
+
+    def merge(self, state: Dict[str, Any]):
+        """Add another counter's to_dict() state (another month or chat)"""
+        self.phrases.update(state.get('phrases', {}))
+        self.words.update(state.get('words', {}))
+        self.total_words += state.get('total_words', 0)
+        if len(self.phrases) > 2 * self.max_tracked:
+            self._prune(self.max_tracked)
+
+    def to_dict(self, keep: int = PHRASE_STORE_KEEP, min_count: int = PHRASE_STORE_MIN_COUNT) -> Dict[str, Any]:
+        """JSON-able, mergeable state: the top phrases and the word counts needed to score them
+
+        Args:
+            keep: Most frequent phrases kept
+            min_count: Phrases seen fewer times are dropped
+        """
+        phrases = {phrase: n for phrase, n in self.phrases.most_common(keep) if n >= min_count}
+        needed = {word for phrase in phrases for word in phrase.split(' ')}
+        return {
+            'phrases': phrases,
+            'words': {word: self.words[word] for word in needed},
+            'total_words': self.total_words
+        }
+
+    @classmethod
+    def from_states(cls, states: Iterable[Optional[Dict[str, Any]]], max_tracked: int = PHRASE_MAX_TRACKED) -> 'PhraseCounter':
+        """Merged counter from several to_dict() states (None entries skipped)"""
+        counter = cls(max_tracked=max_tracked)
+        for state in states:
+            if state:
+                counter.merge(state)
+        return counter
+
+    def score(self, phrase: str, count: int) -> float:
+        """Local mutual information of a phrase (count x log2 observed/expected)"""
+        words = phrase.split(' ')
+        total = max(1, self.total_words)
+        expected = total
+        for word in words:
+            expected *= max(1, self.words.get(word, 0)) / total
+        return count * math.log2(count / expected) if expected > 0 else 0.0
+
+    def top(self, n: int = 20, min_count: int = PHRASE_MIN_COUNT) -> List[Dict[str, Any]]:
+        """Best phrases by collocation score
+
+        Args:
+            n: Phrases returned
+            min_count: Occurrences needed to be ranked
+
+        Returns:
+            [{phrase, count, score}] best first; phrases sharing a word pair with a better one are skipped
+        """
+        scored = sorted(
+            ((self.score(phrase, count), phrase, count) for phrase, count in self.phrases.items() if count >= min_count),
+            reverse=True
+        )
+        results = []
+        taken = set()  # word pairs of the phrases picked so far
+        for score, phrase, count in scored:
+            if score <= 0:
+                break
+            # 'see you' or 'party see you' next to an already picked 'see you tmr' add nothing
+            words = phrase.split(' ')
+            pairs = set(zip(words, words[1:]))
+            if pairs & taken:
+                continue
+            taken |= pairs
+            results.append({'phrase': phrase, 'count': count, 'score': round(score, 1)})
+            if len(results) == n:
+                break
+        return results
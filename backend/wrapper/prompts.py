@@ -0,0 +1,74 @@
+"""
+LLM Prompt Templates
+Static instructions compiled once into stable system prefixes, variable data in the user turn
+
+Providers cache prompts by exact prefix, so everything that never changes
+(instructions, the emotion list, the persona catalogue, output formats) goes
+first and byte-identical on every call; chat data only ever follows it.
+Prefixes under the provider's caching minimum (1024 tokens at OpenAI) are
+not cached, and are deliberately not padded to reach it: cached tokens are
+still billed at half price, so padding costs more than it saves.
+"""
+
+from typing import Dict, List, Tuple
+
+SENTIMENT_TEMPLATE = """Analyze the vibe of chat messages for EACH month the user lists.
+
+For EACH month, pick a PRIMARY and SECONDARY emotion from:
+{emotions}
+
+Output EXACTLY in this format for each month (one block per month):
+
+[MONTH_NAME]
+primary: [emotion]
+secondary: [emotion]
+confidence: [0.0-1.0]
+vibe_summary: [short 1-sentence summary]"""
+
+PERSONA_TEMPLATE = """Based on a person's chat vibe analysis and vocabulary, match them to ONE cartoon character.
+
+Consider both their emotional patterns AND their word choices - if their vocabulary matches how a character speaks, weight that heavily.
+
+PERSONAS (pick ONE by ID):
+{personas}
+
+Output ONLY in this format:
+persona_id: [id from list above]
+match_reason: [1-2 sentence explanation of why this persona fits, mention specific words if relevant]
+confidence: [0.0-1.0]
+yearly_vibe: [A fun, Gen-Z style 1-sentence summary of their overall vibe for the year, like a Spotify Wrapped tagline]"""
+
+
+def compile_sentiment_prefix(emotions: List[str]) -> str:
+    """System prompt for month sentiment batches"""
+    return SENTIMENT_TEMPLATE.format(emotions=', '.join(emotions))
+
+
+def compile_persona_prefix(personas: Dict[str, Dict]) -> str:
+    """System prompt for persona matching (catalogue order is fixed by the dict)"""
+    persona_options = '\n'.join(
+        f"- {pid}: {p['name']} ({p['show']}) - {p['traits']}"
+        for pid, p in personas.items()
+    )
+    return PERSONA_TEMPLATE.format(personas=persona_options)
+
+
+def sentiment_user_prompt(months_data: List[Tuple[str, List[str]]], max_messages: int) -> str:
+    """Variable part of a sentiment batch: month names, then their samples"""
+    months_section = '\n\n'.join(
+        f"=== {month} ===\n" + '\n'.join(texts[:max_messages])
+        for month, texts in months_data
+    )
+    month_names = ', '.join(month for month, _ in months_data)
+    return f"""Analyze these months: {month_names}
+
+Messages by month:
+{months_section}"""
+
+
+def persona_user_prompt(primary: List[str], secondary: List[str], vibes: List[str], words: str) -> str:
+    """Variable part of persona matching: this person's emotion summary"""
+    return f"""Primary emotions over time: {', '.join(primary)}
+Secondary emotions over time: {', '.join(secondary)}
+Vibe summaries: {'; '.join(vibes)}
+Top 20 most used words: {words}"""
@@ -0,0 +1,234 @@
+"""
+Reply Graph and Response-Latency Analytics
+Vectorized reply resolution, response-time distributions and conversation threads
+"""
+
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+MAX_TURN_GAP = 6 * 3600  # Sender changes further apart than this are new conversations, not responses
+MIN_RESPONSES = 3  # Counterparts need this many responses to be ranked
+LATENCY_BUCKETS = [60, 300, 3600, 6 * 3600]  # seconds: <1m, <5m, <1h, <6h, >=6h
+LATENCY_BUCKET_LABELS = ['<1m', '<5m', '<1h', '<6h', '6h+']
+DENSE_INDEX_SLACK = 4  # Direct-address table allowed up to this many slots per message
+
+
+class ReplyIndex:
+    """Telegram message id -> row index lookup
+
+    Telegram ids are sequential per chat, so a direct-address table gives O(1)
+    lookups for both single ids and whole arrays. Sparse id sets fall back to a
+    sorted array with binary search.
+    """
+
+    def __init__(self, msg_ids: np.ndarray):
+        """
+        Args:
+            msg_ids: int64 message ids, -1 where unknown
+        """
+        msg_ids = np.asarray(msg_ids, dtype=np.int64)
+        rows = np.flatnonzero(msg_ids >= 0)
+        ids = msg_ids[rows]
+        self._table: Optional[np.ndarray] = None
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._sorted_rows = np.empty(0, dtype=np.int64)
+        self._min_id = 0
+
+        if not len(ids):
+            return
+
+        self._min_id = int(ids.min())
+        span = int(ids.max()) - self._min_id + 1
+        if span <= DENSE_INDEX_SLACK * len(ids) + 1024:
+            self._table = np.full(span, -1, dtype=np.int64)
+            self._table[ids - self._min_id] = rows
+        else:
+            order = np.argsort(ids, kind='stable')
+            self._sorted_ids = ids[order]
+            self._sorted_rows = rows[order]
+
+    def lookup(self, msg_id: int) -> int:
+        """Row index of a message id, -1 if not in this chat window"""
+        return int(self.lookup_many(np.array([msg_id]))[0])
+
+    def lookup_many(self, msg_ids: np.ndarray) -> np.ndarray:
+        """Row indices for an array of ids (-1 for missing ids)"""
+        msg_ids = np.asarray(msg_ids, dtype=np.int64)
+        result = np.full(len(msg_ids), -1, dtype=np.int64)
+
+        if self._table is not None:
+            offsets = msg_ids - self._min_id
+            inside = (msg_ids >= 0) & (offsets >= 0) & (offsets < len(self._table))
+            result[inside] = self._table[offsets[inside]]
+            return result
+
+        if not len(self._sorted_ids):
+            return result
+        pos = np.searchsorted(self._sorted_ids, msg_ids)
+        pos_clipped = np.minimum(pos, len(self._sorted_ids) - 1)
+        found = (msg_ids >= 0) & (self._sorted_ids[pos_clipped] == msg_ids)
+        result[found] = self._sorted_rows[pos_clipped[found]]
+        return result
+
+
+class ReplyGraph:
+    """Who responds to whom, how fast, and how conversations thread"""
+
+    def __init__(self, messages: List[Dict], timestamps: np.ndarray):
+        """
+        Args:
+            messages: Parsed messages (with from_id, msg_id, reply_to)
+            timestamps: int64 epoch seconds aligned with messages
+        """
+        self.ts = np.asarray(timestamps, dtype=np.int64)
+        # Sender -> dense code in first-seen order (cheaper than sorting the strings)
+        code_of: Dict[str, int] = {}
+        self.codes = np.fromiter(
+            (code_of.setdefault(msg.get('from_id') or '', len(code_of)) for msg in messages),
+            dtype=np.int64,
+            count=len(messages)
+        )
+        self.members = list(code_of)
+        self._code_of = code_of
+
+        msg_ids = _id_array([msg.get('msg_id') for msg in messages])
+        reply_to = _id_array([msg.get('reply_to') for msg in messages])
+        self.index = ReplyIndex(msg_ids)
+        self.parent = self.index.lookup_many(reply_to)
+
+        self._responders, self._prompters, self._latencies = self._response_events()
+
+    def _response_events(self) -> tuple:
+        """(responder code, prompter code, latency seconds) arrays
+
+        Explicit replies always count; otherwise a sender change within
+        MAX_TURN_GAP of the previous message counts as a response to it.
+        """
+        n = len(self.ts)
+        if n < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+
+        # Explicit replies
+        child = np.flatnonzero(self.parent >= 0)
+        parent = self.parent[child]
+        keep = self.codes[child] != self.codes[parent]
+        child, parent = child[keep], parent[keep]
+        reply_latency = np.maximum(self.ts[child] - self.ts[parent], 0)
+
+        # Turn-taking on chronological order, skipping messages that are explicit replies
+        order = np.argsort(self.ts, kind='stable')
+        prev, curr = order[:-1], order[1:]
+        gap = self.ts[curr] - self.ts[prev]
+        turn = (self.codes[curr] != self.codes[prev]) & (gap <= MAX_TURN_GAP) & (self.parent[curr] < 0)
+
+        responders = np.concatenate((self.codes[child], self.codes[curr[turn]]))
+        prompters = np.concatenate((self.codes[parent], self.codes[prev[turn]]))
+        latencies = np.concatenate((reply_latency, gap[turn]))
+        return responders, prompters, latencies
+
+    @staticmethod
+    def _distributions(keys: np.ndarray, latencies: np.ndarray, labels: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Latency distribution per key, one sort instead of a search per counterpart"""
+        if not len(keys):
+            return {}
+        order = np.lexsort((latencies, keys))
+        keys, latencies = keys[order], latencies[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        buckets = np.searchsorted(LATENCY_BUCKETS, latencies, side='right')
+
+        result = {}
+        for start, end in zip(starts, ends):
+            group = latencies[start:end]
+            counts = np.bincount(buckets[start:end], minlength=len(LATENCY_BUCKET_LABELS))
+            result[labels[keys[start]]] = {
+                'count': int(end - start),
+                'median': float(np.median(group)),
+                'p90': float(np.percentile(group, 90)),
+                'mean': round(float(group.mean()), 1),
+                'buckets': dict(zip(LATENCY_BUCKET_LABELS, (int(c) for c in counts)))
+            }
+        return result
+
+    def response_times(self, user_id: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Response-time distributions between the user and each counterpart
+
+        Returns:
+            {'to_you': {counterpart: dist}, 'by_you': {counterpart: dist}}
+        """
+        code = self._code_of.get(str(user_id))
+        if code is None:
+            return {'to_you': {}, 'by_you': {}}
+        to_user = self._prompters == code
+        by_user = self._responders == code
+        return {
+            'to_you': self._distributions(self._responders[to_user], self._latencies[to_user], self.members),
+            'by_you': self._distributions(self._prompters[by_user], self._latencies[by_user], self.members)
+        }
+
+    def threads(self) -> Dict[str, Any]:
+        """Reply threads: roots found by pointer jumping over the parent array"""
+        n = len(self.parent)
+        if not n:
+            return {'count': 0, 'longest': 0, 'avg_size': 0.0}
+        root = np.where(self.parent >= 0, self.parent, np.arange(n))
+        # Each jump doubles the distance covered, so log2(n) rounds reach every root
+        for _ in range(int(n).bit_length() + 1):
+            next_root = root[root]
+            if np.array_equal(next_root, root):
+                break
+            root = next_root
+        sizes = np.bincount(root, minlength=n)
+        threaded = sizes[sizes > 1]
+        return {
+            'count': int(len(threaded)),
+            'longest': int(threaded.max()) if len(threaded) else 0,
+            'avg_size': round(float(threaded.mean()), 1) if len(threaded) else 0.0
+        }
+
+    def get_stats(self, user_id: str) -> Dict[str, Any]:
+        """Get all reply stats for one user
+
+        Returns:
+            {fastest_responders, response_times, replies_received, replies_sent, threads}
+        """
+        times = self.response_times(user_id)
+        ranked = [
+            {'user_id': uid, 'median_seconds': dist['median'], 'count': dist['count']}
+            for uid, dist in times['to_you'].items()
+            if dist['count'] >= MIN_RESPONSES
+        ]
+        ranked.sort(key=lambda x: x['median_seconds'])
+
+        code = self._code_of.get(str(user_id))
+        replies_received = replies_sent = 0
+        if code is not None:
+            replied = self.parent >= 0
+            replies_sent = int(np.count_nonzero(replied & (self.codes == code)))
+            replies_received = int(np.count_nonzero(self.codes[self.parent[replied]] == code))
+
+        return {
+            'fastest_responders': ranked[:5],
+            'response_times': times,
+            'replies_received': replies_received,
+            'replies_sent': replies_sent,
+            'threads': self.threads()
+        }
+
+
+def _id_array(values: List) -> np.ndarray:
+    """int64 ids with -1 for missing values (None becomes NaN on the float pass)"""
+    try:
+        ids = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        ids = np.array([_as_id(v) for v in values], dtype=np.float64)
+    return np.where(np.isnan(ids), -1, ids).astype(np.int64)
+
+
+def _as_id(value) -> float:
+    try:
+        return float(int(value))
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,186 @@
+"""
+Month Sampling for LLM Input
+Time-stratified reservoir sampling + near-duplicate removal + length-aware budget
+"""
+
+import random
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_STRATA = 6  # Slices of the month (by day) sampled independently
+RESERVOIR_SIZE = 60  # Candidates kept per stratum during the pass
+SAMPLE_CHAR_BUDGET = 6000  # Characters of message text per month
+SAMPLE_MAX_MESSAGES = 150
+MAX_MESSAGE_CHARS = 280  # Longer messages are truncated
+MIN_MESSAGE_CHARS = 2
+
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8  # 8 bands x 4 rows: candidate pairs from ~0.6 Jaccard
+NEAR_DUPLICATE_THRESHOLD = 0.7
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_perm_rng = np.random.default_rng(1729)
+_PERM_A = _perm_rng.integers(1, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _perm_rng.integers(0, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature over character shingles"""
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*h + b) mod p for every permutation x shingle, min over shingles
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+def remove_near_duplicates(texts: List[str], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[int]:
+    """Indices of texts to keep (first occurrence wins), LSH-banded MinHash
+
+    Args:
+        texts: Candidate texts (already exact-deduplicated)
+        threshold: Estimated Jaccard similarity above which a text is dropped
+
+    Returns:
+        Kept indices in input order
+    """
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(MINHASH_BANDS)]
+    signatures: List[np.ndarray] = []
+    kept = []
+
+    for idx, text in enumerate(texts):
+        signature = minhash_signature(text.lower())
+        signatures.append(signature)
+        keys = [signature[b * rows:(b + 1) * rows].tobytes() for b in range(MINHASH_BANDS)]
+
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(buckets[band].get(key, ()))
+        if any(np.mean(signatures[c] == signature) >= threshold for c in candidates):
+            continue
+
+        kept.append(idx)
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(idx)
+    return kept
+
+
+class MonthSampler:
+    """Single-pass sampler building each month's LLM input
+
+    Pass 1 (streaming, O(1) per message): drop exact duplicates and trivial
+    messages, keep a reservoir per (month, day-stratum).
+    Finalize (per month, small): MinHash near-duplicate removal, then fill the
+    character budget round-robin across strata so the whole month is covered.
+    """
+
+    def __init__(
+        self,
+        char_budget: int = SAMPLE_CHAR_BUDGET,
+        max_messages: int = SAMPLE_MAX_MESSAGES,
+        strata: int = SAMPLE_STRATA,
+        reservoir_size: int = RESERVOIR_SIZE
+    ):
+        self.char_budget = char_budget
+        self.max_messages = max_messages
+        self.strata = strata
+        self.reservoir_size = reservoir_size
+        self._reservoirs: Dict[str, List[List[Tuple[str, str]]]] = {}
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._seen_texts: Dict[str, set] = {}
+        self._rngs: Dict[str, random.Random] = {}
+        # 'DD' -> stratum, so the hot path is a dict lookup instead of int() + arithmetic
+        self._stratum_of_day = {f"{day:02d}": min(strata - 1, (day - 1) * strata // 31) for day in range(1, 32)}
+
+    def _stratum(self, date: str) -> int:
+        return self._stratum_of_day.get(date[8:10], 0) if date else 0
+
+    def add(self, month: str, text: str, date: str = ''):
+        """Feed one message (any order)"""
+        text = text.strip()
+        if len(text) < MIN_MESSAGE_CHARS:
+            return
+        seen = self._seen_texts.get(month)
+        if seen is None:
+            seen = self._seen_texts[month] = set()
+            self._reservoirs[month] = [[] for _ in range(self.strata)]
+            # Seeded per month so the same input always yields the same sample
+            self._rngs[month] = random.Random(zlib.crc32(month.encode('utf-8')))
+        key = hash(text.lower())
+        if key in seen:
+            return
+        seen.add(key)
+
+        stratum = self._stratum(date)
+        reservoir = self._reservoirs[month][stratum]
+        if len(reservoir) < self.reservoir_size:
+            reservoir.append((date, text))
+            return
+        count_key = (month, stratum)
+        n = self._counts.get(count_key, self.reservoir_size) + 1
+        self._counts[count_key] = n
+        j = int(self._rngs[month].random() * n)
+        if j < self.reservoir_size:
+            reservoir[j] = (date, text)
+
+    def add_messages(self, messages: List[Dict]):
+        add = self.add
+        for msg in messages:
+            add(msg.get('month', 'unknown'), msg.get('text', ''), msg.get('date', ''))
+
+    def sample(self, month: str) -> List[str]:
+        """Final sample for one month, in chronological order"""
+        reservoirs = self._reservoirs.get(month)
+        if not reservoirs:
+            return []
+
+        # Near-duplicate removal across the whole month's candidates
+        candidates = [sorted(r) for r in reservoirs]
+        flat = [(s, i) for s, r in enumerate(candidates) for i in range(len(r))]
+        kept = set(remove_near_duplicates([candidates[s][i][1] for s, i in flat]))
+        per_stratum: List[List[Tuple[str, str]]] = [[] for _ in range(self.strata)]
+        for pos, (s, i) in enumerate(flat):
+            if pos in kept:
+                per_stratum[s].append(candidates[s][i])
+
+        # Length-aware fill, one message per stratum per round
+        chosen: List[Tuple[str, str]] = []
+        used = 0
+        cursors = [0] * self.strata
+        progress = True
+        while progress and len(chosen) < self.max_messages and used < self.char_budget:
+            progress = False
+            for s in range(self.strata):
+                while cursors[s] < len(per_stratum[s]):
+                    date, text = per_stratum[s][cursors[s]]
+                    cursors[s] += 1
+                    text = text[:MAX_MESSAGE_CHARS]
+                    if used + len(text) > self.char_budget:
+                        continue  # Too long for what's left, try a shorter one
+                    chosen.append((date, text))
+                    used += len(text)
+                    progress = True
+                    break
+                if len(chosen) >= self.max_messages:
+                    break
+
+        chosen.sort()
+        return [text for _, text in chosen]
+
+    def months(self) -> List[str]:
+        return list(self._reservoirs)
+
+    def samples(self) -> Dict[str, List[str]]:
+        return {month: self.sample(month) for month in self._reservoirs}
+
+
+def sample_messages(messages: List[Dict], char_budget: Optional[int] = None) -> Dict[str, List[str]]:
+    """Convenience: {month: sample} for parsed messages with a month field"""
+    sampler = MonthSampler(char_budget=char_budget or SAMPLE_CHAR_BUDGET)
+    sampler.add_messages(messages)
+    return sampler.samples()
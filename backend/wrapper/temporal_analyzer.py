@@ -0,0 +1,231 @@
+"""
+Temporal Analytics for Chat Activity
+Vectorized hour/day/week statistics over timestamp arrays (no API calls)
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+# 1970-01-01 was a Thursday: shift so weeks start on Monday
+WEEK_OFFSET_DAYS = 3
+
+ISO_SECONDS_LEN = 19  # 'YYYY-MM-DDTHH:MM:SS'
+ISO_OFFSET_LEN = 25  # 'YYYY-MM-DDTHH:MM:SS+HH:MM'
+
+
+def resolve_timezone(name: Optional[str]) -> Optional[ZoneInfo]:
+    """Validate an IANA timezone name (None means UTC)
+
+    Raises:
+        ValueError: Unknown timezone name
+    """
+    if not name or name.upper() == 'UTC':
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def parse_timestamps(dates: List[str]) -> np.ndarray:
+    """Convert ISO-8601 date strings to int64 epoch seconds (UTC)
+
+    Fast path parses 'YYYY-MM-DDTHH:MM:SS[+HH:MM]' entirely in NumPy; anything
+    else (fractional seconds, 'Z' suffix, ...) falls back to datetime parsing.
+
+    Args:
+        dates: ISO date strings, naive strings are treated as UTC
+
+    Returns:
+        int64 array of epoch seconds, same order as input
+    """
+    if not dates:
+        return np.empty(0, dtype=np.int64)
+
+    width = len(dates[0])
+    if width not in (ISO_SECONDS_LEN, ISO_OFFSET_LEN):
+        return _parse_timestamps_slow(dates)
+    try:
+        buffer = ''.join(dates).encode('ascii')
+    except UnicodeEncodeError:
+        return _parse_timestamps_slow(dates)
+    if len(buffer) != width * len(dates):
+        # Mixed formats in one chat: not worth a vectorized path
+        return _parse_timestamps_slow(dates)
+
+    # Fixed-width rows of ASCII bytes: parse the fields arithmetically
+    chars = np.frombuffer(buffer, dtype=np.uint8).reshape(len(dates), width)
+    separators = chars[:, [4, 7, 10, 13, 16]]
+    if not np.all(separators == np.frombuffer(b'--T::', dtype=np.uint8)):
+        return _parse_timestamps_slow(dates)
+
+    def field(start: int, end: int) -> np.ndarray:
+        value = chars[:, start].astype(np.int64) - ord('0')
+        for col in range(start + 1, end):
+            value = value * 10 + (chars[:, col] - ord('0'))
+        return value
+
+    seconds = _days_from_civil(field(0, 4), field(5, 7), field(8, 10)) * SECONDS_PER_DAY
+    seconds += field(11, 13) * SECONDS_PER_HOUR + field(14, 16) * 60 + field(17, 19)
+
+    if width == ISO_OFFSET_LEN:
+        offset = field(20, 22) * SECONDS_PER_HOUR + field(23, 25) * 60
+        seconds -= np.where(chars[:, 19] == ord('-'), -offset, offset)
+    return seconds
+
+
+def _days_from_civil(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Days since 1970-01-01 for proleptic Gregorian dates (vectorized)"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _parse_timestamps_slow(dates: List[str]) -> np.ndarray:
+    result = np.empty(len(dates), dtype=np.int64)
+    for i, date in enumerate(dates):
+        dt = datetime.fromisoformat(date.replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        result[i] = int(dt.timestamp())
+    return result
+
+
+def _day_to_iso(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+
+class TemporalAnalyzer:
+    """Hour/day/week activity statistics for one set of messages"""
+
+    def __init__(self, timestamps: np.ndarray, tz: Optional[str] = None):
+        """
+        Args:
+            timestamps: int64 epoch seconds (UTC)
+            tz: IANA timezone name of the user (None = UTC)
+        """
+        self.utc = np.asarray(timestamps, dtype=np.int64)
+        self.local = self.utc + self._utc_offsets(self.utc, resolve_timezone(tz))
+        self.days = self.local // SECONDS_PER_DAY
+        self._active_days: Optional[np.ndarray] = None
+        self._day_counts: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_dates(cls, dates: List[str], tz: Optional[str] = None) -> 'TemporalAnalyzer':
+        return cls(parse_timestamps(dates), tz)
+
+    @staticmethod
+    def _utc_offsets(utc: np.ndarray, zone: Optional[ZoneInfo]) -> np.ndarray:
+        """Per-timestamp UTC offset in seconds, resolved once per distinct UTC hour"""
+        if zone is None or not len(utc):
+            return np.zeros(len(utc), dtype=np.int64)
+
+        hours = utc // SECONDS_PER_HOUR
+        first_hour = hours.min()
+        hour_index = hours - first_hour
+        present = np.flatnonzero(np.bincount(hour_index))
+        table = np.zeros(present[-1] + 1, dtype=np.int64)
+        for h in present:
+            table[h] = int(datetime.fromtimestamp(int(h + first_hour) * SECONDS_PER_HOUR, zone).utcoffset().total_seconds())
+        return table[hour_index]
+
+    def _days_with_counts(self) -> tuple:
+        """(active day numbers, message counts), computed once"""
+        if self._active_days is None:
+            if not len(self.days):
+                self._active_days = np.empty(0, dtype=np.int64)
+                self._day_counts = np.empty(0, dtype=np.int64)
+            else:
+                first_day = self.days.min()
+                counts = np.bincount(self.days - first_day)
+                active = np.flatnonzero(counts)
+                self._active_days = active + first_day
+                self._day_counts = counts[active]
+        return self._active_days, self._day_counts
+
+    def _weeks_with_counts(self) -> tuple:
+        days, counts = self._days_with_counts()
+        weeks, first_idx = np.unique((days + WEEK_OFFSET_DAYS) // 7, return_index=True)
+        return weeks, np.add.reduceat(counts, first_idx) if len(first_idx) else counts
+
+    def hour_distribution(self) -> Dict[int, int]:
+        """Messages per local hour of day
+
+        Returns:
+            {0..23: count}
+        """
+        hours = (self.local % SECONDS_PER_DAY) // SECONDS_PER_HOUR
+        counts = np.bincount(hours, minlength=24)
+        return {hour: int(count) for hour, count in enumerate(counts)}
+
+    def daily_activity(self) -> Dict[str, int]:
+        """Per-day activity calendar
+
+        Returns:
+            {YYYY-MM-DD: count} sorted by date
+        """
+        days, counts = self._days_with_counts()
+        return {_day_to_iso(d): int(c) for d, c in zip(days, counts)}
+
+    def busiest_day(self) -> Dict[str, Any]:
+        days, counts = self._days_with_counts()
+        if not len(days):
+            return {'date': '', 'count': 0}
+        idx = int(np.argmax(counts))
+        return {'date': _day_to_iso(days[idx]), 'count': int(counts[idx])}
+
+    def weekly_timeline(self) -> Dict[str, int]:
+        """Messages per week (keyed by Monday date)"""
+        weeks, counts = self._weeks_with_counts()
+        return {_day_to_iso(w * 7 - WEEK_OFFSET_DAYS): int(c) for w, c in zip(weeks, counts)}
+
+    def busiest_week(self) -> Dict[str, Any]:
+        weeks, counts = self._weeks_with_counts()
+        if not len(weeks):
+            return {'week_start': '', 'count': 0}
+        idx = int(np.argmax(counts))
+        return {'week_start': _day_to_iso(weeks[idx] * 7 - WEEK_OFFSET_DAYS), 'count': int(counts[idx])}
+
+    def longest_streak(self) -> Dict[str, Any]:
+        """Longest run of consecutive active days
+
+        Returns:
+            {days, start, end}
+        """
+        days, _ = self._days_with_counts()
+        if not len(days):
+            return {'days': 0, 'start': '', 'end': ''}
+
+        # Run boundaries are wherever the gap to the previous active day != 1
+        breaks = np.flatnonzero(np.diff(days) != 1) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks, [len(days)]))
+        idx = int(np.argmax(ends - starts))
+        return {
+            'days': int(ends[idx] - starts[idx]),
+            'start': _day_to_iso(days[starts[idx]]),
+            'end': _day_to_iso(days[ends[idx] - 1])
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get all temporal stats in one call
+
+        Returns:
+            {hour_distribution, daily_activity, busiest_day, busiest_week, longest_streak, weekly_timeline}
+        """
+        return {
+            'hour_distribution': self.hour_distribution(),
+            'daily_activity': self.daily_activity(),
+            'busiest_day': self.busiest_day(),
+            'busiest_week': self.busiest_week(),
+            'longest_streak': self.longest_streak(),
+            'weekly_timeline': self.weekly_timeline()
+        }
@@ -0,0 +1,373 @@
+"""
+Multilingual Word Tokenizer
+Unicode-aware word extraction with per-language stopword sets and cheap per-chat language detection
+
+Words are runs of letters in any script, including the combining marks that
+Indic and Thai words are built from (a mark never starts a word). Han/kana
+runs have no spaces between words, so they are split into overlapping
+bigrams. Stopword sets are frozen per language and merged once per language
+combination, so filtering is a single set lookup per token whatever the
+chat's languages.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+TOKENIZER_VERSION = 3  # bump when tokens change, so cached month counts are recomputed
+DEFAULT_LANGUAGES = ('en',)
+DETECT_SAMPLE_CHARS = 20000  # chat text looked at by detect_languages
+SCRIPT_MIN_SHARE = 0.05  # of the sample's letters, for a script's languages to count
+LATIN_MIN_HIT_RATE = 0.08  # of Latin tokens that are a language's stopwords (and no picked language's)
+
+
+def _char_class(marks: bool) -> str:
+    """Regex class body for BMP letters (L*), with combining marks (M*) if marks
+
+    Spelled out as ranges rather than [^\\W\\d_] (which also leaves out the
+    marks Indic and Thai words need): sre compiles an explicit BMP class to a
+    table lookup, while \\w checks each character's Unicode category.
+    """
+    category = unicodedata.category
+    ranges = []
+    start = None
+    for cp in range(0x10000):
+        ch = chr(cp)
+        if ch.isalpha() or (marks and category(ch)[0] == 'M'):
+            if start is None:
+                start = cp
+        elif start is not None:
+            ranges.append((start, cp - 1))
+            start = None
+    return ''.join(re.escape(chr(a)) + '-' + re.escape(chr(b)) if a != b else re.escape(chr(a)) for a, b in ranges)
+
+
+ALPHA = _char_class(marks=False)
+LETTERS = _char_class(marks=True)
+
+# A letter, then letters/marks in any script: 'नमस्ते' stays one word, digits and '_' split words.
+# Marks only continue a word: a stray one (U+FE0F after an emoji) is no word of its own
+WORD = f'[{ALPHA}][{LETTERS}]*'
+WORD_PATTERN = re.compile(f'[{ALPHA}][{LETTERS}]+')
+
+# Phrase mining: every word (contractions kept whole), '' at message and sentence breaks
+PHRASE_TOKEN_PATTERN = re.compile(f"({WORD}(?:['’]{WORD})*)|[\n.!?;:,()\"«»…。！？，、；：]+")
+APOSTROPHES = re.compile("['’]")
+
+CJK_CHARS = '぀-ヿ㐀-䶿一-鿿豈-﫿'  # kana + Han
+CJK_RUN_PATTERN = re.compile(f'[{CJK_CHARS}]+')
+
+SCRIPT_PATTERNS = {
+    'latin': re.compile(r'[a-zA-ZÀ-ɏ]+'),
+    'cyrillic': re.compile(r'[Ѐ-ӿ]+'),
+    'arabic': re.compile(r'[؀-ۿݐ-ݿ]+'),
+    'han': re.compile(r'[㐀-䶿一-鿿豈-﫿]+'),
+    'kana': re.compile(r'[぀-ヿ]+'),
+    'hangul': re.compile(r'[ᄀ-ᇿ㄰-㆏가-힯]+'),
+    'devanagari': re.compile(r'[ऀ-ॿ]+'),
+    'thai': re.compile(r'[฀-๿]+'),
+}
+UKRAINIAN_LETTERS = re.compile(r'[іїєґ]')
+
+# Chat and platform noise, applied whatever the languages
+COMMON_STOPWORDS = frozenset({
+    'sticker', 'forwarded', 'message', 'replied', 'reply', 'photo', 'video',
+    'voice', 'file', 'gif', 'http', 'https', 'www', 'com', 'ah', 'eh', 'mm', 'hmm',
+    'lol', 'omg', 'lmao', 'xd', 'ok', 'okay', 'uh', 'uhh',
+    'haha', 'hahaha', 'hehe', 'hehehe', 'jaja', 'jajaja', 'kkk', 'kkkk', 'wkwk', 'wkwkwk',
+    'ахах', 'ахаха', 'хаха', 'хахаха', 'ок', 'ㅋㅋ', 'ㅋㅋㅋ', 'ㅎㅎ', '哈哈', '哈哈哈',
+})
+
+STOPWORD_SETS: Dict[str, frozenset] = {
+    'en': frozenset({
+        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+        'of', 'with', 'by', 'from', 'is', 'it', 'this', 'that', 'was', 'are',
+        'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+        'should', 'may', 'might', 'can', 'just', 'not', 'no', 'yes', 'so', 'if',
+        'then', 'than', 'when', 'what', 'where', 'who', 'which', 'how', 'why',
+        'all', 'each', 'every', 'both', 'few', 'more', 'most', 'other', 'some',
+        'such', 'only', 'own', 'same', 'too', 'very', 'also', 'any', 'as', 'about',
+        'up', 'out', 'into', 'over', 'after', 'before', 'between', 'under', 'again',
+        'there', 'here', 'they', 'them', 'their', 'he', 'him', 'his', 'she', 'her',
+        'we', 'us', 'our', 'you', 'your', 'my', 'me', 'i', 'am', 'been', 'being',
+        'get', 'got', 'getting', 'go', 'going', 'went', 'come', 'coming', 'came',
+        'like', 'know', 'think', 'want', 'see', 'look', 'make', 'take', 'say', 'said',
+        'well', 'back', 'now', 'way', 'even', 'new', 'because', 'still', 'oh',
+        'yeah', 'ya', 'yea', 'really', 'actually', 'dont', "don't", 'im', "i'm",
+        'its', "it's", 'thats', "that's", 'youre', "you're", 'were', "we're",
+        'bro', 'sis', 'dude', 'btw', 'idk', 'smh', 'fyi', 'ty', 'thx', 'np', 'yw', 'yall',
+        'la', 'ye',
+    }),
+    # Malay and Singlish particles (also common in Malaysian English chats)
+    'ms': frozenset({
+        'lah', 'leh', 'lor', 'sia', 'meh', 'hor', 'mah', 'liao', 'alr', 'wah', 'walao',
+        'dan', 'yang', 'di', 'ke', 'dari', 'ini', 'itu', 'untuk', 'dengan', 'ada', 'tidak',
+        'tak', 'juga', 'sudah', 'dah', 'akan', 'boleh', 'lagi', 'je', 'jer', 'pun', 'apa',
+        'mana', 'bila', 'macam', 'sebab', 'tapi', 'atau', 'kalau', 'bukan', 'belum', 'masih',
+        'sangat', 'sikit', 'banyak', 'semua', 'nanti', 'nak', 'ni', 'tu', 'kat', 'dia',
+        'aku', 'saya', 'kau', 'awak', 'kita', 'kami', 'korang', 'diorang', 'ya', 'yah',
+    }),
+    'id': frozenset({
+        'dan', 'yang', 'di', 'ke', 'dari', 'ini', 'itu', 'untuk', 'dengan', 'ada', 'tidak',
+        'juga', 'sudah', 'akan', 'bisa', 'lagi', 'aja', 'saja', 'pun', 'apa', 'mana', 'kalau',
+        'tapi', 'atau', 'bukan', 'belum', 'masih', 'sangat', 'banget', 'semua', 'nanti',
+        'gak', 'nggak', 'ga', 'udah', 'gue', 'gw', 'lu', 'lo', 'kamu', 'aku', 'saya', 'dia',
+        'kita', 'kami', 'mereka', 'yg', 'dgn', 'sama', 'kok', 'sih', 'deh', 'dong', 'nih',
+        'tuh', 'kan', 'jadi', 'karena', 'ya',
+    }),
+    'es': frozenset({
+        'de', 'la', 'que', 'el', 'en', 'los', 'del', 'se', 'las', 'por', 'un', 'para',
+        'con', 'no', 'una', 'su', 'al', 'lo', 'como', 'más', 'mas', 'pero', 'sus', 'le',
+        'ya', 'este', 'sí', 'si', 'porque', 'esta', 'entre', 'cuando', 'muy', 'sin',
+        'sobre', 'también', 'me', 'hasta', 'hay', 'donde', 'quien', 'desde', 'todo', 'nos',
+        'todos', 'uno', 'les', 'ni', 'otros', 'ese', 'eso', 'ellos', 'esto', 'mí', 'antes',
+        'qué', 'unos', 'yo', 'otro', 'otra', 'él', 'tanto', 'esa', 'estos', 'mucho', 'nada',
+        'ella', 'estar', 'algo', 'mi', 'mis', 'tú', 'te', 'ti', 'tu', 'tus', 'es', 'son',
+        'está', 'están', 'fue', 'ser', 'hace', 'pues', 'bueno', 'vale', 'xq', 'pq',
+    }),
+    'pt': frozenset({
+        'de', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com', 'não', 'nao',
+        'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como', 'mas', 'foi',
+        'ao', 'ele', 'das', 'tem', 'à', 'seu', 'sua', 'ou', 'ser', 'quando', 'muito', 'há',
+        'nos', 'já', 'ja', 'está', 'ta', 'tá', 'eu', 'também', 'só', 'pelo', 'pela', 'até',
+        'isso', 'ela', 'entre', 'era', 'depois', 'sem', 'mesmo', 'aos', 'ter', 'seus', 'quem',
+        'nas', 'me', 'esse', 'eles', 'estão', 'você', 'voce', 'vc', 'essa', 'num', 'nem',
+        'meu', 'minha', 'tu', 'te', 'vocês', 'lhe', 'dele', 'este', 'isto', 'aqui', 'tb',
+        'pq', 'rs', 'né', 'ne', 'aí', 'ai', 'então', 'entao',
+    }),
+    'fr': frozenset({
+        'le', 'la', 'les', 'de', 'des', 'du', 'un', 'une', 'et', 'est', 'en', 'que', 'qui',
+        'dans', 'ce', 'il', 'elle', 'ne', 'pas', 'pour', 'sur', 'au', 'aux', 'avec', 'se',
+        'son', 'sa', 'ses', 'ou', 'mais', 'comme', 'on', 'nous', 'vous', 'ils', 'elles',
+        'je', 'tu', 'me', 'te', 'moi', 'toi', 'lui', 'leur', 'été', 'être', 'avoir', 'ai',
+        'as', 'fait', 'plus', 'tout', 'très', 'bien', 'cette', 'ces', 'mon', 'ma', 'mes',
+        'ton', 'ta', 'tes', 'notre', 'votre', 'par', 'si', 'oui', 'non', 'ça', 'ca',
+        'qu', 'va', 'là', 'quoi', 'mdr', 'ptdr', 'bon', 'alors', 'donc',
+    }),
+    'de': frozenset({
+        'der', 'die', 'das', 'und', 'ist', 'nicht', 'ich', 'du', 'er', 'sie', 'es', 'wir',
+        'ihr', 'ein', 'eine', 'einen', 'dem', 'den', 'des', 'zu', 'mit', 'auf', 'für', 'von',
+        'im', 'in', 'an', 'auch', 'so', 'wie', 'aber', 'oder', 'wenn', 'dann', 'noch', 'nur',
+        'schon', 'mal', 'ja', 'nein', 'doch', 'was', 'wer', 'wo', 'hat', 'haben', 'bin',
+        'bist', 'sind', 'war', 'sehr', 'mir', 'dir', 'mich', 'dich', 'uns', 'euch', 'sich',
+        'kein', 'keine', 'ganz', 'also', 'halt', 'eben', 'da', 'dass', 'gibt', 'kann',
+    }),
+    'it': frozenset({
+        'di', 'che', 'e', 'il', 'la', 'a', 'per', 'in', 'un', 'una', 'è', 'non', 'sono',
+        'mi', 'ti', 'si', 'lo', 'le', 'gli', 'da', 'del', 'della', 'con', 'ma', 'come',
+        'io', 'tu', 'lui', 'lei', 'noi', 'voi', 'loro', 'ho', 'hai', 'ha', 'anche', 'più',
+        'se', 'sì', 'no', 'questo', 'quello', 'ci', 'ne', 'al', 'alla', 'dei', 'delle',
+        'nel', 'nella', 'cosa', 'però', 'poi', 'già', 'sei',
+    }),
+    'ru': frozenset({
+        'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все',
+        'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по',
+        'только', 'ее', 'её', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'ещё', 'нет', 'о',
+        'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'ли', 'если', 'уже', 'или', 'ни',
+        'быть', 'был', 'него', 'до', 'вас', 'опять', 'уж', 'вам', 'ведь', 'там', 'потом',
+        'себя', 'ничего', 'ей', 'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для',
+        'мы', 'тебя', 'их', 'чем', 'была', 'сам', 'чтоб', 'без', 'чего', 'раз', 'тоже',
+        'себе', 'под', 'будет', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой',
+        'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас',
+        'были', 'куда', 'зачем', 'всех', 'можно', 'при', 'два', 'об', 'хоть', 'после', 'над',
+        'больше', 'тот', 'через', 'эти', 'нас', 'про', 'всего', 'них', 'какая', 'много',
+        'разве', 'эту', 'моя', 'свою', 'этой', 'перед', 'лучше', 'чуть', 'том', 'такой',
+        'им', 'более', 'всегда', 'конечно', 'всю', 'между', 'это', 'просто', 'ага', 'щас',
+        'че', 'чё', 'типа', 'короче', 'вообще', 'ладно', 'очень', 'тебе', 'мб', 'норм',
+    }),
+    'uk': frozenset({
+        'і', 'й', 'в', 'у', 'на', 'що', 'не', 'з', 'із', 'я', 'ти', 'ви', 'ми', 'він',
+        'вона', 'воно', 'вони', 'це', 'та', 'але', 'як', 'до', 'за', 'так', 'же', 'чи',
+        'вже', 'ще', 'тут', 'там', 'бо', 'його', 'її', 'їх', 'мені', 'тобі', 'для', 'від',
+        'про', 'коли', 'якщо', 'тільки', 'теж', 'також', 'дуже', 'треба', 'можна', 'є',
+        'було', 'був', 'була', 'буде', 'ну', 'от', 'ось', 'мене', 'тебе', 'нам', 'вам',
+    }),
+    'ar': frozenset({
+        'في', 'من', 'على', 'إلى', 'الى', 'عن', 'أن', 'ان', 'إن', 'ما', 'لا', 'هذا', 'هذه',
+        'ذلك', 'التي', 'الذي', 'هو', 'هي', 'أنا', 'انا', 'انت', 'أنت', 'نحن', 'هم', 'كان',
+        'كانت', 'قد', 'لم', 'لن', 'مع', 'كل', 'بعد', 'قبل', 'ثم', 'او', 'أو', 'يا', 'بس',
+        'يعني', 'شو', 'ايش', 'اللي', 'لو', 'مش', 'كمان', 'هيك', 'عشان', 'والله', 'وش',
+    }),
+    'hi': frozenset({
+        'है', 'हैं', 'का', 'की', 'के', 'में', 'से', 'को', 'और', 'यह', 'वह', 'ये', 'वो', 'तो',
+        'ही', 'भी', 'नहीं', 'पर', 'था', 'थी', 'थे', 'हम', 'तुम', 'आप', 'मैं', 'मुझे', 'कुछ',
+        'क्या', 'कि', 'हो', 'रहा', 'रही', 'गया', 'एक', 'लिए', 'साथ', 'अब', 'जो',
+    }),
+    'zh': frozenset({
+        '我们', '你们', '他们', '什么', '没有', '这个', '那个', '就是', '不是', '可以', '一个',
+        '因为', '所以', '但是', '然后', '还是', '这样', '那样', '知道', '现在', '自己', '已经',
+        '时候', '怎么', '觉得', '如果', '的话', '一下', '这么', '那么', '我的', '你的', '是不',
+        '了吗', '好的',
+    }),
+    'ja': frozenset({
+        'です', 'ます', 'した', 'して', 'いる', 'ない', 'この', 'その', 'あの', 'これ',
+        'それ', 'あれ', 'よう', 'こと', 'もの', 'から', 'まで', 'ので', 'けど', 'でも',
+        'って', 'った', 'てる', 'でし', 'まし', 'すか', 'なの', 'なん', 'だけ', 'よね',
+        'かな', 'ww', 'www',
+    }),
+    'ko': frozenset({
+        '그리고', '그래서', '하지만', '그냥', '진짜', '너무', '이거', '그거', '저거', '있어',
+        '없어', '나는', '너는', '우리', '이제', '근데', '아니', '그럼', '이건', '그건',
+    }),
+}
+
+# Languages told apart by stopword hit rate within the Latin script
+LATIN_LANGUAGES = ('en', 'ms', 'id', 'es', 'pt', 'fr', 'de', 'it')
+
+# Language guessed from script alone
+SCRIPT_LANGUAGES = {'arabic': 'ar', 'han': 'zh', 'kana': 'ja', 'hangul': 'ko', 'devanagari': 'hi'}
+
+
+def register_stopwords(language: str, words: Iterable[str]):
+    """Add (or extend) a language's stopword set
+
+    Args:
+        language: Language code, e.g. 'tl'
+        words: Stopwords, matched against lowercased tokens
+    """
+    STOPWORD_SETS[language] = STOPWORD_SETS.get(language, frozenset()) | {w.lower() for w in words}
+    stopwords_for.cache_clear()
+    get_tokenizer.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def stopwords_for(languages: Tuple[str, ...]) -> frozenset:
+    """Merged stopword set for a language combination (built once per combination)"""
+    merged = set(COMMON_STOPWORDS)
+    for language in languages:
+        merged |= STOPWORD_SETS.get(language, frozenset())
+    return frozenset(merged)
+
+
+def _sample(texts: Union[str, Sequence[str]], sample_chars: int) -> str:
+    """Evenly strided slice of the texts, about sample_chars long"""
+    if isinstance(texts, str):
+        if len(texts) <= sample_chars:
+            return texts
+        chunk = 500
+        step = len(texts) // max(1, sample_chars // chunk)
+        return '\n'.join(texts[i:i + chunk] for i in range(0, len(texts), step))
+    total = sum(map(len, texts))
+    step = max(1, math.ceil(total / sample_chars))
+    return '\n'.join(texts[::step])
+
+
+def detect_languages(texts: Union[str, Sequence[str]], sample_chars: int = DETECT_SAMPLE_CHARS) -> Tuple[str, ...]:
+    """Guess a chat's languages from a sample of its text
+
+    Scripts are counted first; Latin-script text is then told apart by how
+    many of its tokens are each language's stopwords. Cost is bounded by
+    sample_chars, not chat size.
+
+    Args:
+        texts: Chat text, or a list of message texts
+        sample_chars: Characters sampled
+
+    Returns:
+        Sorted language codes (DEFAULT_LANGUAGES if nothing is recognized)
+    """
+    sample = _sample(texts, sample_chars).lower()
+    script_chars = {script: sum(map(len, pattern.findall(sample))) for script, pattern in SCRIPT_PATTERNS.items()}
+    letters = sum(script_chars.values())
+    if not letters:
+        return DEFAULT_LANGUAGES
+
+    present = {script for script, count in script_chars.items() if count / letters >= SCRIPT_MIN_SHARE}
+    languages = {SCRIPT_LANGUAGES[script] for script in present if script in SCRIPT_LANGUAGES}
+    if 'ja' in languages:
+        languages.discard('zh')  # kanji, not Chinese
+    if 'cyrillic' in present:
+        ukrainian = len(UKRAINIAN_LETTERS.findall(sample)) / script_chars['cyrillic']
+        languages.add('uk' if ukrainian >= 0.01 else 'ru')
+    if 'latin' in present:
+        # Greedy: best match first, then languages whose stopwords the picked ones don't already cover
+        tokens = Counter(SCRIPT_PATTERNS['latin'].findall(sample))
+        total = sum(tokens.values())
+        covered = set()
+        candidates = list(LATIN_LANGUAGES)
+        while candidates:
+            hits = {
+                language: sum(n for token, n in tokens.items() if token in STOPWORD_SETS[language] and token not in covered)
+                for language in candidates
+            }
+            language = max(candidates, key=hits.get)
+            if hits[language] / total < LATIN_MIN_HIT_RATE:
+                break
+            languages.add(language)
+            covered |= STOPWORD_SETS[language]
+            candidates.remove(language)
+        # English slang and platform words turn up in Latin-script chats of any language
+        languages.add('en')
+    return tuple(sorted(languages)) or DEFAULT_LANGUAGES
+
+
+class Tokenizer:
+    """Lowercase words minus the stopwords of a fixed set of languages"""
+
+    def __init__(self, languages: Sequence[str] = DEFAULT_LANGUAGES):
+        """
+        Args:
+            languages: Language codes whose stopwords are removed (see STOPWORD_SETS)
+        """
+        self.languages = tuple(sorted(set(languages)))
+        self.stopwords = stopwords_for(self.languages)
+        self.segment_cjk = bool({'zh', 'ja'} & set(self.languages))
+
+    @property
+    def key(self) -> str:
+        """Identifies this tokenizer's output, for cached counts"""
+        return f"{TOKENIZER_VERSION}:{'+'.join(self.languages)}"
+
+    def tokenize(self, text: str) -> List[str]:
+        """Extract lowercase words of 2+ characters, stopwords removed
+
+        Args:
+            text: Any text (typically many messages joined by newlines)
+
+        Returns:
+            Words in text order
+        """
+        text = text.lower()
+        stopwords = self.stopwords
+        if not self.segment_cjk:
+            return [w for w in WORD_PATTERN.findall(text) if w not in stopwords]
+
+        runs = CJK_RUN_PATTERN.findall(text)
+        words = [w for w in WORD_PATTERN.findall(CJK_RUN_PATTERN.sub(' ', text)) if w not in stopwords]
+        words.extend(
+            bigram
+            for run in runs
+            for bigram in (run[i:i + 2] for i in range(len(run) - 1))
+            if bigram not in stopwords
+        )
+        return words
+
+
+    def phrase_tokens(self, text: str) -> List[str]:
+        """All words of text, stopwords and 1-letter words included, '' at breaks (one regex pass)"""
+        return PHRASE_TOKEN_PATTERN.findall(text.lower())
+
+    def words_from_tokens(self, token_counts: Dict[str, int]) -> Counter:
+        """Word counts from phrase_tokens() counts, equal to counting tokenize() output"""
+        stopwords = self.stopwords
+        words = Counter()
+        for token, count in token_counts.items():
+            parts = APOSTROPHES.split(token) if "'" in token or '’' in token else (token,)
+            for part in parts:
+                if len(part) > 1 and part not in stopwords:
+                    words[part] += count
+        return words
+
+
+@lru_cache(maxsize=64)
+def get_tokenizer(languages: Tuple[str, ...] = DEFAULT_LANGUAGES) -> Tokenizer:
+    """Shared tokenizer per language combination"""
+    return Tokenizer(languages)
+
+
+def tokenizer_for(texts: Union[str, Sequence[str]]) -> Tokenizer:
+    """Tokenizer for the languages detected in texts"""
+    return get_tokenizer(detect_languages(texts))
@@ -0,0 +1,198 @@
+"""
+LLM Usage Ledger
+Prompt, completion and cached-token accounting with cost, time-to-first-token and job budgets
+"""
+
+import os
+import uuid
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# USD per 1M tokens (gpt-4o-mini)
+PRICE_PROMPT = 0.15
+PRICE_CACHED_PROMPT = 0.075
+PRICE_COMPLETION = 0.60
+
+TTFT_WINDOW = 500  # Recent time-to-first-token samples kept for percentiles
+
+JOB_TOKEN_BUDGET = int(os.getenv('JOB_TOKEN_BUDGET', '250000'))  # Tokens per Wrapped job, 0 = unlimited
+
+# Degradation steps by fraction of the budget left
+SMALL_SAMPLES_BELOW = 0.5  # Months are sent with half their samples
+TINY_SAMPLES_BELOW = 0.25  # ... a quarter, and per-chat personas are matched locally
+
+_current_chat: ContextVar[Optional[str]] = ContextVar('usage_chat', default=None)
+
+
+class BudgetExceeded(Exception):
+    """The job's token budget cannot cover the next LLM call"""
+
+
+@contextmanager
+def usage_scope(chat: str):
+    """Tag LLM calls made inside the block (including gathered tasks) with a chat"""
+    token = _current_chat.set(chat)
+    try:
+        yield
+    finally:
+        _current_chat.reset(token)
+
+
+def usage_tokens(usage: Any) -> Dict[str, int]:
+    """Token counts from an OpenAI usage object (missing fields count as 0)"""
+    if usage is None:
+        return {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached_tokens': (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0
+    }
+
+
+def cost_usd(prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * PRICE_PROMPT + cached_tokens * PRICE_CACHED_PROMPT + completion_tokens * PRICE_COMPLETION) / 1e6
+
+
+class UsageLedger:
+    """Running totals of LLM usage, optionally bounded by a token budget
+
+    Calls reserve their estimated tokens before being sent and settle with
+    the real usage afterwards, so parallel calls cannot overshoot the budget.
+    Everything that checks what is left (degradation steps included) counts
+    the reservations of calls still in flight.
+    """
+
+    def __init__(self, budget: Optional[int] = None, job_id: Optional[str] = None):
+        """
+        Args:
+            budget: Max tokens (prompt + completion) for the job, None/0 = unlimited
+            job_id: Tag for every entry (default: random)
+        """
+        self.budget = budget or None
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.estimated_calls = 0  # Calls cancelled before the provider reported usage
+        self.reserved = 0
+        self.by_tag: Dict[tuple, Dict[str, int]] = defaultdict(Counter)
+        self.degradations = Counter()
+        self._ttft = deque(maxlen=TTFT_WINDOW)
+
+    @property
+    def used(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def budget_left(self) -> Optional[int]:
+        """Tokens not yet used or held by a call in flight (None = unlimited)"""
+        if self.budget is None:
+            return None
+        return max(0, self.budget - self.used - self.reserved)
+
+    def fraction_left(self) -> float:
+        if self.budget is None:
+            return 1.0
+        return self.budget_left() / self.budget
+
+    def sample_scale(self) -> float:
+        """Share of each month's samples that should still be sent"""
+        left = self.fraction_left()
+        if left < TINY_SAMPLES_BELOW:
+            return 0.25
+        if left < SMALL_SAMPLES_BELOW:
+            return 0.5
+        return 1.0
+
+    def reserve(self, estimate: int):
+        """Hold estimated tokens for a call about to be sent
+
+        Raises:
+            BudgetExceeded: The estimate does not fit in what is left
+        """
+        if not self.fits(estimate):
+            raise BudgetExceeded(f"Job {self.job_id}: {estimate} tokens needed, "
+                                 f"{self.budget_left()} left of {self.budget}")
+        self.reserved += estimate
+
+    def fits(self, estimate: int) -> bool:
+        """Whether reserve(estimate) would succeed now"""
+        return self.budget is None or estimate <= self.budget_left()
+
+    def release(self, estimate: int):
+        """Drop a reservation (after the call was recorded or failed)"""
+        self.reserved = max(0, self.reserved - estimate)
+
+    def note(self, degradation: str):
+        """Count a degradation step taken because of the budget"""
+        self.degradations[degradation] += 1
+
+    def record(
+        self,
+        usage: Any,
+        ttft: Optional[float] = None,
+        stage: Optional[str] = None,
+        chat: Optional[str] = None,
+        estimated: bool = False
+    ) -> Dict[str, int]:
+        """Add one completion's usage
+
+        Args:
+            usage: response.usage (or the final stream chunk's usage)
+            ttft: Seconds until the first content token arrived
+            stage: Pipeline stage tag ('sentiment', 'persona')
+            chat: Chat tag (default: the enclosing usage_scope)
+            estimated: usage is an estimate for a call cancelled before the provider reported it
+
+        Returns:
+            The token counts that were recorded
+        """
+        tokens = usage_tokens(usage)
+        self.calls += 1
+        self.estimated_calls += estimated
+        self.prompt_tokens += tokens['prompt_tokens']
+        self.completion_tokens += tokens['completion_tokens']
+        self.cached_tokens += tokens['cached_tokens']
+        if ttft is not None:
+            self._ttft.append(ttft)
+
+        tag = self.by_tag[(chat or _current_chat.get() or 'job', stage or 'other')]
+        tag['calls'] += 1
+        tag.update(tokens)
+        return tokens
+
+    def summary(self) -> Dict[str, Any]:
+        ttft = np.fromiter(self._ttft, dtype=np.float64)
+        by_chat: Dict[str, Counter] = defaultdict(Counter)
+        by_stage: Dict[str, Counter] = defaultdict(Counter)
+        for (chat, stage), counts in self.by_tag.items():
+            by_chat[chat].update(counts)
+            by_stage[stage].update(counts)
+        return {
+            'job_id': self.job_id,
+            'calls': self.calls,
+            'estimated_calls': self.estimated_calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cached_tokens': self.cached_tokens,
+            'cache_hit_ratio': round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            'cost_usd': round(cost_usd(self.prompt_tokens, self.completion_tokens, self.cached_tokens), 6),
+            'ttft_p50_ms': round(float(np.percentile(ttft, 50)) * 1000, 1) if len(ttft) else None,
+            'ttft_p95_ms': round(float(np.percentile(ttft, 95)) * 1000, 1) if len(ttft) else None,
+            'budget': self.budget,
+            'budget_left': self.budget_left(),
+            'reserved': self.reserved,
+            'degradations': dict(self.degradations),
+            'by_stage': {stage: dict(c) for stage, c in by_stage.items()},
+            'by_chat': {chat: dict(c) for chat, c in by_chat.items()}
+        }
+
+
+# Process-wide totals (per-job ledgers live on each LLMAnalyzer)
+PROCESS_USAGE = UsageLedger()
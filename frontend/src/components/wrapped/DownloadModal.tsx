@@ -1,4 +1,4 @@
-import { useRef, useState } from "react"
+import { useEffect, useRef, useState } from "react"
 import { motion, AnimatePresence } from "framer-motion"
 import { X, Download, Share2, Loader2 } from "lucide-react"
 import html2canvas from "html2canvas"
@@ -25,15 +25,35 @@ interface DownloadModalProps {
     topChats: ChatData[]
     topWords: string[]
   }
+  cardUrl?: string
 }
 
-export function DownloadModal({ isOpen, onClose, data }: DownloadModalProps) {
+export function DownloadModal({ isOpen, onClose, data, cardUrl }: DownloadModalProps) {
   const previewRef = useRef<HTMLDivElement>(null)
   const captureRef = useRef<HTMLDivElement>(null)
   const [downloading, setDownloading] = useState(false)
   const [sharing, setSharing] = useState(false)
+  const [cardFailed, setCardFailed] = useState(false)
+  // Preview and download show the same image: the server card, or the html2canvas layout without one
+  const showCard = Boolean(cardUrl) && !cardFailed
+
+  useEffect(() => setCardFailed(false), [cardUrl])
+
+  // Card rendered by the server; html2canvas is the fallback
+  const fetchCard = async (): Promise<Blob | null> => {
+    if (!cardUrl || !showCard) return null
+    try {
+      const response = await fetch(cardUrl)
+      return response.ok ? await response.blob() : null
+    } catch {
+      return null
+    }
+  }
 
   const generateImage = async (): Promise<Blob | null> => {
+    const card = await fetchCard()
+    if (card) return card
+    if (showCard) setCardFailed(true)  // the preview switches to what is downloaded instead
     if (!captureRef.current) return null
 
     const canvas = await html2canvas(captureRef.current, {
@@ -49,24 +69,21 @@ export function DownloadModal({ isOpen, onClose, data }: DownloadModalProps) {
   }
 
   const handleDownload = async () => {
-    if (!captureRef.current) return
+    if (!captureRef.current && !cardUrl) return
 
     setDownloading(true)
     try {
-      const canvas = await html2canvas(captureRef.current, {
-        backgroundColor: "#0f0f1a",
-        scale: 2,
-        useCORS: true,
-        logging: false,
-      })
-
-      const dataUrl = canvas.toDataURL("image/png")
+      const blob = await generateImage()
+      if (!blob) throw new Error("Failed to generate image")
+
+      const dataUrl = URL.createObjectURL(blob)
       const link = document.createElement("a")
       link.download = "telegram-wrapped-2025.png"
       link.href = dataUrl
       document.body.appendChild(link)
       link.click()
       document.body.removeChild(link)
+      URL.revokeObjectURL(dataUrl)
     } catch (err) {
       console.error("Failed to generate image:", err)
     } finally {
@@ -131,11 +148,20 @@ export function DownloadModal({ isOpen, onClose, data }: DownloadModalProps) {
               <X className="w-5 h-5" />
             </button>
 
-            {/* Preview - larger scale */}
+            {/* Preview - the image Download and Share produce */}
             <div className="flex justify-center overflow-hidden rounded-xl mb-4">
-              <div ref={previewRef} className="transform scale-[0.85] origin-top">
-                <WrappedSummary {...data} />
-              </div>
+              {showCard ? (
+                <img
+                  src={cardUrl}
+                  alt="Your Telegram Wrapped card"
+                  className="w-full aspect-[4/5] rounded-xl bg-[#0f0f1a]"
+                  onError={() => setCardFailed(true)}
+                />
+              ) : (
+                <div ref={previewRef} className="transform scale-[0.85] origin-top">
+                  <WrappedSummary {...data} />
+                </div>
+              )}
             </div>
 
             {/* Action buttons - below image */}
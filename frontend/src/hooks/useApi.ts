@@ -1,7 +1,7 @@
 import { useState, useCallback } from "react"
 import type { Chat, WrappedResult } from "@/lib/types"
 
-const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:8000"
+export const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:8000"
 
 export function useApi() {
   const [sessionId, setSessionId] = useState<string | null>(
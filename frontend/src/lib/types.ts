@@ -1,3 +1,12 @@
+export interface ActivityStats {
+  hour_distribution?: Record<number, number>
+  daily_activity: Record<string, number>
+  busiest_day: { date: string; count: number }
+  busiest_week: { week_start: string; count: number }
+  longest_streak: { days: number; start: string; end: string }
+  weekly_timeline: Record<string, number>
+}
+
 export interface ChatResult {
   user_id: string
   chat_ids: string[]
@@ -15,7 +24,10 @@ export interface ChatResult {
     secondary: string
     confidence: number
     vibe_summary: string
+    source?: 'llm' | 'local'
+    pending?: boolean
   }>
+  // Only set once fetched via GET /chats/{chat_id}/persona (or cached from an earlier fetch)
   persona: {
     persona_id: string
     persona_name: string
@@ -23,9 +35,10 @@ export interface ChatResult {
     traits: string
     match_reason: string
     confidence: number
-  }
+  } | null
   top_words: string[]
   top_emojis: string[]
+  activity?: ActivityStats
 }
 
 export interface WrappedResult {
@@ -44,6 +57,7 @@ export interface WrappedResult {
         secondary: string
         confidence: number
         vibe_summary: string
+        pending?: boolean
       }
     >
     persona: {
@@ -57,7 +71,21 @@ export interface WrappedResult {
     top_words: string[]
     top_emojis: string[]
     hour_distribution?: Record<number, number>
+    activity?: ActivityStats
+    chat_timelines?: Record<string, Record<string, number>>
+    usage?: {
+      job_id: string
+      calls: number
+      prompt_tokens: number
+      completion_tokens: number
+      cached_tokens: number
+      cost_usd: number
+      budget: number | null
+      budget_left: number | null
+      degradations: Record<string, number>
+    }
     angriest_day?: string
+    summary_card?: string
   }
 }
 
@@ -13,6 +13,7 @@ import { WordCloud } from "@/components/wrapped/WordCloud"
 import { ActiveChatsChart } from "@/components/wrapped/ActiveChatsChart"
 import { DownloadModal } from "@/components/wrapped/DownloadModal"
 import { useSlideNavigation } from "@/hooks/useSlideNavigation"
+import { API_BASE } from "@/hooks/useApi"
 import type { WrappedResult, Chat } from "@/lib/types"
 
 const TOTAL_SLIDES = 9
@@ -557,6 +558,7 @@ export function WrappedPage() {
         isOpen={showDownloadModal}
         onClose={() => setShowDownloadModal(false)}
         data={downloadData}
+        cardUrl={safeAggregate.summary_card ? `${API_BASE}${safeAggregate.summary_card}` : undefined}
       />
     </>
   )